@@ -1,24 +1,116 @@
-import sys
-import os
 # API/main.py
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from src.logic import SocialMediaPlatform   # your own logic
-from fastapi.middleware.cors import CORSMiddleware
-from typing import Optional
 #uvicorn API.main:app --reload
-# Add parent directory (project root) to sys.path
+import sys
+import os
+import asyncio
+import json
+import math
+import random
+import time
+import logging
+import threading
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import List, Optional
+
+# Add parent directory (project root) to sys.path so `src` imports work from any cwd
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
-# Now you can import from src
+from fastapi import FastAPI, HTTPException, Query, Depends, Request, Response
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+from starlette.routing import Match
+
+# Importing these does no network I/O; Supabase clients are created in the lifespan warm-up
 from src.logic import SocialMediaPlatform
-from src.db import DatabaseManager
+from src.db import LikeCountBuffer, LikeReconciler
+from src.cache import FeedCache, ProfileCache
+from src.async_db import AsyncDatabaseManager
+from src.images import ImageIngestor
+from src.events import EventHub
+from src.search import SearchIndex
+from src.timeline import TimelineEngine
+from src.trending import TrendingRanker
+from src.auth import TokenError, signer_from_env, hasher_from_env
+from src.bloom import BloomFilter
+from src.limits import ConcurrencyLimit, Overloaded, RateLimiter, REQUEST_LIMIT, parse_limits
+from src.journal import JournalReplayer, claim_journal
+from src.metrics import REGISTRY, HTTP_REQUESTS, HTTP_LATENCY
+
+# orjson serializes noticeably faster than the stdlib encoder; fall back if it is missing
+try:
+    import orjson
+    from fastapi.responses import ORJSONResponse as DefaultResponse
+except ImportError:
+    orjson = None
+    DefaultResponse = JSONResponse
+
+# Brotli when brotli-asgi is installed (it falls back to gzip per request), plain gzip otherwise
+try:
+    from brotli_asgi import BrotliMiddleware as CompressionMiddleware
+except ImportError:
+    CompressionMiddleware = GZipMiddleware
+
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "WARNING"), format="%(asctime)s %(name)s %(levelname)s %(message)s")
+logger = logging.getLogger(__name__)
 
 
 # --------------------------
 # App setup
 # --------------------------
-app = FastAPI(title="Social Media Platform API", version="1.0")
+# Startup bootstraps retry a failed table scan with capped exponential backoff until they succeed
+BOOTSTRAP_RETRY_MAX = float(os.getenv("BOOTSTRAP_RETRY_MAX", "60"))
+bootstrap_stop = threading.Event()
+
+def run_bootstrap(name: str, target):
+    """Run `target` until it completes; a datastore blip at startup only delays it"""
+    delay = 0.0
+    while not bootstrap_stop.is_set():
+        try:
+            target()
+            return
+        except Exception as e:
+            delay = min(BOOTSTRAP_RETRY_MAX, max(1.0, delay * 2))
+            logger.warning("%s bootstrap failed, retrying in %.0fs: %s", name, delay, e)
+            bootstrap_stop.wait(delay * random.uniform(0.5, 1.0))
+
+def start_bootstrap(name: str, target):
+    threading.Thread(target=run_bootstrap, args=(name, target), name=f"{name}-bootstrap", daemon=True).start()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Build this worker's clients and open pooled connections before serving traffic
+    await social_platform.db.awarm_up()
+    event_hub.bind(asyncio.get_running_loop())
+    # Build the search index in the background; /search serves partial results until it is ready
+    start_bootstrap("search", social_platform.bootstrap_search)
+    # Same for trending scores, replayed from recent likes and comments
+    start_bootstrap("trending", social_platform.bootstrap_trending)
+    # And the taken-usernames filter; until it is ready every signup runs the existence query
+    start_bootstrap("usernames", social_platform.bootstrap_usernames)
+    like_buffer.start()
+    like_reconciler.start()
+    app.state.journal_replayer = start_journal()
+    yield
+    bootstrap_stop.set()
+    if app.state.journal_replayer is not None:
+        # Whatever is not applied by then stays in the journal for the next start
+        app.state.journal_replayer.stop(drain_timeout=float(os.getenv("JOURNAL_DRAIN_TIMEOUT", "5")))
+        db.journal.close()
+    event_hub.close()
+    image_ingestor.shutdown()
+    password_hasher.shutdown()
+    like_buffer.stop()
+    like_reconciler.stop()
+
+app = FastAPI(title="Social Media Platform API", version="1.0", lifespan=lifespan,
+              default_response_class=DefaultResponse)
+
+# Compress responses above the threshold; small ones aren't worth the CPU
+app.add_middleware(CompressionMiddleware, minimum_size=int(os.getenv("COMPRESS_MIN_SIZE", "1024")))
 
 # Allow frontend to call API
 app.add_middleware(
@@ -29,8 +121,238 @@ app.add_middleware(
     allow_headers=["*"]
 )
 
+def route_template(request) -> str:
+    """Route path like /posts/{post_id}/comments, so metrics don't get one series per id"""
+    for route in request.app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+def client_key(request) -> str:
+    """Rate-limit key: the user behind a valid bearer token, else the client address"""
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and token:
+        # Runs before routing on every request, public ones included: whatever a forged
+        # header makes verify() raise, the request is keyed as anonymous, never a 500
+        try:
+            return f"user:{token_signer.verify(token)['id']}"
+        except Exception:
+            pass
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+# Registered before the metrics middleware so rejected requests are still counted
+@app.middleware("http")
+async def admission_control(request, call_next):
+    """Shed load before it reaches Supabase: per-user token buckets, then the datastore cap"""
+    route = f"{request.method} {route_template(request)}"
+    if rate_limiter is not None and route not in ACCOUNT_ROUTES:
+        retry_after = rate_limiter.check(client_key(request), route)
+        if retry_after:
+            return JSONResponse({"detail": "Too many requests"}, status_code=429,
+                                headers={"Retry-After": str(math.ceil(retry_after))})
+    token = REQUEST_LIMIT.set(datastore_limit)
+    try:
+        return await call_next(request)
+    finally:
+        REQUEST_LIMIT.reset(token)
+
+@app.exception_handler(Overloaded)
+async def datastore_overloaded(request, exc: Overloaded):
+    return JSONResponse({"detail": "Server is busy, retry shortly"}, status_code=503,
+                        headers={"Retry-After": str(math.ceil(exc.retry_after))})
+
+@app.middleware("http")
+async def record_request_metrics(request, call_next):
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = route_template(request)
+        HTTP_LATENCY.observe(time.perf_counter() - started, request.method, route)
+        HTTP_REQUESTS.inc(request.method, route, str(status))
+
 # Initialize platform
-social_platform = SocialMediaPlatform()
+# Token buckets per (user, route): rate per second and burst. RATE_LIMITS overrides entries
+# ("POST /posts=1:10,default=20:40,GET /metrics=off") or turns limiting off entirely ("off").
+RATE_LIMITS = {
+    "default": (20, 40),
+    "POST /signup": (0.2, 3),
+    "POST /login": (1, 5),
+    "POST /posts": (1, 10),
+    "POST /posts/like": (5, 20),
+    "POST /posts/unlike": (5, 20),
+    "POST /posts/comment": (2, 10),
+    "POST /posts/batch": (0.2, 3),
+    "POST /posts/like/batch": (0.5, 5),
+    "POST /posts/unlike/batch": (0.5, 5),
+    "POST /posts/comment/batch": (0.2, 3),
+    "POST /follow": (1, 10),
+    "POST /unfollow": (1, 10),
+    "GET /events": (1, 10),
+    "GET /metrics": None,
+}
+rate_limiter = (
+    None if os.getenv("RATE_LIMITS") == "off"
+    else RateLimiter(parse_limits(os.getenv("RATE_LIMITS"), RATE_LIMITS))
+)
+# Signup and login never carry a token, and the frontend sends every user's from one address,
+# so their buckets are keyed by the username in the body (see admit_account), not the client
+ACCOUNT_ROUTES = {"POST /signup", "POST /login"}
+
+def admit_account(route: str, username: str):
+    """Take a token from `username`'s bucket on `route`; 429 once it is spent"""
+    if rate_limiter is None:
+        return
+    retry_after = rate_limiter.check(f"name:{username.lower()}", route)
+    if retry_after:
+        raise HTTPException(status_code=429, detail="Too many requests",
+                            headers={"Retry-After": str(math.ceil(retry_after))})
+# Outstanding Supabase calls across the whole worker; past this, requests get 503 instead of queueing
+DATASTORE_MAX_INFLIGHT = int(os.getenv("DATASTORE_MAX_INFLIGHT", "64"))
+datastore_limit = (
+    ConcurrencyLimit(DATASTORE_MAX_INFLIGHT, retry_after=float(os.getenv("DATASTORE_RETRY_AFTER", "1")))
+    if DATASTORE_MAX_INFLIGHT > 0 else None
+)
+REGISTRY.add_collector(lambda: [
+    (f"rate_limit_{name}", f"Rate limiter {name}", value)
+    for name, value in (rate_limiter.stats() if rate_limiter else {}).items()
+])
+REGISTRY.add_collector(lambda: [
+    (f"datastore_{name}", f"Datastore concurrency {name}", value)
+    for name, value in (datastore_limit.stats() if datastore_limit else {}).items()
+])
+# Likes on hot posts are summed in memory and written to posts.like_count in batches
+like_buffer = LikeCountBuffer(
+    interval=float(os.getenv("LIKE_FLUSH_INTERVAL", "1.0")),
+    max_pending=int(os.getenv("LIKE_FLUSH_MAX_PENDING", "1000"))
+)
+feed_cache = FeedCache(
+    max_entries=int(os.getenv("FEED_CACHE_SIZE", "256")),
+    ttl=float(os.getenv("FEED_CACHE_TTL", "30"))
+)
+# Post images are fetched and uploaded off the request path
+image_ingestor = ImageIngestor(
+    workers=int(os.getenv("IMAGE_WORKERS", "4")),
+    max_bytes=int(os.getenv("IMAGE_MAX_BYTES", str(10 * 1024 * 1024)))
+)
+# Hot endpoints await the async client; the rest run the sync client in the threadpool
+REGISTRY.add_collector(lambda: [
+    (f"feed_cache_{name}", f"Feed cache {name}", value)
+    for name, value in feed_cache.stats().items()
+])
+# Live feed deltas pushed to /events subscribers; slow subscribers are dropped
+event_hub = EventHub(queue_size=int(os.getenv("EVENT_QUEUE_SIZE", "256")))
+REGISTRY.add_collector(lambda: [
+    (f"events_{name}", f"Live event hub {name}", value)
+    for name, value in event_hub.stats().items()
+])
+# Inverted index over post content for /search, kept current by create_post
+search_index = SearchIndex()
+REGISTRY.add_collector(lambda: [
+    (f"search_index_{name}", f"Search index {name}", value)
+    for name, value in search_index.stats().items()
+])
+# Passwords are scrypt-hashed in a pool of PASSWORD_HASH_WORKERS threads (default: one per core)
+password_hasher = hasher_from_env()
+usernames = BloomFilter(
+    capacity=int(os.getenv("USERNAME_FILTER_CAPACITY", "1000000")),
+    error_rate=float(os.getenv("USERNAME_FILTER_ERROR_RATE", "0.01"))
+)
+REGISTRY.add_collector(lambda: [
+    (f"password_{name}", f"Password hasher {name}", value)
+    for name, value in password_hasher.stats().items()
+])
+REGISTRY.add_collector(lambda: [
+    (f"username_filter_{name}", f"Username filter {name}", value)
+    for name, value in usernames.stats().items()
+])
+# Optional write-ahead journal: with WRITE_JOURNAL_DIR set, posts, likes and comments are acknowledged
+# once fsynced to this worker's journal file and replayed to Supabase in order in the background.
+# The file is claimed in lifespan (start_journal), in the worker itself: one forked after preload
+# would inherit the file lock but not the writer thread, and its appends would never be acknowledged.
+WRITE_JOURNAL_DIR = os.getenv("WRITE_JOURNAL_DIR", "")
+db = AsyncDatabaseManager(like_buffer=like_buffer, image_ingestor=image_ingestor,
+                          password_hasher=password_hasher, usernames=usernames)
+# Home timelines: new post ids are pushed to followers' buffers, big accounts are merged at read time
+timelines = TimelineEngine(
+    db,
+    length=int(os.getenv("TIMELINE_LENGTH", "800")),
+    fanout_limit=int(os.getenv("TIMELINE_FANOUT_LIMIT", "10000")),
+    ttl=float(os.getenv("TIMELINE_TTL", "60")),
+    max_entries=int(os.getenv("TIMELINE_MAX_ENTRIES", "10000"))
+)
+REGISTRY.add_collector(lambda: [
+    (f"timeline_{name}", f"Timeline engine {name}", value)
+    for name, value in timelines.stats().items()
+])
+# Author profiles shared by every request's loader; at most one profile query per response
+profile_cache = ProfileCache(
+    max_entries=int(os.getenv("PROFILE_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("PROFILE_CACHE_TTL", "300"))
+)
+REGISTRY.add_collector(lambda: [
+    (f"profile_cache_{name}", f"Profile cache {name}", value)
+    for name, value in profile_cache.stats().items()
+])
+# Time-decayed like/comment scores behind /posts/trending
+trending = TrendingRanker(
+    half_life=float(os.getenv("TRENDING_HALF_LIFE", str(6 * 3600))),
+    k=int(os.getenv("TRENDING_TOP_K", "100"))
+)
+REGISTRY.add_collector(lambda: [
+    (f"trending_{name}", f"Trending ranker {name}", value)
+    for name, value in trending.stats().items()
+])
+social_platform = SocialMediaPlatform(
+    db=db,
+    feed_cache=feed_cache,
+    events=event_hub,
+    search_index=search_index,
+    timelines=timelines,
+    trending=trending,
+    profiles=profile_cache
+)
+# Exact like recount runs in the background; the hot path only does +/-1
+like_reconciler = LikeReconciler(social_platform.db)
+app.state.journal_replayer = None
+
+def start_journal():
+    """Claim this worker's journal and start replaying it; None without WRITE_JOURNAL_DIR"""
+    if not WRITE_JOURNAL_DIR:
+        return None
+    db.journal = claim_journal(WRITE_JOURNAL_DIR, fsync=os.getenv("WRITE_JOURNAL_FSYNC", "1") != "0")
+    replayer = JournalReplayer(
+        db.journal, db.apply_journal_entries, social_platform.journal_applied,
+        batch_size=int(os.getenv("JOURNAL_REPLAY_BATCH", "100")),
+        max_delay=float(os.getenv("JOURNAL_RETRY_MAX", "30"))
+    )
+    replayer.start()
+    return replayer
+
+def journal_stats() -> dict:
+    replayer = app.state.journal_replayer
+    return {**db.journal.stats(), **replayer.stats()} if replayer is not None else {}
+
+REGISTRY.add_collector(lambda: [
+    (f"journal_{name}", f"Write journal {name}", value)
+    for name, value in journal_stats().items()
+])
+# Stateless sessions: /login hands out a signed token, every request verifies it locally
+token_signer = signer_from_env()
+bearer_scheme = HTTPBearer(auto_error=False)
+
+def current_user(credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme)) -> dict:
+    if credentials is None:
+        raise HTTPException(status_code=401, detail="User not logged in",
+                            headers={"WWW-Authenticate": "Bearer"})
+    try:
+        return token_signer.verify(credentials.credentials)
+    except TokenError as e:
+        raise HTTPException(status_code=401, detail=str(e), headers={"WWW-Authenticate": "Bearer"})
 
 # --------------------------
 # Pydantic Models
@@ -51,29 +373,112 @@ class CommentSchema(BaseModel):
     post_id: int
     content: str
 
+class PostBatchSchema(BaseModel):
+    items: List[PostSchema]
+
+class LikeBatchSchema(BaseModel):
+    post_ids: List[int]
+
+class CommentBatchSchema(BaseModel):
+    items: List[CommentSchema]
+
+class FollowSchema(BaseModel):
+    user_id: int
+
+# Response models: only the fields the feed renders go on the wire
+class AuthorOut(BaseModel):
+    username: str
+
+class CommentOut(BaseModel):
+    id: int
+    user_id: Optional[int] = None
+    content: str
+    created_at: str
+    author: Optional[AuthorOut] = None
+
+class PostOut(BaseModel):
+    id: int
+    user_id: Optional[int] = None
+    content: str
+    image_url: Optional[str] = None
+    image_status: Optional[str] = None
+    like_count: int = 0
+    created_at: str
+    author: Optional[AuthorOut] = None
+    comments: List[CommentOut] = []
+    comment_count: int = 0
+
+class FeedPage(BaseModel):
+    posts: List[PostOut]
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+    error: Optional[str] = None
+    partial: bool = False
+
+class CommentsPage(BaseModel):
+    comments: List[CommentOut]
+    next_cursor: Optional[str] = None
+
+class ScoredPost(PostOut):
+    score: float
+
+class SearchPage(BaseModel):
+    posts: List[ScoredPost]
+
+class TrendingPage(BaseModel):
+    posts: List[ScoredPost]
+
+class UserOut(BaseModel):
+    id: int
+    username: str
+    created_at: Optional[str] = None
+
+class UsersPage(BaseModel):
+    users: List[UserOut]
+
+class TimelinePage(BaseModel):
+    posts: List[PostOut]
+    next_before: Optional[int] = None
+
 # --------------------------
 # User Endpoints
 # --------------------------
 @app.post("/signup")
-def signup(user: UserSchema):
-    result = social_platform.signup(user.username, user.password, user.role)
+async def signup(user: UserSchema):
+    admit_account("POST /signup", user.username)
+    # Hashing runs in the password pool; the event loop only awaits it
+    result = await social_platform.asignup(user.username, user.password, user.role)
     if "error" in result:
         raise HTTPException(status_code=400, detail=result["error"])
     return {"message": f"User {user.username} created successfully."}
 
 @app.post("/login")
-def login(user: UserSchema):
-    result = social_platform.login(user.username, user.password)
+async def login(user: UserSchema):
+    admit_account("POST /login", user.username)
+    result = await social_platform.aauthenticate(user.username, user.password)
     if "error" in result:
         raise HTTPException(status_code=400, detail=result["error"])
-    return {"message": result["message"], "username": user.username}
+    return {
+        "message": "Login successful",
+        "username": user.username,
+        "access_token": token_signer.issue(result),
+        "token_type": "bearer"
+    }
+
+@app.get("/users/batch", response_model=UsersPage)
+async def get_users(ids: List[int] = Query(...)):
+    """Public profiles for ?ids=1&ids=2..., in request order; unknown ids are left out"""
+    result = await social_platform.aget_users(ids)
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+    return result
 
 # --------------------------
 # Post Endpoints
 # --------------------------
 @app.post("/posts")
-def create_post(post: PostSchema):
-    result = social_platform.create_post(post.content, post.image_url)
+def create_post(post: PostSchema, user: dict = Depends(current_user)):
+    result = social_platform.create_post(post.content, post.image_url, user=user)
     if "error" in result:
         raise HTTPException(status_code=400, detail=result["error"])
     return {"message": "Post created successfully", "post": result}
@@ -82,43 +487,237 @@ def create_post(post: PostSchema):
 # def get_posts():
 #     posts = social_platform.get_posts()
 #     return {"posts": posts}
-@app.get("/posts")
-def get_posts():
-    try:
-        posts = social_platform.get_posts()
-        if posts is None:
-            posts = []
-        return {"posts": posts}
-    except Exception as e:
-        return {"posts": [], "error": str(e)}
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """304 when the client already holds the current representation"""
+    tags = request.headers.get("if-none-match", "")
+    if etag in (t.strip() for t in tags.split(",")) or tags.strip() == "*":
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+    return None
+
+@app.get("/posts", response_model=FeedPage)
+async def get_posts(
+    request: Request,
+    response: Response,
+    limit: int = Query(20, ge=1, le=100),
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+):
+    # Tag before reading: a write racing with this read changes the next tag, never this one
+    etag = social_platform.feed_etag("posts", limit, before, after)
+    unchanged = not_modified(request, etag)
+    if unchanged is not None:
+        return unchanged
+    page = await social_platform.aget_posts(limit=limit, before=before, after=after)
+    if page.get("unavailable"):
+        # No ETag and no body a client could mistake for an empty feed
+        raise HTTPException(status_code=503, detail=page["error"], headers={"Retry-After": "1"})
+    if "error" in page:
+        raise HTTPException(status_code=400, detail=page["error"])
+    if page.get("partial"):
+        # Only this worker's pending posts: never let a client revalidate against it
+        response.headers["Cache-Control"] = "no-store"
+        return page
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+    return page
+
+EXPORT_FLUSH_BYTES = 64 * 1024
+
+def ndjson_line(row: dict) -> bytes:
+    if orjson is None:
+        return json.dumps(row, separators=(",", ":"), default=str).encode() + b"\n"
+    return orjson.dumps(row, option=orjson.OPT_APPEND_NEWLINE)
+
+# Declared before /posts/{post_id} so "export" is not parsed as an id
+@app.get("/posts/export")
+async def export_posts(since: Optional[datetime] = None):
+    """Every post created after `since`, oldest first, as NDJSON streamed chunk by chunk"""
+    rows = social_platform.aexport_posts(since=since.isoformat() if since else None)
+
+    async def stream():
+        buffer = bytearray()
+        try:
+            async for row in rows:
+                buffer += ndjson_line(row)
+                if len(buffer) >= EXPORT_FLUSH_BYTES:
+                    yield bytes(buffer)
+                    buffer.clear()
+        except Exception as e:
+            # Headers are already sent; tell the consumer the export is incomplete
+            logger.error("Export failed: %s", e)
+            buffer += ndjson_line({"error": "Export interrupted"})
+        if buffer:
+            yield bytes(buffer)
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+@app.get("/posts/trending", response_model=TrendingPage)
+async def trending_posts(limit: int = Query(20, ge=1, le=100)):
+    """Posts with the most recent likes and comments, highest decayed score first"""
+    return await social_platform.atrending_posts(limit=limit)
+
+@app.get("/posts/{post_id}", response_model=PostOut)
+async def get_post(post_id: int, request: Request, response: Response):
+    etag = social_platform.feed_etag("post", post_id)
+    unchanged = not_modified(request, etag)
+    if unchanged is not None:
+        return unchanged
+    post = await social_platform.aget_post(post_id)
+    if post is None:
+        raise HTTPException(status_code=404, detail="Post not found")
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+    return post
+
+@app.get("/search", response_model=SearchPage)
+async def search(q: str = Query(..., min_length=1, max_length=200), limit: int = Query(20, ge=1, le=100)):
+    """Posts matching every word of `q` (last word as a prefix); #hashtags and @mentions work too"""
+    return await social_platform.asearch(q, limit=limit)
+
+# --------------------------
+# Follow / Timeline Endpoints
+# --------------------------
+@app.post("/follow")
+def follow(target: FollowSchema, user: dict = Depends(current_user)):
+    result = social_platform.follow(target.user_id, user=user)
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+    return result
+
+@app.post("/unfollow")
+def unfollow(target: FollowSchema, user: dict = Depends(current_user)):
+    result = social_platform.unfollow(target.user_id, user=user)
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+    return result
+
+@app.get("/timeline", response_model=TimelinePage)
+def timeline(
+    limit: int = Query(20, ge=1, le=100),
+    before: Optional[int] = Query(None, description="next_before from the previous page"),
+    user: dict = Depends(current_user),
+):
+    """Posts by the accounts you follow and your own, newest first"""
+    page = social_platform.timeline(limit=limit, before=before, user=user)
+    if "error" in page:
+        raise HTTPException(status_code=400, detail=page["error"])
+    return page
+
+@app.get("/cache/stats")
+def cache_stats():
+    return {"feed": feed_cache.stats(), "profiles": profile_cache.stats()}
+
+# --------------------------
+# Batch Endpoints (per-item results; a fixed number of DB round trips per batch)
+# --------------------------
+@app.post("/posts/batch")
+def create_posts(batch: PostBatchSchema, user: dict = Depends(current_user)):
+    result = social_platform.create_posts([p.model_dump() for p in batch.items], user=user)
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+    return result
+
+@app.post("/posts/like/batch")
+def like_posts(batch: LikeBatchSchema, user: dict = Depends(current_user)):
+    result = social_platform.like_posts(batch.post_ids, user=user)
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+    return result
+
+@app.post("/posts/unlike/batch")
+def unlike_posts(batch: LikeBatchSchema, user: dict = Depends(current_user)):
+    result = social_platform.unlike_posts(batch.post_ids, user=user)
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+    return result
+
+@app.post("/posts/comment/batch")
+def comment_posts(batch: CommentBatchSchema, user: dict = Depends(current_user)):
+    result = social_platform.comment_posts([c.model_dump() for c in batch.items], user=user)
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+    return result
+
+# --------------------------
+# Live updates (Server-Sent Events)
+# --------------------------
+EVENT_HEARTBEAT = float(os.getenv("EVENT_HEARTBEAT", "15"))
+
+@app.get("/events")
+async def events():
+    """Stream post_created, like_count_changed, comment_added and image_changed deltas as they happen"""
+    sub = event_hub.subscribe()
+
+    async def stream():
+        try:
+            while True:
+                try:
+                    yield await asyncio.wait_for(sub.__anext__(), EVENT_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    # Comment line keeps proxies from closing an idle stream
+                    yield ": ping\n\n"
+                except StopAsyncIteration:
+                    break
+        finally:
+            sub.close()
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+        # Already-encoded responses pass through the compression middleware untouched,
+        # so frames are flushed one by one instead of buffered by gzip
+        "Content-Encoding": "identity",
+    })
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
 
 # --------------------------
 # Like / Unlike Endpoints
 # --------------------------
+def like_response(result: dict, message: str) -> dict:
+    # The card updates from this count; no follow-up read needed. A journaled like is
+    # acknowledged before its count is known, and the next feed read shows it.
+    if result.get("pending"):
+        return {"message": message, "pending": True}
+    return {"message": result.get("message", message), "like_count": result["like_count"]}
+
 @app.post("/posts/like")
-def like_post(like: LikeSchema):
-    result = social_platform.like_post(like.post_id)
+async def like_post(like: LikeSchema, user: dict = Depends(current_user)):
+    result = await social_platform.alike_post(like.post_id, user=user)
     if "error" in result:
         raise HTTPException(status_code=400, detail=result["error"])
-    return {"message": "Post liked successfully"}
+    return like_response(result, "Post liked successfully")
 
 @app.post("/posts/unlike")
-def unlike_post(like: LikeSchema):
-    result = social_platform.unlike_post(like.post_id)
+async def unlike_post(like: LikeSchema, user: dict = Depends(current_user)):
+    result = await social_platform.aunlike_post(like.post_id, user=user)
     if "error" in result:
         raise HTTPException(status_code=400, detail=result["error"])
-    return {"message": "Post unliked successfully"}
+    return like_response(result, "Post unliked successfully")
 
 # --------------------------
 # Comment Endpoint
 # --------------------------
 @app.post("/posts/comment")
-def comment_post(comment: CommentSchema):
-    result = social_platform.comment_post(comment.post_id, comment.content)
+async def comment_post(comment: CommentSchema, user: dict = Depends(current_user)):
+    result = await social_platform.acomment_post(comment.post_id, comment.content, user=user)
     if "error" in result:
         raise HTTPException(status_code=400, detail=result["error"])
     return {"message": "Comment added successfully", "comment": result}
 
+@app.get("/posts/{post_id}/comments", response_model=CommentsPage)
+async def get_comments(
+    post_id: int,
+    limit: int = Query(20, ge=1, le=100),
+    before: Optional[str] = None,
+):
+    page = await social_platform.aget_comments(post_id, limit=limit, before=before)
+    if "error" in page:
+        raise HTTPException(status_code=400, detail=page["error"])
+    return page
+
 # --------------------------
 # Run the app
 # --------------------------
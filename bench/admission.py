@@ -0,0 +1,137 @@
+"""Admission control: well-behaved users' latency while one client hammers /posts/like.
+
+    python -m bench.admission --users 40 --seconds 10 --abuse-rate 400 --capacity 16
+
+Runs the FastAPI app in-process (httpx ASGI transport, like bench.loadtest)
+on top of bench.fake_supabase. The fake database serves `--capacity` calls
+at full speed and slows down in proportion past that, like a saturated
+connection pool. `--users` polite users each make about one request per
+`--interval` (feed, like/unlike, comment). For each setting (limits off,
+then on) the bench runs a baseline phase, then a phase where one extra
+user fires `--abuse-rate` like/unlike requests per second from
+`--abusers` connections. It reports polite p50/p99 and errors, and what
+the abuser got back. With limits on, the abuser should mostly get fast
+429s, and polite p99 should stay near the baseline.
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_KEY", "bench.bench.bench")
+os.environ.setdefault("SECRET_KEY", "bench-secret")
+
+from bench.fake_supabase import FakeClient, FakeAsyncClient
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def polite_user(http, headers, post_ids, args, rng, stop, latencies, statuses):
+    while time.perf_counter() < stop:
+        await asyncio.sleep(args.interval * rng.uniform(0.5, 1.5))
+        action = rng.random()
+        post_id = rng.choice(post_ids)
+        started = time.perf_counter()
+        if action < 0.5:
+            response = await http.get("/posts", params={"limit": 20})
+        elif action < 0.8:
+            response = await http.post("/posts/like" if rng.random() < 0.5 else "/posts/unlike",
+                                       json={"post_id": post_id}, headers=headers)
+        else:
+            response = await http.post("/posts/comment", json={"post_id": post_id, "content": "nice"},
+                                       headers=headers)
+        latencies.append(time.perf_counter() - started)
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+
+async def abuser(http, headers, post_id, args, stop, statuses):
+    pause = args.abusers / args.abuse_rate
+    liked = False
+    while time.perf_counter() < stop:
+        liked = not liked
+        response = await http.post("/posts/like" if liked else "/posts/unlike", json={"post_id": post_id},
+                                   headers=headers)
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+        await asyncio.sleep(pause)
+
+
+async def phase(http, users, abuser_headers, post_ids, args, rng, abuse: bool):
+    latencies, polite_statuses, abuse_statuses = [], {}, {}
+    stop = time.perf_counter() + args.seconds
+    tasks = [polite_user(http, headers, post_ids, args, random.Random(rng.random()), stop, latencies,
+                         polite_statuses) for headers in users]
+    if abuse:
+        tasks += [abuser(http, abuser_headers, post_ids[0], args, stop, abuse_statuses)
+                  for _ in range(args.abusers)]
+    await asyncio.gather(*tasks)
+    return latencies, polite_statuses, abuse_statuses
+
+
+async def main_async(args):
+    import httpx
+
+    fake = FakeClient(latency=args.latency, jitter=args.jitter, seed=args.seed, capacity=args.capacity)
+    from src.db import set_client
+    set_client(fake)
+    import API.main as api
+    from src.limits import ConcurrencyLimit, RateLimiter, parse_limits
+    api.social_platform.db.asb = FakeAsyncClient(fake)
+    # Setup traffic (signups, logins, seed posts) runs unlimited
+    protected = (RateLimiter(parse_limits(os.getenv("RATE_LIMITS"), api.RATE_LIMITS)),
+                 ConcurrencyLimit(args.max_inflight))
+    api.rate_limiter, api.datastore_limit = None, None
+
+    rng = random.Random(args.seed)
+    async with api.app.router.lifespan_context(api.app):
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://admission") as http:
+            async def login(name):
+                await http.post("/signup", json={"username": name, "password": "pw"})
+                token = (await http.post("/login", json={"username": name, "password": "pw"})).json()["access_token"]
+                return {"Authorization": f"Bearer {token}"}
+
+            users = [await login(f"polite{i}") for i in range(args.users)]
+            abuser_headers = await login("abuser")
+            post_ids = []
+            for i in range(20):
+                response = await http.post("/posts", json={"content": f"seed {i}"}, headers=users[i % len(users)])
+                post_ids.append(response.json()["post"]["post"]["id"])
+
+            print(f"{'limits':<8}{'phase':<10}{'polite req':>11}{'p50 ms':>9}{'p99 ms':>9}{'errors':>8}"
+                  f"{'abuser req':>12}{'ok':>7}{'429':>7}{'503':>7}")
+            for name, (limiter, cap) in (("off", (None, None)), ("on", protected)):
+                api.rate_limiter, api.datastore_limit = limiter, cap
+                for abuse in (False, True):
+                    latencies, polite, abused = await phase(http, users, abuser_headers, post_ids, args, rng, abuse)
+                    errors = sum(n for code, n in polite.items() if code >= 400)
+                    print(f"{name:<8}{'abuse' if abuse else 'baseline':<10}{len(latencies):>11}"
+                          f"{percentile(latencies, 50) * 1000:>9.1f}{percentile(latencies, 99) * 1000:>9.1f}"
+                          f"{errors:>8}{sum(abused.values()):>12}{abused.get(200, 0):>7}"
+                          f"{abused.get(429, 0):>7}{abused.get(503, 0):>7}")
+            limiter, cap = protected
+            print(f"rate limiter: {limiter.stats()}; datastore cap: {cap.stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=40)
+    parser.add_argument("--interval", type=float, default=0.5, help="seconds between a polite user's requests")
+    parser.add_argument("--seconds", type=float, default=10.0, help="length of each phase")
+    parser.add_argument("--abusers", type=int, default=32, help="connections used by the abusive client")
+    parser.add_argument("--abuse-rate", type=float, default=400, help="abusive requests per second")
+    parser.add_argument("--latency", type=float, default=0.01, help="simulated Supabase round trip in seconds")
+    parser.add_argument("--jitter", type=float, default=0.5)
+    parser.add_argument("--capacity", type=int, default=16, help="calls the fake database serves at full speed")
+    parser.add_argument("--max-inflight", type=int, default=int(os.getenv("DATASTORE_MAX_INFLIGHT", "64")))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Throughput of the sync vs async data layer for /posts and /posts/like.
+
+    python -m bench.async_throughput --latency 0.05 --requests 2000
+
+Starts a local stand-in for the Supabase REST API (fixed latency, canned
+rows) in its own process, so it does not share the client's GIL, and drives
+the same calls the endpoints make:
+
+* sync:  DatabaseManager from a 40-thread pool, i.e. what sync `def`
+         endpoints get from FastAPI/anyio's default threadpool
+* async: AsyncDatabaseManager awaited with `--concurrency` requests in flight
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def standin_app(latency: float, page_size: int):
+    """Minimal ASGI app answering the two PostgREST calls the benchmark makes"""
+    posts = [
+        {"id": i, "user_id": 1, "content": f"post {i}", "image_url": None, "like_count": i,
+         "created_at": f"2024-01-01T00:00:{i % 60:02d}+00:00", "comments": [],
+         "comment_total": [{"count": 0}]}
+        for i in range(page_size + 1)
+    ]
+    bodies = {
+        "/rest/v1/posts": json.dumps(posts).encode(),
+        "/rest/v1/rpc/set_like": json.dumps([{"changed": True, "like_count": 1}]).encode(),
+    }
+
+    async def app(scope, receive, send):
+        if scope["type"] != "http":
+            return
+        more = True
+        while more:
+            more = (await receive()).get("more_body", False)
+        await asyncio.sleep(latency)
+        body = bodies.get(scope["path"], b"[]")
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": body})
+
+    return app
+
+
+def serve_standin(port: int, latency: float, page_size: int):
+    import uvicorn
+
+    uvicorn.run(standin_app(latency, page_size), host="127.0.0.1", port=port, log_level="warning", backlog=4096)
+
+
+def start_standin(latency: float, page_size: int) -> str:
+    port = _free_port()
+    multiprocessing.Process(target=serve_standin, args=(port, latency, page_size), daemon=True).start()
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            break
+        except OSError:
+            time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+def run_sync(db, call, n, threads=40):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(lambda _: call(db), range(n)))
+    return n / (time.perf_counter() - start)
+
+
+async def run_async(db, call, n, concurrency):
+    gate = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with gate:
+            await call(db)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(n)))
+    return n / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.05, help="stand-in response delay in seconds")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--page-size", type=int, default=20)
+    args = parser.parse_args()
+
+    url = start_standin(args.latency, args.page_size)
+    os.environ["SUPABASE_URL"] = url
+    os.environ["SUPABASE_KEY"] = "bench.bench.bench"
+
+    from src.db import DatabaseManager
+    from src.async_db import AsyncDatabaseManager
+
+    user = {"id": 1, "username": "bench"}
+    sync_db = DatabaseManager()
+    sync_db.current_user = user
+
+    async def async_suite():
+        adb = await AsyncDatabaseManager().connect()
+        adb.current_user = user
+        feed = await run_async(adb, lambda d: d.aget_posts(limit=args.page_size), args.requests, args.concurrency)
+        like = await run_async(adb, lambda d: d.alike_post(1), args.requests, args.concurrency)
+        return feed, like
+
+    sync_feed = run_sync(sync_db, lambda d: d.get_posts(limit=args.page_size), args.requests)
+    sync_like = run_sync(sync_db, lambda d: d.like_post(1), args.requests)
+    async_feed, async_like = asyncio.run(async_suite())
+
+    print(f"{'':<12}{'sync req/s':>12}{'async req/s':>13}{'speedup':>9}")
+    print(f"{'/posts':<12}{sync_feed:>12.0f}{async_feed:>13.0f}{async_feed / sync_feed:>8.1f}x")
+    print(f"{'/posts/like':<12}{sync_like:>12.0f}{async_like:>13.0f}{async_like / sync_like:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Items per second for one-at-a-time vs batch likes, comments and posts.
+
+    python -m bench.batch_throughput --latency 0.02 --items 200
+
+Runs against bench.fake_supabase with a fixed simulated round trip, so the
+numbers are driven by the number of sequential calls per item.
+"""
+import argparse
+import os
+import time
+
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_KEY", "bench.bench.bench")
+
+from bench.fake_supabase import FakeClient
+from src.db import DatabaseManager
+
+USER = {"id": 1, "username": "bench"}
+
+
+def timed(client, fn):
+    before, started = client.round_trips, time.perf_counter()
+    fn()
+    return time.perf_counter() - started, client.round_trips - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.02, help="simulated Supabase round trip in seconds")
+    parser.add_argument("--items", type=int, default=200)
+    parser.add_argument("--batch-sizes", default="10,50,100")
+    args = parser.parse_args()
+
+    client = FakeClient(latency=args.latency)
+    db = DatabaseManager(client=client)
+    post_ids = [p["post"]["id"] for p in db.create_posts([{"content": f"p{i}"} for i in range(100)], USER)["results"]]
+
+    def single(n):
+        return {
+            "posts": lambda: [db.create_post("hello", user=USER) for _ in range(n)],
+            "likes": lambda: [db.like_post(post_ids[i % len(post_ids)], user=USER) for i in range(n)],
+            "unlikes": lambda: [db.unlike_post(post_ids[i % len(post_ids)], user=USER) for i in range(n)],
+            "comments": lambda: [db.comment_post(post_ids[i % len(post_ids)], "nice", user=USER) for i in range(n)],
+        }
+
+    def batched(n, size):
+        chunks = [range(i, min(i + size, n)) for i in range(0, n, size)]
+        return {
+            "posts": lambda: [db.create_posts([{"content": "hello"} for _ in c], USER) for c in chunks],
+            "likes": lambda: [db.set_likes([post_ids[i % len(post_ids)] for i in c], True, USER) for c in chunks],
+            "unlikes": lambda: [db.set_likes([post_ids[i % len(post_ids)] for i in c], False, USER) for c in chunks],
+            "comments": lambda: [db.comment_posts([{"post_id": post_ids[i % len(post_ids)], "content": "nice"}
+                                                   for i in c], USER) for c in chunks],
+        }
+
+    runs = [("1 (single)", single(args.items))]
+    runs += [(str(size), batched(args.items, size)) for size in map(int, args.batch_sizes.split(","))]
+    print(f"{'batch':<12}{'action':<10}{'items/s':>10}{'trips/item':>12}")
+    for label, actions in runs:
+        for action, fn in actions.items():
+            elapsed, trips = timed(client, fn)
+            print(f"{label:<12}{action:<10}{args.items / elapsed:>10.0f}{trips / args.items:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
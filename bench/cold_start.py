@@ -0,0 +1,81 @@
+"""Cold start: import time of the backend and time to the first /posts byte.
+
+    python -m bench.cold_start --runs 5
+
+Each run starts a fresh interpreter, so nothing is cached between runs:
+
+* import:  `import src.db` and `import API.main` in a new process
+* first byte: uvicorn serving API.main in a new process, from spawn until the
+  first byte of `GET /posts` arrives. Supabase is the local stand-in from
+  bench.async_throughput, so the numbers include client construction and the
+  lifespan warm-up but not a real network round trip.
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_time(module: str, env: dict) -> float:
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env,
+                         capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def first_byte(env: dict, timeout: float = 30.0) -> float:
+    port = _free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "API.main:app", "--port", str(port),
+                               "--log-level", "warning"], cwd=ROOT, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with socket.create_connection(("127.0.0.1", port), timeout=1) as conn:
+                    conn.sendall(b"GET /posts HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n")
+                    if conn.recv(1):
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.005)
+        raise RuntimeError("API did not answer /posts in time")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.0, help="stand-in response delay in seconds")
+    args = parser.parse_args()
+
+    from bench.async_throughput import start_standin
+
+    env = dict(os.environ, SUPABASE_URL=start_standin(args.latency, 20),
+               SUPABASE_KEY="bench.bench.bench", SECRET_KEY="bench-secret")
+
+    results = {
+        "import src.db": [import_time("src.db", env) for _ in range(args.runs)],
+        "import API.main": [import_time("API.main", env) for _ in range(args.runs)],
+        "spawn -> /posts first byte": [first_byte(env) for _ in range(args.runs)],
+    }
+    print(f"{'':<28}{'median ms':>10}{'min ms':>9}{'max ms':>9}")
+    for name, samples in results.items():
+        print(f"{name:<28}{statistics.median(samples) * 1000:>10.1f}"
+              f"{min(samples) * 1000:>9.1f}{max(samples) * 1000:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""Live updates: N idle /events subscribers on one API process.
+
+    python -m bench.event_fanout --subscribers 5000 --events 50
+
+Starts the API in a separate process on top of bench.fake_supabase, opens
+`--subscribers` Server-Sent Events streams to it, then likes and unlikes a
+post `--events` times over HTTP. Reports the server's memory with and
+without the subscribers and how long each like took to reach every
+subscriber (p50/p99/max over all deliveries). Needs a file descriptor limit
+above the subscriber count; the script raises the soft limit when it can.
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import resource
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EVENT_ID = re.compile(rb"id: (\d+)\n")
+
+
+def raise_fd_limit(needed: int):
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < needed:
+        target = needed if hard == resource.RLIM_INFINITY else min(needed, hard)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+
+
+def serve(port: int, subscribers: int):
+    """Run the API against the fake (child process)"""
+    raise_fd_limit(subscribers * 2 + 1024)
+    os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+    os.environ.setdefault("SUPABASE_KEY", "bench.bench.bench")
+    os.environ.setdefault("SECRET_KEY", "bench-secret")
+    # Thousands of subscribers from one address
+    os.environ.setdefault("RATE_LIMITS", "off")
+    import uvicorn
+    from bench.fake_supabase import FakeClient, FakeAsyncClient
+    from src.db import set_client
+
+    fake = FakeClient()
+    set_client(fake)
+    from API.main import app, social_platform
+    social_platform.db.asb = FakeAsyncClient(fake)
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning", backlog=subscribers + 128)
+
+
+def rss_kib(pid: int) -> int:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+def call(base: str, method: str, path: str, body=None, token=None) -> dict:
+    headers = {"Content-Type": "application/json"}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    data = json.dumps(body).encode() if body is not None else None
+    with urllib.request.urlopen(urllib.request.Request(base + path, data, headers, method=method)) as r:
+        return json.loads(r.read())
+
+
+async def subscribe(port: int, arrivals: dict, ready: asyncio.Event, connected: list):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(b"GET /events HTTP/1.1\r\nHost: bench\r\nAccept: text/event-stream\r\n\r\n")
+    await writer.drain()
+    await reader.readuntil(b"\r\n\r\n")
+    connected[0] += 1
+    await ready.wait()
+    while True:
+        chunk = await reader.read(65536)
+        if not chunk:
+            return
+        now = time.perf_counter()
+        for match in EVENT_ID.finditer(chunk):
+            arrivals.setdefault(int(match.group(1)), []).append(now)
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def run(args, port: int, pid: int):
+    base = f"http://127.0.0.1:{port}"
+    call(base, "POST", "/signup", {"username": "bench", "password": "pw"})
+    token = call(base, "POST", "/login", {"username": "bench", "password": "pw"})["access_token"]
+    post_id = call(base, "POST", "/posts", {"content": "live"}, token)["post"]["post"]["id"]
+    idle_rss = rss_kib(pid)
+
+    arrivals, connected, ready = {}, [0], asyncio.Event()
+    tasks = []
+    for start in range(0, args.subscribers, 500):
+        batch = [asyncio.create_task(subscribe(port, arrivals, ready, connected))
+                 for _ in range(start, min(start + 500, args.subscribers))]
+        tasks.extend(batch)
+        while connected[0] < len(tasks):
+            await asyncio.sleep(0.01)
+    ready.set()
+    loaded_rss = rss_kib(pid)
+
+    sent = {}
+    for i in range(1, args.events + 1):
+        sent[i] = time.perf_counter()
+        await asyncio.to_thread(call, base, "POST", "/posts/like" if i % 2 else "/posts/unlike",
+                                {"post_id": post_id}, token)
+        await asyncio.sleep(args.gap)
+    deadline = time.perf_counter() + 10
+    while time.perf_counter() < deadline and sum(len(v) for v in arrivals.values()) < args.events * len(tasks):
+        await asyncio.sleep(0.05)
+
+    delays = [t - sent[i] for i, times in arrivals.items() if i in sent for t in times]
+    metrics = urllib.request.urlopen(base + "/metrics").read().decode()
+    dropped = re.search(r"^events_dropped (\S+)$", metrics, re.M)
+    for task in tasks:
+        task.cancel()
+
+    print(f"subscribers: {connected[0]}, events: {args.events}, "
+          f"delivered: {len(delays)}/{args.events * connected[0]}, dropped: {dropped.group(1) if dropped else '?'}")
+    print(f"server RSS: {idle_rss / 1024:.1f} MiB idle, {loaded_rss / 1024:.1f} MiB with subscribers "
+          f"({(loaded_rss - idle_rss) / max(connected[0], 1):.1f} KiB each)")
+    if delays:
+        print(f"like -> subscriber latency: p50 {percentile(delays, 50) * 1000:.1f} ms, "
+              f"p99 {percentile(delays, 99) * 1000:.1f} ms, max {max(delays) * 1000:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--subscribers", type=int, default=5000)
+    parser.add_argument("--events", type=int, default=50)
+    parser.add_argument("--gap", type=float, default=0.05, help="seconds between likes")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.port, args.subscribers)
+        return
+
+    raise_fd_limit(args.subscribers + 1024)
+    server = subprocess.Popen([sys.executable, "-m", "bench.event_fanout", "--serve", "--port", str(args.port),
+                               "--subscribers", str(args.subscribers)], cwd=ROOT)
+    try:
+        deadline = time.time() + 30
+        while True:
+            try:
+                urllib.request.urlopen(f"http://127.0.0.1:{args.port}/cache/stats")
+                break
+            except OSError:
+                if time.time() > deadline:
+                    raise RuntimeError("API did not start")
+                time.sleep(0.1)
+        asyncio.run(run(args, args.port, server.pid))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
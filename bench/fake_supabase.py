@@ -0,0 +1,507 @@
+"""In-memory stand-in for the parts of the supabase client that src/db.py uses.
+
+Every `execute()` counts as one round trip and sleeps for the configured
+latency, so benchmarks can compare call patterns without a live project.
+"""
+import asyncio
+import contextvars
+import itertools
+import random
+import threading
+import time
+from datetime import datetime, timezone
+
+# Holds a one-item list while a request is being served; every round trip made
+# on behalf of that request (including in threadpool workers) bumps it.
+ROUND_TRIP_SCOPE = contextvars.ContextVar("round_trip_scope", default=None)
+
+
+class FakeAPIError(Exception):
+    """Stand-in for postgrest's APIError: a message plus the Postgres SQLSTATE in `code`"""
+
+    def __init__(self, message: str, code: str):
+        super().__init__(message)
+        self.code = code
+
+
+class FakeResponse:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+def _coerce(value: str):
+    value = value.strip('"')
+    if value in ("true", "false"):
+        return value == "true"
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+def _split_top_level(expr: str):
+    """Split a PostgREST logic expression on commas that are not inside parentheses"""
+    parts, depth, current = [], 0, ""
+    for ch in expr:
+        if ch == "," and depth == 0:
+            parts.append(current)
+            current = ""
+            continue
+        depth += ch == "("
+        depth -= ch == ")"
+        current += ch
+    parts.append(current)
+    return parts
+
+
+_OPS = {
+    "eq": lambda a, b: a == b,
+    "neq": lambda a, b: a != b,
+    "gt": lambda a, b: a is not None and a > b,
+    "gte": lambda a, b: a is not None and a >= b,
+    "lt": lambda a, b: a is not None and a < b,
+    "lte": lambda a, b: a is not None and a <= b,
+}
+
+
+def _parse_logic(expr: str):
+    """Turn `a.gt.1,and(b.eq.2,c.lt.3)` into a row predicate (top level is OR)"""
+    def term(t):
+        if t.startswith("and(") or t.startswith("or("):
+            kind, inner = t.split("(", 1)
+            preds = [term(x) for x in _split_top_level(inner[:-1])]
+            combine = all if kind == "and" else any
+            return lambda row: combine(p(row) for p in preds)
+        column, op, value = t.split(".", 2)
+        value = _coerce(value)
+        return lambda row: _OPS[op](row.get(column), value)
+
+    preds = [term(t) for t in _split_top_level(expr)]
+    return lambda row: any(p(row) for p in preds)
+
+
+class FakeQuery:
+    def __init__(self, client, table: str):
+        self.client = client
+        self.table = table
+        self.action = "select"
+        self.payload = None
+        self.columns = ["*"]
+        self.embeds = []
+        self.count = None
+        self.filters = []
+        self.orders = []
+        self.limit_n = None
+        self.foreign = {}   # embedded table -> {"orders": [...], "limit": n}
+        self.offset = 0
+        self.on_conflict = None
+        self.ignore_duplicates = False
+
+    # -- actions --------------------------------------------------------
+    def select(self, *columns, count=None):
+        self.columns, self.embeds = [], []
+        for item in _split_top_level(",".join(columns) if columns else "*"):
+            item = item.strip()
+            if "(" in item:
+                # Embedded resource: `alias:table(col, ...)` joined on <parent>_id, or `table!column(...)`
+                name, cols = item[:-1].split("(", 1)
+                alias, _, table = name.rpartition(":")
+                self.embeds.append((alias or table, table, [c.strip() for c in cols.split(",")]))
+            else:
+                self.columns.append(item)
+        self.count = count
+        return self
+
+    def insert(self, data, **kwargs):
+        self.action, self.payload = "insert", data
+        return self
+
+    def upsert(self, data, on_conflict=None, ignore_duplicates=False, **kwargs):
+        self.action, self.payload = "upsert", data
+        self.on_conflict = on_conflict
+        self.ignore_duplicates = ignore_duplicates
+        return self
+
+    def update(self, data):
+        self.action, self.payload = "update", data
+        return self
+
+    def delete(self):
+        self.action = "delete"
+        return self
+
+    # -- filters --------------------------------------------------------
+    def _filter(self, column, op, value):
+        self.filters.append(lambda row: _OPS[op](row.get(column), value))
+        return self
+
+    def eq(self, column, value):
+        return self._filter(column, "eq", value)
+
+    def neq(self, column, value):
+        return self._filter(column, "neq", value)
+
+    def gt(self, column, value):
+        return self._filter(column, "gt", value)
+
+    def gte(self, column, value):
+        return self._filter(column, "gte", value)
+
+    def lt(self, column, value):
+        return self._filter(column, "lt", value)
+
+    def lte(self, column, value):
+        return self._filter(column, "lte", value)
+
+    def in_(self, column, values):
+        values = set(values)
+        self.filters.append(lambda row: row.get(column) in values)
+        return self
+
+    def match(self, query: dict):
+        for column, value in query.items():
+            self.eq(column, value)
+        return self
+
+    def or_(self, filters: str, **kwargs):
+        self.filters.append(_parse_logic(filters))
+        return self
+
+    def order(self, column, desc=False, foreign_table=None, **kwargs):
+        if foreign_table:
+            self.foreign.setdefault(foreign_table, {}).setdefault("orders", []).append((column, desc))
+        else:
+            self.orders.append((column, desc))
+        return self
+
+    def limit(self, n, foreign_table=None, **kwargs):
+        if foreign_table:
+            self.foreign.setdefault(foreign_table, {})["limit"] = n
+        else:
+            self.limit_n = n
+        return self
+
+    def range(self, start, end, **kwargs):
+        self.offset, self.limit_n = start, end - start + 1
+        return self
+
+    # -- execution ------------------------------------------------------
+    def _matching(self, rows):
+        return [r for r in rows if all(f(r) for f in self.filters)]
+
+    def _project(self, row):
+        out = dict(row) if "*" in self.columns else {c: row.get(c) for c in self.columns}
+        for alias, table, cols in self.embeds:
+            table, _, hint = table.partition("!")
+            if hint:
+                # Many-to-one via the hinted column: `author:profiles!user_id(username)`
+                parent = next((p for p in self.client.tables.get(table, []) if p.get("id") == row.get(hint)), None)
+                out[alias] = None if parent is None else {k: parent.get(k) for k in cols}
+                continue
+            fk = self.table[:-1] + "_id"
+            children = [c for c in self.client.tables.get(table, []) if c.get(fk) == row.get("id")]
+            if cols == ["count"]:
+                out[alias] = [{"count": len(children)}]
+                continue
+            options = self.foreign.get(table, {})
+            for column, desc in reversed(options.get("orders", [])):
+                children.sort(key=lambda r: r.get(column), reverse=desc)
+            if options.get("limit") is not None:
+                children = children[:options["limit"]]
+            out[alias] = [dict(c) if cols == ["*"] else {k: c.get(k) for k in cols} for c in children]
+        return out
+
+    def execute(self):
+        self.client.round_trip()
+        return self.run()
+
+    def run(self):
+        with self.client.lock:
+            return getattr(self, "_exec_" + self.action)(self.client.tables.setdefault(self.table, []))
+
+    def _exec_select(self, rows):
+        result = self._matching(rows)
+        for column, desc in reversed(self.orders):
+            result.sort(key=lambda r: (r.get(column) is None, r.get(column)), reverse=desc)
+        total = len(result)
+        result = result[self.offset:]
+        if self.limit_n is not None:
+            result = result[:self.limit_n]
+        if self.client.max_rows:
+            result = result[:self.client.max_rows]
+        return FakeResponse([self._project(r) for r in result], total if self.count else None)
+
+    def _exec_insert(self, rows):
+        items = self.payload if isinstance(self.payload, list) else [self.payload]
+        created = []
+        for item in items:
+            row = dict(item)
+            self.client.check_unique(self.table, rows, row)
+            row.setdefault("id", next(self.client.ids))
+            row.setdefault("created_at", self.client.now())
+            rows.append(row)
+            created.append(dict(row))
+        return FakeResponse(created)
+
+    def _exec_upsert(self, rows):
+        keys = [k.strip() for k in (self.on_conflict or "id").split(",")]
+        items = self.payload if isinstance(self.payload, list) else [self.payload]
+        written = []
+        for item in items:
+            existing = next((r for r in rows if all(r.get(k) == item.get(k) for k in keys)), None)
+            if existing is None:
+                row = dict(item)
+                row.setdefault("id", next(self.client.ids))
+                row.setdefault("created_at", self.client.now())
+                rows.append(row)
+                written.append(dict(row))
+            elif not self.ignore_duplicates:
+                existing.update(item)
+                written.append(dict(existing))
+        return FakeResponse(written)
+
+    def _exec_update(self, rows):
+        changed = []
+        for row in self._matching(rows):
+            row.update(self.payload)
+            changed.append(dict(row))
+        return FakeResponse(changed)
+
+    def _exec_delete(self, rows):
+        doomed = self._matching(rows)
+        doomed_ids = {id(r) for r in doomed}
+        rows[:] = [r for r in rows if id(r) not in doomed_ids]
+        return FakeResponse([dict(r) for r in doomed])
+
+
+class FakeRPC:
+    def __init__(self, client, name, params):
+        self.client, self.name, self.params = client, name, params
+
+    def execute(self):
+        self.client.round_trip()
+        return self.run()
+
+    def run(self):
+        with self.client.lock:
+            return FakeResponse(self.client.functions[self.name](self.client, **self.params))
+
+
+class FakeBucket:
+    def __init__(self, client, bucket):
+        self.client, self.bucket = client, bucket
+
+    def upload(self, path, file, file_options=None):
+        self.client.round_trip()
+        objects = self.client.buckets.setdefault(self.bucket, {})
+        if path in objects:
+            raise Exception("The resource already exists (Duplicate)")
+        objects[path] = file
+        return {"Key": f"{self.bucket}/{path}"}
+
+    def get_public_url(self, path):
+        return f"http://fake-storage/{self.bucket}/{path}"
+
+
+class FakeStorage:
+    def __init__(self, client):
+        self.client = client
+
+    def from_(self, bucket):
+        return FakeBucket(self.client, bucket)
+
+
+# --------------------------
+# Python versions of the functions in sql/
+# --------------------------
+def _set_like(client, p_post_id, p_user_id, p_liked, p_bump_count=True):
+    likes = client.tables.setdefault("likes", [])
+    posts = client.tables.setdefault("posts", [])
+    existing = [r for r in likes if r["post_id"] == p_post_id and r["user_id"] == p_user_id]
+    post = next((p for p in posts if p["id"] == p_post_id), None)
+    changed = bool(p_liked) != bool(existing)
+    if changed and p_liked:
+        likes.append({"id": next(client.ids), "post_id": p_post_id, "user_id": p_user_id,
+                      "created_at": client.now()})
+    elif changed:
+        likes[:] = [r for r in likes if r not in existing]
+    if changed and p_bump_count and post is not None:
+        post["like_count"] = max((post.get("like_count") or 0) + (1 if p_liked else -1), 0)
+    return [{"changed": changed, "like_count": (post or {}).get("like_count") or 0}]
+
+
+def _apply_like_deltas(client, p_deltas):
+    deltas = {d["post_id"]: d["delta"] for d in p_deltas}
+    for post in client.tables.setdefault("posts", []):
+        if post["id"] in deltas:
+            post["like_count"] = max((post.get("like_count") or 0) + deltas[post["id"]], 0)
+    return []
+
+
+def _reconcile_like_counts(client, p_post_ids):
+    likes = client.tables.setdefault("likes", [])
+    for post in client.tables.setdefault("posts", []):
+        if post["id"] in p_post_ids:
+            post["like_count"] = sum(1 for r in likes if r["post_id"] == post["id"])
+    return []
+
+
+def _set_follow(client, p_follower_id, p_followee_id, p_follow):
+    follows = client.tables.setdefault("follows", [])
+    profiles = client.tables.setdefault("profiles", [])
+    existing = [r for r in follows if r["follower_id"] == p_follower_id and r["followee_id"] == p_followee_id]
+    profile = next((p for p in profiles if p["id"] == p_followee_id), None)
+    changed = bool(p_follow) != bool(existing)
+    if changed and p_follow:
+        follows.append({"follower_id": p_follower_id, "followee_id": p_followee_id, "created_at": client.now()})
+    elif changed:
+        follows[:] = [r for r in follows if r not in existing]
+    if changed and profile is not None:
+        profile["follower_count"] = max((profile.get("follower_count") or 0) + (1 if p_follow else -1), 0)
+    return [{"changed": changed, "follower_count": (profile or {}).get("follower_count") or 0}]
+
+
+def _apply_journal_entries(client, p_entries, p_bump_count=True):
+    # The real function runs in one transaction; check every entry first so a bad one changes nothing
+    known = {p["id"] for p in client.tables.setdefault("posts", [])}
+    for entry in p_entries:
+        if entry["key"] not in client.journal_keys and entry["op"] != "create_post" \
+                and entry["args"]["post_id"] not in known:
+            raise FakeAPIError("insert or update violates foreign key constraint on post_id", code="23503")
+    results = []
+    for entry in p_entries:
+        if entry["key"] not in client.journal_keys:
+            args, op = entry["args"], entry["op"]
+            if op == "create_post":
+                row = {"id": next(client.ids), "content": args["content"], "user_id": entry["user_id"],
+                       "image_url": None, "image_status": "pending" if args.get("image_url") else None,
+                       "like_count": 0, "created_at": entry["at"]}
+                client.tables["posts"].append(row)
+            elif op == "comment":
+                row = {"id": next(client.ids), "post_id": args["post_id"], "user_id": entry["user_id"],
+                       "content": args["content"], "created_at": entry["at"]}
+                client.tables.setdefault("comments", []).append(row)
+            else:
+                row = _set_like(client, args["post_id"], entry["user_id"], op == "like", p_bump_count)[0]
+            client.journal_keys[entry["key"]] = dict(row)
+        results.append(dict(client.journal_keys[entry["key"]]))
+    return results
+
+
+class FakeClient:
+    """Drop-in for `supabase.Client` backed by Python lists.
+
+    latency is the simulated network round trip in seconds; jitter adds a
+    uniformly random extra fraction of it to each call. With `capacity` set,
+    the database serves that many calls at full speed and slows every call
+    down in proportion beyond it, like a saturated connection pool. Setting
+    `down` makes every call fail after its latency, like an outage. Selects
+    return at most `max_rows` rows whatever their limit, as PostgREST does.
+    """
+
+    UNIQUE = {"likes": ("post_id", "user_id"), "profiles": ("username",), "follows": ("follower_id", "followee_id")}
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, seed: int = 0, capacity: int = 0,
+                 max_rows: int = 1000):
+        self.latency = latency
+        self.max_rows = max_rows
+        self.jitter = jitter
+        self.capacity = capacity
+        self.inflight = 0
+        self.down = False
+        self.random = random.Random(seed)
+        self.tables = {}
+        self.buckets = {}
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+        self.round_trips = 0
+        self.journal_keys = {}  # journal_applied: key -> stored result
+        self.storage = FakeStorage(self)
+        self.functions = {
+            "set_like": _set_like,
+            "apply_like_deltas": _apply_like_deltas,
+            "reconcile_like_counts": _reconcile_like_counts,
+            "set_follow": _set_follow,
+            "apply_journal_entries": _apply_journal_entries,
+        }
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    def rpc(self, name, params=None):
+        return FakeRPC(self, name, params or {})
+
+    def round_trip(self):
+        try:
+            time.sleep(self._count_round_trip())
+        finally:
+            self._done()
+        if self.down:
+            raise ConnectionError("Supabase is unreachable")
+
+    async def around_trip(self):
+        try:
+            await asyncio.sleep(self._count_round_trip())
+        finally:
+            self._done()
+        if self.down:
+            raise ConnectionError("Supabase is unreachable")
+
+    def _done(self):
+        with self.lock:
+            self.inflight -= 1
+
+    def _count_round_trip(self) -> float:
+        with self.lock:
+            self.round_trips += 1
+            self.inflight += 1
+            scope = ROUND_TRIP_SCOPE.get()
+            if scope is not None:
+                scope[0] += 1
+            if not self.latency:
+                return 0
+            load = max(1.0, self.inflight / self.capacity) if self.capacity else 1.0
+            return self.latency * load * (1 + self.jitter * self.random.random())
+
+    def check_unique(self, table, rows, row):
+        keys = self.UNIQUE.get(table)
+        if keys and any(all(r.get(k) == row.get(k) for k in keys) for r in rows):
+            raise Exception(f"duplicate key value violates unique constraint on {table}")
+
+    @staticmethod
+    def now():
+        return datetime.now(timezone.utc).isoformat()
+
+
+class FakeAsyncQuery:
+    """Awaitable view of a FakeQuery/FakeRPC, mirroring supabase's async builders"""
+
+    def __init__(self, query):
+        self._query = query
+
+    def __getattr__(self, name):
+        method = getattr(self._query, name)
+
+        def chain(*args, **kwargs):
+            method(*args, **kwargs)
+            return self
+        return chain
+
+    async def execute(self):
+        await self._query.client.around_trip()
+        return self._query.run()
+
+
+class FakeAsyncClient:
+    """Drop-in for `supabase.AsyncClient` sharing a FakeClient's tables"""
+
+    def __init__(self, sync_client: FakeClient):
+        self.sync = sync_client
+        self.storage = sync_client.storage
+
+    def table(self, name):
+        return FakeAsyncQuery(self.sync.table(name))
+
+    def rpc(self, name, params=None):
+        return FakeAsyncQuery(self.sync.rpc(name, params))
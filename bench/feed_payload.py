@@ -0,0 +1,96 @@
+"""Bytes on the wire and serialization CPU for one feed page.
+
+    python -m bench.feed_payload --posts 20 --extra-columns 4 --iterations 2000
+
+Builds a feed page from bench.fake_supabase twice: with the old `*` select
+and with the projected FEED_SELECT. The fake only stores what it is seeded
+with, so use `--extra-columns` to mimic columns your posts table has that the
+feed never renders.
+
+Each page is serialized the way FastAPI does it: the default JSONResponse
+(jsonable_encoder + json.dumps) for the old endpoint, and the FeedPage
+response model + ORJSONResponse for the new one. Reports body size raw and
+gzipped, and microseconds per page.
+"""
+import argparse
+import gzip
+import os
+import time
+
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_KEY", "bench.bench.bench")
+os.environ.setdefault("SECRET_KEY", "bench-secret")
+
+from bench.fake_supabase import FakeClient
+from src.db import DatabaseManager, FEED_COMMENT_PREVIEW, shape_post
+
+LEGACY_SELECT = "*, comments(id, user_id, content, created_at), comment_total:comments(count)"
+
+
+def seed(client: FakeClient, posts: int, extra_columns: int):
+    client.tables["profiles"] = [{"id": 1, "username": "alice", "password": "x" * 60, "role": "user",
+                                  "created_at": client.now()}]
+    for i in range(1, posts + 1):
+        client.tables["posts"].append({
+            "id": i, "user_id": 1, "content": f"post number {i} " + "lorem ipsum " * 8,
+            "image_url": f"https://example.supabase.co/storage/v1/object/public/images/{i:064x}.jpg",
+            "image_status": "ready", "like_count": i * 3, "created_at": client.now(),
+            **{f"extra_{k}": "x" * 64 for k in range(extra_columns)},
+        })
+        for j in range(FEED_COMMENT_PREVIEW * 3):
+            client.tables["comments"].append({
+                "id": i * 100 + j, "post_id": i, "user_id": 1, "content": f"comment {j}",
+                "created_at": client.now(),
+            })
+
+
+def timed(fn, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--posts", type=int, default=20)
+    parser.add_argument("--extra-columns", type=int, default=0, help="unrendered 64-byte columns per post")
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse, ORJSONResponse
+    from API.main import FeedPage
+
+    client = FakeClient()
+    client.tables.update(posts=[], comments=[])
+    seed(client, args.posts, args.extra_columns)
+
+    legacy_rows = (
+        client.table("posts").select(LEGACY_SELECT)
+        .order("created_at", desc=True, foreign_table="comments")
+        .limit(FEED_COMMENT_PREVIEW, foreign_table="comments")
+        .order("created_at", desc=True).order("id", desc=True)
+        .limit(args.posts).execute().data
+    )
+    legacy_page = {"posts": [shape_post(p) for p in legacy_rows], "next_cursor": None, "prev_cursor": None}
+    page = DatabaseManager(client=client).get_posts(limit=args.posts)
+
+    def legacy():
+        return JSONResponse(jsonable_encoder(legacy_page)).body
+
+    def projected():
+        model = FeedPage.model_validate(page)
+        return ORJSONResponse(model.model_dump(mode="json")).body
+
+    rows = [
+        ("select * + JSONResponse", legacy(), timed(legacy, args.iterations)),
+        ("projection + FeedPage + orjson", projected(), timed(projected, args.iterations)),
+    ]
+    print(f"{'':<32}{'bytes':>8}{'gzip':>8}{'us/page':>10}")
+    for name, body, micros in rows:
+        print(f"{name:<32}{len(body):>8}{len(gzip.compress(body)):>8}{micros:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""Crash recovery for the write journal: kill -9 mid-stream, reopen, replay twice.
+
+    python -m bench.journal_crash --rounds 5
+
+Each round starts a child process that journals posts, likes and comments
+from several threads and prints each entry's key once its append is
+acknowledged. The parent SIGKILLs it at a random moment and appends half a
+record, as a torn write would leave. It then reopens the journal and checks
+that every acknowledged entry survived, with no gaps in the sequence.
+
+Next it replays the journal into bench.fake_supabase and "crashes" after the
+datastore applied a batch, with none of the applied markers on disk, then
+reopens and replays everything again. The idempotency keys must leave one
+row per post and comment, and the likes a single in-order pass would give.
+Exits non-zero on any mismatch.
+"""
+import argparse
+import os
+import random
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_KEY", "bench.bench.bench")
+
+from bench.fake_supabase import FakeClient
+from src.db import DatabaseManager
+from src.journal import JournalReplayer, WriteJournal
+
+POSTS = 50
+USERS = 20
+
+
+def child(path: str, seed: int, threads: int):
+    """Journal random writes until killed, printing each key once it is durable"""
+    journal = WriteJournal(path)
+    out = threading.Lock()
+
+    def writer(i):
+        rng, created = random.Random(seed * 100 + i), []
+        while True:
+            user = {"id": rng.randint(1, USERS), "username": "crash"}
+            post_id = rng.choice(created) if created and rng.random() < 0.3 else rng.randint(1, POSTS)
+            kind = rng.random()
+            if kind < 0.1:
+                entry = journal.append("create_post", user, {"content": f"crash {i}", "image_url": ""}).result()
+                created.append(WriteJournal.provisional_id(entry))
+            elif kind < 0.3:
+                entry = journal.append("comment", user, {"post_id": post_id, "content": "hi"}).result()
+            else:
+                entry = journal.append(rng.choice(("like", "unlike")), user, {"post_id": post_id}).result()
+            with out:
+                sys.stdout.write(entry["key"] + "\n")
+                sys.stdout.flush()
+
+    for i in range(threads):
+        threading.Thread(target=writer, args=(i,), daemon=True).start()
+    threading.Event().wait()
+
+
+def kill_mid_stream(path: str, seed: int, args) -> set:
+    proc = subprocess.Popen([sys.executable, "-m", "bench.journal_crash", "--child", path, "--seed", str(seed),
+                             "--threads", str(args.threads)], stdout=subprocess.PIPE, text=True)
+    acked = set()
+    reader = threading.Thread(target=lambda: acked.update(line.strip() for line in proc.stdout))
+    reader.start()
+    time.sleep(random.Random(seed).uniform(0.3, args.max_run))
+    proc.send_signal(signal.SIGKILL)
+    proc.wait()
+    reader.join()
+    # A line cut off by the kill is not an ack
+    return {key for key in acked if len(key) == 32}
+
+
+def strip_markers(path: str):
+    """Drop every applied marker, as if none had reached the disk before the crash"""
+    with open(path, "rb") as f:
+        lines = [line for line in f if b'"applied"' not in line]
+    with open(path, "wb") as f:
+        f.writelines(lines)
+
+
+def expected_likes(entries: list, resolve) -> set:
+    liked = {}
+    for entry in entries:
+        if entry["op"] in ("like", "unlike"):
+            liked[(resolve(entry["args"]["post_id"]), entry["user"]["id"])] = entry["op"] == "like"
+    return {key for key, value in liked.items() if value}
+
+
+def run_round(directory: str, seed: int, args) -> bool:
+    path = os.path.join(directory, f"round-{seed}.log")
+    acked = kill_mid_stream(path, seed, args)
+    with open(path, "ab") as f:
+        f.write(b'{"seq":999999,"key":"torn')
+
+    journal = WriteJournal(path)
+    # Every pending entry; next_batch would stop at the first reference to a provisional post id
+    entries = [dict(e, args=dict(e["args"])) for e in journal._pending.values()]
+    seqs = [e["seq"] for e in entries]
+    lost = acked - {e["key"] for e in entries}
+    problems = []
+    if lost:
+        problems.append(f"{len(lost)} acknowledged entries lost")
+    if seqs != list(range(1, len(seqs) + 1)):
+        problems.append("gap in recovered sequence numbers")
+
+    client = FakeClient()
+    client.tables["posts"] = [{"id": next(client.ids), "user_id": 1, "content": f"seed {i}", "like_count": 0,
+                               "created_at": client.now()} for i in range(POSTS)]
+    db = DatabaseManager(client=client)
+    replayer = JournalReplayer(journal, db.apply_journal_entries, batch_size=args.batch)
+    for _ in range(args.batches_before_crash):
+        batch = journal.next_batch(args.batch)
+        if batch:
+            replayer.replay(batch)
+    batch = journal.next_batch(args.batch)
+    if batch:
+        # The datastore commits this batch, then the process dies before marking it
+        db.apply_journal_entries(batch)
+    journal.close()
+    strip_markers(path)
+
+    journal = WriteJournal(path)
+    replayer = JournalReplayer(journal, db.apply_journal_entries, batch_size=args.batch)
+    while True:
+        batch = journal.next_batch(args.batch)
+        if not batch:
+            break
+        replayer.replay(batch)
+    stats = journal.stats()
+
+    creates = sum(e["op"] == "create_post" for e in entries)
+    comments = sum(e["op"] == "comment" for e in entries)
+    posts = len(client.tables["posts"]) - POSTS
+    likes = {(r["post_id"], r["user_id"]) for r in client.tables.get("likes", [])}
+    want = expected_likes(entries, journal.resolve)
+    counts_ok = all(p["like_count"] == sum(1 for post_id, _ in likes if post_id == p["id"])
+                    for p in client.tables["posts"])
+    if stats["pending"] or stats["failed"]:
+        problems.append(f"{stats['pending']} pending, {stats['failed']} failed after replay")
+    if posts != creates:
+        problems.append(f"{posts} posts for {creates} create entries")
+    if len(client.tables.get("comments", [])) != comments:
+        problems.append(f"{len(client.tables.get('comments', []))} comments for {comments} comment entries")
+    if likes != want or len(client.tables.get("likes", [])) != len(likes):
+        problems.append("likes differ from an in-order pass")
+    if not counts_ok:
+        problems.append("like_count out of step with likes")
+    journal.close()
+
+    print(f"round {seed}: {len(acked)} acked, {len(entries)} recovered, {creates} posts, {comments} comments, "
+          f"{len(likes)} likes -> {'; '.join(problems) or 'OK'}")
+    return not problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--threads", type=int, default=4, help="writer threads in the child")
+    parser.add_argument("--max-run", type=float, default=1.5, help="longest the child runs before the kill")
+    parser.add_argument("--batch", type=int, default=50, help="replay batch size")
+    parser.add_argument("--batches-before-crash", type=int, default=3)
+    parser.add_argument("--dir", default=".", help="where the journal files go (a temporary subdirectory)")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--seed", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.seed, args.threads)
+        return
+    directory = tempfile.mkdtemp(prefix="bench-journal-crash-", dir=args.dir)
+    try:
+        results = [run_round(directory, seed, args) for seed in range(1, args.rounds + 1)]
+    finally:
+        shutil.rmtree(directory)
+    print(f"{sum(results)}/{len(results)} rounds recovered cleanly")
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
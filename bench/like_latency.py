@@ -0,0 +1,70 @@
+"""Like/unlike latency: old check-insert-count-update sequence vs the set_like RPC.
+
+    python -m bench.like_latency --latency 0.02 --clicks 200
+
+Both paths run against bench.fake_supabase with the same simulated round
+trip, so the difference is purely the number of sequential calls.
+"""
+import argparse
+import os
+import statistics
+import time
+
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_KEY", "bench.bench.bench")
+
+from bench.fake_supabase import FakeClient
+from src.db import DatabaseManager
+
+
+def legacy_toggle(client, post_id, user_id, liked):
+    """The pre-RPC like_post/unlike_post: four sequential round trips"""
+    existing = client.table("likes").select("id").eq("post_id", post_id).eq("user_id", user_id).execute()
+    if liked and not existing.data:
+        client.table("likes").insert({"post_id": post_id, "user_id": user_id}).execute()
+    elif not liked and existing.data:
+        client.table("likes").delete().eq("post_id", post_id).eq("user_id", user_id).execute()
+    count = client.table("likes").select("id", count="exact").eq("post_id", post_id).execute().count
+    client.table("posts").update({"like_count": count}).eq("id", post_id).execute()
+    return count
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def run(name, clicks, toggle):
+    samples = []
+    for i in range(clicks):
+        start = time.perf_counter()
+        toggle(i % 2 == 0)
+        samples.append((time.perf_counter() - start) * 1000)
+    print(f"{name:<8} p50={percentile(samples, 50):7.2f}ms  p99={percentile(samples, 99):7.2f}ms  "
+          f"mean={statistics.mean(samples):7.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.02, help="simulated round trip in seconds")
+    parser.add_argument("--jitter", type=float, default=0.5, help="extra random fraction of latency")
+    parser.add_argument("--clicks", type=int, default=200)
+    args = parser.parse_args()
+
+    user = {"id": 1, "username": "bench"}
+
+    legacy = FakeClient(args.latency, args.jitter)
+    legacy.table("posts").insert({"content": "hot post", "like_count": 0}).execute()
+    run("before", args.clicks, lambda liked: legacy_toggle(legacy, 1, user["id"], liked))
+    print(f"         round trips per click: {legacy.round_trips / (args.clicks + 1):.1f}")
+
+    fake = FakeClient(args.latency, args.jitter)
+    fake.table("posts").insert({"content": "hot post", "like_count": 0}).execute()
+    db = DatabaseManager(client=fake)
+    db.current_user = user
+    run("after", args.clicks, lambda liked: db.like_post(1) if liked else db.unlike_post(1))
+    print(f"         round trips per click: {fake.round_trips / (args.clicks + 1):.1f}")
+
+
+if __name__ == "__main__":
+    main()
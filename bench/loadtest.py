@@ -0,0 +1,197 @@
+"""Mixed-workload load test of the FastAPI app against an in-process Supabase fake.
+
+    python -m bench.loadtest --users 50 --requests 5000 --latency 0.01
+
+The Supabase client in src.db is swapped for bench.fake_supabase before the
+API is imported. Requests are driven in-process through httpx's ASGI
+transport, so the numbers cover routing, validation, auth, caching, the data
+layer and serialization, but not the network to the API itself.
+
+Reports throughput plus p50/p95/p99 latency and DB round trips per request
+for each endpoint. Use `--json` to get machine-readable output for PRs.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_KEY", "bench.bench.bench")
+os.environ.setdefault("SECRET_KEY", "bench-secret")
+# Every simulated user signs up and logs in from one address; measure the app, not the limiter
+os.environ.setdefault("RATE_LIMITS", "off")
+
+from bench.fake_supabase import FakeClient, FakeAsyncClient, ROUND_TRIP_SCOPE
+
+# Share of each action in the steady-state mix
+WORKLOAD = {
+    "feed": 50,
+    "like": 15,
+    "unlike": 10,
+    "comment": 10,
+    "post": 5,
+    "login": 5,
+    "signup": 5,
+}
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class LoadTest:
+    def __init__(self, http, seed_posts: int, rng: random.Random):
+        self.http = http
+        self.rng = rng
+        self.seed_posts = seed_posts
+        self.latencies = {}
+        self.round_trips = {}
+        self.errors = {}
+        self.users = []
+        self.post_ids = []
+        self._signups = 0
+
+    async def call(self, name, method, url, **kwargs):
+        scope = [0]
+        token = ROUND_TRIP_SCOPE.set(scope)
+        started = time.perf_counter()
+        try:
+            response = await self.http.request(method, url, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            ROUND_TRIP_SCOPE.reset(token)
+        self.latencies.setdefault(name, []).append(elapsed)
+        self.round_trips.setdefault(name, []).append(scope[0])
+        if response.status_code >= 400:
+            self.errors[name] = self.errors.get(name, 0) + 1
+        return response
+
+    async def signup(self):
+        self._signups += 1
+        username = f"user{self._signups}-{self.rng.randrange(1 << 30)}"
+        await self.call("signup", "POST", "/signup", json={"username": username, "password": "pw"})
+        return username
+
+    async def login(self, username):
+        response = await self.call("login", "POST", "/login", json={"username": username, "password": "pw"})
+        token = response.json().get("access_token")
+        return {"Authorization": f"Bearer {token}"}
+
+    async def setup(self, users: int):
+        for _ in range(users):
+            username = await self.signup()
+            self.users.append((username, await self.login(username)))
+        for i in range(self.seed_posts):
+            _, headers = self.rng.choice(self.users)
+            response = await self.call("post", "POST", "/posts", json={"content": f"seed post {i}"}, headers=headers)
+            post = response.json().get("post", {}).get("post", {})
+            if "id" in post:
+                self.post_ids.append(post["id"])
+        for samples in (self.latencies, self.round_trips, self.errors):
+            samples.clear()
+
+    async def step(self, headers):
+        action = self.rng.choices(list(WORKLOAD), weights=list(WORKLOAD.values()))[0]
+        post_id = self.rng.choice(self.post_ids) if self.post_ids else 1
+        if action == "feed":
+            await self.call("feed", "GET", "/posts", params={"limit": 20})
+        elif action in ("like", "unlike"):
+            await self.call(action, "POST", f"/posts/{action}", json={"post_id": post_id}, headers=headers)
+        elif action == "comment":
+            await self.call("comment", "POST", "/posts/comment",
+                            json={"post_id": post_id, "content": "nice"}, headers=headers)
+        elif action == "post":
+            response = await self.call("post", "POST", "/posts", json={"content": "hello"}, headers=headers)
+            post = response.json().get("post", {}).get("post", {})
+            if "id" in post:
+                self.post_ids.append(post["id"])
+        elif action == "login":
+            await self.login(self.rng.choice(self.users)[0])
+        else:
+            await self.signup()
+
+    async def run(self, requests: int, concurrency: int):
+        remaining = requests
+
+        async def worker():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                _, headers = self.rng.choice(self.users)
+                await self.step(headers)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return time.perf_counter() - started
+
+    def report(self, elapsed: float) -> dict:
+        endpoints = {}
+        for name, samples in sorted(self.latencies.items()):
+            trips = self.round_trips[name]
+            endpoints[name] = {
+                "requests": len(samples),
+                "errors": self.errors.get(name, 0),
+                "p50_ms": percentile(samples, 50) * 1000,
+                "p95_ms": percentile(samples, 95) * 1000,
+                "p99_ms": percentile(samples, 99) * 1000,
+                "db_round_trips": sum(trips) / len(trips),
+            }
+        total = sum(e["requests"] for e in endpoints.values())
+        return {"requests": total, "seconds": elapsed, "rps": total / elapsed, "endpoints": endpoints}
+
+
+def print_report(result: dict, background_trips: int):
+    print(f"{result['requests']} requests in {result['seconds']:.2f}s = {result['rps']:.0f} req/s")
+    print(f"{'endpoint':<10}{'reqs':>7}{'errors':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'db/req':>8}")
+    for name, e in result["endpoints"].items():
+        print(f"{name:<10}{e['requests']:>7}{e['errors']:>8}{e['p50_ms']:>9.2f}{e['p95_ms']:>9.2f}"
+              f"{e['p99_ms']:>9.2f}{e['db_round_trips']:>8.2f}")
+    print(f"background round trips (buffer flush, reconcile, images): {background_trips}")
+
+
+async def main_async(args):
+    import httpx
+
+    fake = FakeClient(latency=args.latency, jitter=args.jitter, seed=args.seed)
+    from src.db import set_client
+    set_client(fake)                # every component that uses the shared client now talks to the fake
+    from API.main import app, social_platform
+    social_platform.db.asb = FakeAsyncClient(fake)
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest") as http:
+            test = LoadTest(http, args.seed_posts, random.Random(args.seed))
+            await test.setup(args.users)
+            before = fake.round_trips
+            elapsed = await test.run(args.requests, args.concurrency)
+            attributed = sum(sum(t) for t in test.round_trips.values())
+    result = test.report(elapsed)
+    result["background_round_trips"] = fake.round_trips - before - attributed
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--seed-posts", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.01, help="simulated Supabase round trip in seconds")
+    parser.add_argument("--jitter", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print the result as JSON")
+    args = parser.parse_args()
+
+    result = asyncio.run(main_async(args))
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print_report(result, result["background_round_trips"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Sustained logins per second per core, and signup queries saved by the username filter.
+
+    python -m bench.login_throughput --costs 4096,16384,32768 --seconds 5
+
+Logs in from `--clients` threads against bench.fake_supabase for
+`--seconds` at each scrypt cost, with the password pool sized to
+`--workers` (default: one per core), and reports logins/s, logins/s per
+core and login latency. Then signs up `--signups` fresh usernames, plus a
+share of already-taken ones, with the Bloom filter bootstrapped and
+without it, and counts the existence queries each run made.
+"""
+import argparse
+import os
+import threading
+import time
+
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_KEY", "bench.bench.bench")
+
+from bench.fake_supabase import FakeClient
+from src.auth import PasswordHasher
+from src.bloom import BloomFilter
+from src.db import DatabaseManager
+from src.metrics import DB_CALLS
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def logins(cost: int, args, cores: int):
+    hasher = PasswordHasher(n=cost, workers=args.workers or cores)
+    db = DatabaseManager(client=FakeClient(latency=args.latency), password_hasher=hasher)
+    for i in range(args.clients):
+        db.signup(f"user{i}", "correct horse battery staple")
+
+    latencies, stop = [], time.perf_counter() + args.seconds
+
+    def client(i):
+        while time.perf_counter() < stop:
+            t = time.perf_counter()
+            assert "error" not in db.authenticate(f"user{i}", "correct horse battery staple")
+            latencies.append(time.perf_counter() - t)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(args.clients)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    hasher.shutdown()
+    rate = len(latencies) / elapsed
+    print(f"{cost:>8}{hasher.workers:>9}{rate:>10.1f}{rate / min(hasher.workers, cores):>10.1f}"
+          f"{percentile(latencies, 50) * 1000:>9.1f}{percentile(latencies, 99) * 1000:>9.1f}")
+
+
+def exists_queries() -> float:
+    return sum(v for k, v in DB_CALLS._values.items() if k[0] == "profiles.exists")
+
+
+def signups(args):
+    taken = [f"taken{i}" for i in range(args.taken)]
+    fresh = [f"fresh{i}" for i in range(args.signups)]
+    # Cheap hashes: this part counts queries, not CPU
+    for bootstrap in (False, True):
+        client = FakeClient(latency=args.latency)
+        client.tables["profiles"] = [{"id": i, "username": name, "password": "x"} for i, name in enumerate(taken)]
+        db = DatabaseManager(client=client, password_hasher=PasswordHasher(n=2 ** 4), usernames=BloomFilter())
+        if bootstrap:
+            db.usernames.bootstrap(db.export_usernames())
+        before_queries, before_trips = exists_queries(), client.round_trips
+        attempts = fresh + taken[:len(fresh) // 10]
+        rejected = sum("error" in db.signup(name, "pw") for name in attempts)
+        print(f"filter {'ready' if bootstrap else 'off  '}: {len(attempts)} signups ({rejected} taken), "
+              f"{exists_queries() - before_queries:.0f} existence queries, "
+              f"{(client.round_trips - before_trips) / len(attempts):.2f} round trips per signup")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--costs", default="4096,16384,32768", help="scrypt N values")
+    parser.add_argument("--workers", type=int, default=0, help="password pool size (default: one per core)")
+    parser.add_argument("--clients", type=int, default=16, help="concurrent login threads")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated Supabase round trip in seconds")
+    parser.add_argument("--signups", type=int, default=2000)
+    parser.add_argument("--taken", type=int, default=10_000, help="existing profiles for the signup run")
+    args = parser.parse_args()
+
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+    print(f"{cores} core(s) available")
+    print(f"{'scrypt N':>8}{'workers':>9}{'logins/s':>10}{'per core':>10}{'p50 ms':>9}{'p99 ms':>9}")
+    for cost in map(int, args.costs.split(",")):
+        logins(cost, args, cores)
+    signups(args)
+
+
+if __name__ == "__main__":
+    main()
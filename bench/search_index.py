@@ -0,0 +1,90 @@
+"""Search index: build time, memory per post and query latency.
+
+    python -m bench.search_index --posts 1000000 --queries 2000
+
+Indexes synthetic posts (Zipf-distributed words, some #hashtags and
+@mentions) into src.search.SearchIndex in this process, then times a mix of
+queries: common and rare words, two-word AND, prefixes, hashtags and
+mentions. Memory is measured with tracemalloc, which slows the build; pass
+`--no-memory` to skip it.
+"""
+import argparse
+import itertools
+import random
+import time
+import tracemalloc
+
+from src.search import SearchIndex
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def make_vocab(size: int, rng: random.Random) -> list:
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return ["".join(rng.choice(letters) for _ in range(rng.randint(3, 9))) for _ in range(size)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--posts", type=int, default=1_000_000)
+    parser.add_argument("--words", type=int, default=12, help="words per post")
+    parser.add_argument("--vocab", type=int, default=50_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", action="store_true")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    vocab = make_vocab(args.vocab, rng)
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(args.vocab)))
+    tags = [f"#{w}" for w in vocab[:500]]
+    users = [f"@{w}" for w in vocab[500:2500]]
+
+    def content():
+        words = rng.choices(vocab, cum_weights=cum_weights, k=args.words)
+        if rng.random() < 0.2:
+            words.append(rng.choice(tags))
+        if rng.random() < 0.1:
+            words.append(rng.choice(users))
+        return " ".join(words)
+
+    index = SearchIndex()
+    if not args.no_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    index.bootstrap({"id": i, "content": content()} for i in range(1, args.posts + 1))
+    build = time.perf_counter() - started
+    if not args.no_memory:
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+    # Query mix, drawn from the same distribution as the content
+    mix = {
+        "common word": lambda: rng.choice(vocab[:20]),
+        "rare word": lambda: rng.choice(vocab[-20000:]),
+        "two words": lambda: " ".join(rng.choices(vocab[:2000], k=2)),
+        "prefix": lambda: rng.choice(vocab[:5000])[:3],
+        "hashtag": lambda: rng.choice(tags),
+        "mention": lambda: rng.choice(users),
+    }
+    stats = index.stats()
+    print(f"indexed {stats['posts']} posts, {stats['terms']} terms, {stats['postings']} postings in {build:.1f}s")
+    if not args.no_memory:
+        print(f"index memory: {memory / 2**20:.1f} MiB ({memory / max(stats['posts'], 1):.0f} bytes per post)")
+    print(f"{'query':<14}{'p50 us':>9}{'p99 us':>9}{'max us':>9}{'hits':>7}")
+    for name, make in mix.items():
+        samples, hits = [], 0
+        for _ in range(args.queries):
+            query = make()
+            t = time.perf_counter()
+            hits += len(index.search(query, 20))
+            samples.append((time.perf_counter() - t) * 1e6)
+        print(f"{name:<14}{percentile(samples, 50):>9.0f}{percentile(samples, 99):>9.0f}"
+              f"{max(samples):>9.0f}{hits / args.queries:>7.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Home timelines: post fan-out cost and timeline read latency.
+
+    python -m bench.timeline --followers 10000,1000000 --active 0.1
+
+For each follower count, one author is followed by that many readers, and
+`--active` of those readers have a live timeline buffer (they read
+recently). The bench times src.timeline.TimelineEngine.on_post for new
+posts by that author, then warm reads (buffer in memory) and cold reads
+(buffer rebuilt from the database). The follow graph lives in a small
+in-process table with a simulated `--latency` per query, so the numbers
+show the engine's own cost plus its round trips; /timeline adds one
+batched hydrate (get_posts_by_ids) per read on top. Each scale is run with
+the default fan-out limit and with `--push-all` forcing fan-out on write,
+which shows why big accounts are merged at read time instead. Times are
+milliseconds per new post (`post`) and per read (`warm`, `cold`).
+"""
+import argparse
+import heapq
+import random
+import time
+
+from src.db import FOLLOWS_PAGE_SIZE
+from src.timeline import TimelineEngine, FANOUT_LIMIT, TIMELINE_LENGTH
+
+AUTHOR = 0
+
+
+class Graph:
+    """The four DatabaseManager reads the engine uses, over one author and `followers` readers"""
+
+    def __init__(self, followers: int, posts: int, latency: float):
+        self.followers = followers
+        self.latency = latency
+        self.round_trips = 0
+        self.next_id = 1
+        self.posts = {AUTHOR: []}       # author -> post ids, ascending
+        for _ in range(posts):
+            self.add_post(AUTHOR)
+
+    def add_post(self, author_id: int) -> int:
+        post_id, self.next_id = self.next_id, self.next_id + 1
+        self.posts.setdefault(author_id, []).append(post_id)
+        return post_id
+
+    def _trip(self):
+        self.round_trips += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def get_follower_count(self, user_id: int) -> int:
+        self._trip()
+        return self.followers if user_id == AUTHOR else 0
+
+    def get_follower_ids(self, user_id: int) -> list:
+        # One round trip per FOLLOWS_PAGE_SIZE followers, as DatabaseManager pages them
+        for _ in range(self.followers // FOLLOWS_PAGE_SIZE + 1):
+            self._trip()
+        return list(range(1, self.followers + 1)) if user_id == AUTHOR else []
+
+    def get_following(self, user_id: int) -> list:
+        self._trip()
+        return [(AUTHOR, self.followers)] if user_id != AUTHOR else []
+
+    def get_author_post_ids(self, author_ids: list, limit: int) -> list:
+        self._trip()
+        lists = [reversed(self.posts.get(a, [])) for a in author_ids]
+        return [post_id for post_id, _ in zip(heapq.merge(*lists, reverse=True), range(limit))]
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def run(followers: int, fanout_limit: int, args, rng: random.Random):
+    graph = Graph(followers, args.history, args.latency)
+    active = rng.sample(range(1, followers + 1), max(int(followers * args.active), 1))
+    # Room for every active reader, so "warm" means warm
+    engine = TimelineEngine(graph, length=args.length, fanout_limit=fanout_limit, ttl=3600, max_entries=len(active))
+
+    started = time.perf_counter()
+    for user_id in active:
+        engine.read(user_id, args.limit)
+    warm_up = time.perf_counter() - started
+
+    fanout = []
+    engine.on_post(AUTHOR, graph.add_post(AUTHOR))      # loads the follower list once
+    before = engine.fanout_pushes
+    for _ in range(args.posts):
+        post_id = graph.add_post(AUTHOR)
+        t = time.perf_counter()
+        engine.on_post(AUTHOR, post_id)
+        fanout.append((time.perf_counter() - t) * 1000)
+    pushes = (engine.fanout_pushes - before) / args.posts
+
+    warm, trips = [], graph.round_trips
+    for _ in range(args.reads):
+        t = time.perf_counter()
+        page = engine.read(rng.choice(active), args.limit)
+        warm.append((time.perf_counter() - t) * 1000)
+    warm_trips = (graph.round_trips - trips) / args.reads
+    assert page and page[0] == graph.posts[AUTHOR][-1], "timeline is missing the newest post"
+
+    cold, trips = [], graph.round_trips
+    for _ in range(args.reads):
+        user_id = rng.randint(1, followers)
+        engine.on_follow_changed(user_id, -1)           # drop the buffer so the read rebuilds it
+        t = time.perf_counter()
+        engine.read(user_id, args.limit)
+        cold.append((time.perf_counter() - t) * 1000)
+    cold_trips = (graph.round_trips - trips) / args.reads
+
+    mode = "read" if followers > fanout_limit else "write"
+    print(f"{followers:>9} {mode:<6}{len(active):>8}{warm_up:>9.1f}"
+          f"{percentile(fanout, 50):>10.3f}{percentile(fanout, 99):>10.3f}{pushes:>9.0f}"
+          f"{percentile(warm, 50):>9.3f}{percentile(warm, 99):>9.3f}{warm_trips:>6.1f}"
+          f"{percentile(cold, 50):>9.3f}{percentile(cold, 99):>9.3f}{cold_trips:>6.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--followers", default="10000,1000000", help="comma-separated follower counts")
+    parser.add_argument("--active", type=float, default=0.1, help="fraction of followers with a live buffer")
+    parser.add_argument("--fanout-limit", type=int, default=FANOUT_LIMIT)
+    parser.add_argument("--push-all", action="store_true", help="also run every scale with fan-out on write")
+    parser.add_argument("--length", type=int, default=TIMELINE_LENGTH)
+    parser.add_argument("--history", type=int, default=1000, help="posts by the author before the run")
+    parser.add_argument("--posts", type=int, default=50, help="new posts to fan out")
+    parser.add_argument("--reads", type=int, default=2000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated round trip in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"{'followers':>9} {'fanout':<6}{'active':>8}{'warm s':>9}"
+          f"{'post p50':>10}{'post p99':>10}{'pushes':>9}"
+          f"{'warm p50':>9}{'p99':>9}{'trips':>6}{'cold p50':>9}{'p99':>9}{'trips':>6}")
+    for followers in map(int, args.followers.split(",")):
+        run(followers, args.fanout_limit, args, rng)
+        if args.push_all and followers > args.fanout_limit:
+            run(followers, followers, args, rng)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Trending ranker: update cost per event under a synthetic like stream.
+
+    python -m bench.trending --rate 10000 --seconds 300 --posts 100000
+
+Feeds src.trending.TrendingRanker a stream of likes, unlikes and comments
+at `--rate` events per second of simulated time (Zipf-distributed post
+popularity, new posts appearing as the stream goes on), timing every
+update. Reports per-event cost, the rate one thread could sustain, what
+fraction of a core the target rate needs, top-K read latency, and the
+time to rebuild the same scores from scratch. The final top-K is checked
+against a full sort of every score.
+"""
+import argparse
+import heapq
+import itertools
+import random
+import time
+
+from src.trending import TrendingRanker, LIKE_WEIGHT, COMMENT_WEIGHT
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rate", type=int, default=10_000, help="events per simulated second")
+    parser.add_argument("--seconds", type=int, default=300, help="simulated stream length")
+    parser.add_argument("--posts", type=int, default=100_000, help="live posts at any time")
+    parser.add_argument("--half-life", type=float, default=60.0, help="seconds; short so the run crosses rescales")
+    parser.add_argument("--unlikes", type=float, default=0.1, help="fraction of events that are unlikes")
+    parser.add_argument("--comments", type=float, default=0.1, help="fraction of events that are comments")
+    parser.add_argument("--k", type=int, default=100)
+    parser.add_argument("--reads", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(args.posts)))
+    ranks = range(args.posts)
+    total = args.rate * args.seconds
+    # Post ids drift upwards over the run, so old posts stop getting events and new ones start
+    drift = args.posts / args.seconds
+
+    ranker = TrendingRanker(half_life=args.half_life, k=args.k, now=0.0)
+    likes, comments, samples = [], [], []
+    batch = args.rate // 10
+    for start in range(0, total, batch):
+        picks = rng.choices(ranks, cum_weights=cum_weights, k=batch)
+        kinds = [rng.random() for _ in range(batch)]
+        for i, (rank, kind) in enumerate(zip(picks, kinds)):
+            at = (start + i) / args.rate
+            post_id = int(at * drift) + rank
+            if kind < args.comments:
+                t = time.perf_counter()
+                ranker.comment(post_id, at)
+                comments.append((post_id, at))
+            elif kind < args.comments + args.unlikes:
+                t = time.perf_counter()
+                ranker.unlike(post_id, at)
+            else:
+                t = time.perf_counter()
+                ranker.like(post_id, at)
+                likes.append((post_id, at))
+            samples.append(time.perf_counter() - t)
+    now = total / args.rate
+
+    reads = []
+    for _ in range(args.reads):
+        t = time.perf_counter()
+        top = ranker.top(args.k, now=now)
+        reads.append(time.perf_counter() - t)
+    exact = heapq.nlargest(args.k, ranker._scores.items(), key=lambda item: item[1])
+    matches = [p for p, _ in top] == [p for p, _ in exact]
+
+    started = time.perf_counter()
+    fresh = TrendingRanker(half_life=args.half_life, k=args.k)
+    # Replays every like and comment inside the cutoff; a real rebuild reads fewer, unliked rows are deleted
+    cutoff = now - args.half_life * 10
+    fresh.rebuild(((p, at) for p, at in likes if at >= cutoff), ((p, at) for p, at in comments if at >= cutoff),
+                  now=now)
+    rebuild = time.perf_counter() - started
+
+    mean = sum(samples) / len(samples)
+    stats = ranker.stats()
+    print(f"{total} events over {args.seconds}s simulated, {stats['posts']} posts scored, "
+          f"{stats['rescans']} top-K rescans")
+    print(f"update: p50 {percentile(samples, 50) * 1e6:.2f} us, p99 {percentile(samples, 99) * 1e6:.2f} us, "
+          f"max {max(samples) * 1e3:.2f} ms, mean {mean * 1e6:.2f} us")
+    print(f"one thread sustains ~{1 / mean:,.0f} events/s; {args.rate:,} events/s uses "
+          f"{args.rate * mean * 100:.1f}% of a core")
+    print(f"top {args.k}: p50 {percentile(reads, 50) * 1e6:.1f} us, p99 {percentile(reads, 99) * 1e6:.1f} us; "
+          f"matches full sort: {matches}")
+    print(f"rebuild from {len(likes) + len(comments)} rows: {rebuild:.2f}s "
+          f"(weights: like {LIKE_WEIGHT}, comment {COMMENT_WEIGHT})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Journaled writes: ack latency with group-committed fsync, and replay throughput.
+
+    python -m bench.write_journal --writers 1,8,64 --seconds 3 --latency 0.02
+
+Acks: `--writers` threads each like posts as fast as they can through a
+DatabaseManager with a WriteJournal in `--dir` (put it on the disk you
+would deploy on; tmpfs makes fsync free). Reports acks/s, ack p50/p99
+and how many entries each fsync carried, next to the same like written
+straight to bench.fake_supabase at `--latency`.
+
+Replay: fills a journal with `--entries` posts, likes and comments, then
+times a JournalReplayer draining it into the fake at each `--batches`
+size, one datastore round trip per batch.
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_KEY", "bench.bench.bench")
+
+from bench.fake_supabase import FakeClient
+from src.db import DatabaseManager
+from src.journal import JournalReplayer, WriteJournal
+
+POSTS = 1000
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def seeded_client(latency: float) -> FakeClient:
+    client = FakeClient(latency=latency)
+    client.tables["posts"] = [{"id": next(client.ids), "user_id": 1, "content": f"post {i}", "like_count": 0,
+                               "created_at": client.now()} for i in range(POSTS)]
+    return client
+
+
+def likes(db: DatabaseManager, writers: int, seconds: float) -> list:
+    latencies, stop = [], time.perf_counter() + seconds
+
+    def writer(i):
+        rng, user = random.Random(i), {"id": 1000 + i, "username": f"user{i}"}
+        while time.perf_counter() < stop:
+            post_id = rng.randint(1, POSTS)
+            t = time.perf_counter()
+            if rng.random() < 0.5:
+                db.like_post(post_id, user=user)
+            else:
+                db.unlike_post(post_id, user=user)
+            latencies.append(time.perf_counter() - t)
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies
+
+
+def acks(args, directory: str):
+    print(f"{'writers':>8}{'mode':>10}{'writes/s':>10}{'p50 ms':>9}{'p99 ms':>9}{'per fsync':>11}")
+    for writers in map(int, args.writers.split(",")):
+        direct = DatabaseManager(client=seeded_client(args.latency))
+        samples = likes(direct, writers, args.seconds)
+        print(f"{writers:>8}{'direct':>10}{len(samples) / args.seconds:>10.0f}"
+              f"{percentile(samples, 50) * 1000:>9.2f}{percentile(samples, 99) * 1000:>9.2f}{'-':>11}")
+
+        journal = WriteJournal(os.path.join(directory, f"acks-{writers}.log"), fsync=not args.no_fsync)
+        samples = likes(DatabaseManager(client=seeded_client(args.latency), journal=journal), writers, args.seconds)
+        stats = journal.stats()
+        journal.close()
+        print(f"{writers:>8}{'journal':>10}{len(samples) / args.seconds:>10.0f}"
+              f"{percentile(samples, 50) * 1000:>9.2f}{percentile(samples, 99) * 1000:>9.2f}"
+              f"{stats['appended'] / max(stats['batches'], 1):>11.1f}")
+
+
+def fill(journal: WriteJournal, entries: int, rng: random.Random):
+    futures = []
+    for i in range(entries):
+        user = {"id": rng.randint(1, 500), "username": "bench"}
+        kind = rng.random()
+        if kind < 0.1:
+            futures.append(journal.append("create_post", user, {"content": f"new {i}", "image_url": ""}))
+        elif kind < 0.3:
+            futures.append(journal.append("comment", user, {"post_id": rng.randint(1, POSTS), "content": "hi"}))
+        else:
+            op = "like" if rng.random() < 0.6 else "unlike"
+            futures.append(journal.append(op, user, {"post_id": rng.randint(1, POSTS)}))
+    for future in futures:
+        future.result()
+
+
+def replay(args, directory: str):
+    print(f"{'batch':>8}{'entries':>9}{'seconds':>9}{'entries/s':>11}{'round trips':>13}")
+    for batch_size in map(int, args.batches.split(",")):
+        journal = WriteJournal(os.path.join(directory, f"replay-{batch_size}.log"), fsync=not args.no_fsync)
+        fill(journal, args.entries, random.Random(args.seed))
+        client = seeded_client(args.latency)
+        db = DatabaseManager(client=client)
+        replayer = JournalReplayer(journal, db.apply_journal_entries, batch_size=batch_size)
+        started = time.perf_counter()
+        while True:
+            batch = journal.next_batch(batch_size)
+            if not batch:
+                break
+            replayer.replay(batch)
+        elapsed = time.perf_counter() - started
+        stats = journal.stats()
+        journal.close()
+        assert stats["pending"] == 0 and stats["failed"] == 0, stats
+        print(f"{batch_size:>8}{stats['applied']:>9}{elapsed:>9.2f}{stats['applied'] / elapsed:>11.0f}"
+              f"{client.round_trips:>13}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--writers", default="1,8,64", help="concurrent writer threads")
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--latency", type=float, default=0.02, help="simulated Supabase round trip in seconds")
+    parser.add_argument("--entries", type=int, default=1000, help="journal size for the replay run")
+    parser.add_argument("--batches", default="1,10,100", help="replay batch sizes")
+    parser.add_argument("--dir", default=".", help="where the journal files go (a temporary subdirectory)")
+    parser.add_argument("--no-fsync", action="store_true", help="skip fsync, to see what it costs")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="bench-journal-", dir=args.dir)
+    try:
+        acks(args, directory)
+        replay(args, directory)
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,44 +1,236 @@
+import copy
+import time
+
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
 
 BASE_URL = "http://127.0.0.1:8000"
+FEED_PAGE_SIZE = 10
+# (connect, read) seconds; a slow API shows an error instead of hanging the page
+REQUEST_TIMEOUT = (3.05, 10)
+# Feed reads are shared across reruns for this long; our own writes clear them immediately
+FEED_TTL = 5
 
 # --------------------------
 # Backend API helpers
 # --------------------------
+@st.cache_resource
+def http_session():
+    """One keep-alive connection pool to the API, shared by every rerun and session"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+@st.cache_resource
+def feed_validators():
+    """(limit, before) -> (etag, body) of the last feed page seen, for If-None-Match"""
+    return {}
+
+def api(method, path, **kwargs):
+    """Call the API on the pooled session and record the time for the timing overlay"""
+    started = time.perf_counter()
+    try:
+        return http_session().request(method, f"{BASE_URL}{path}", timeout=REQUEST_TIMEOUT, **kwargs)
+    finally:
+        st.session_state.setdefault("api_timings", []).append((f"{method} {path}", time.perf_counter() - started))
+
 def signup(username, password, role="user"):
-    return requests.post(f"{BASE_URL}/signup", json={
+    return api("POST", "/signup", json={
         "username": username,
         "password": password,
         "role": role
     }).json()
 
 def login(username, password):
-    return requests.post(f"{BASE_URL}/login", json={
+    return api("POST", "/login", json={
         "username": username,
         "password": password
     }).json()
 
+def auth_headers():
+    """Bearer token issued by /login; the API keeps no per-user session state"""
+    token = st.session_state.get("token")
+    return {"Authorization": f"Bearer {token}"} if token else {}
+
+def feed_changed():
+    """Our own write: drop cached reads so the next render shows it"""
+    get_posts.clear()
+    get_comments.clear()
+
 def create_post(content, image_url=""):
-    return requests.post(f"{BASE_URL}/posts", json={
+    result = api("POST", "/posts", json={
         "content": content,
         "image_url": image_url
-    }).json()
+    }, headers=auth_headers()).json()
+    feed_changed()
+    return result
 
-def get_posts():
-    return requests.get(f"{BASE_URL}/posts").json()
+@st.cache_data(ttl=FEED_TTL, show_spinner=False)
+def get_posts(limit=FEED_PAGE_SIZE, before=None, _headers=None):
+    """Fetch a feed page, revalidating the last copy with If-None-Match.
+
+    `_headers` (the caller's auth_headers()) is left out of the cache key, so
+    the page is still shared; it keys the API's rate limit to the user rather
+    than to this server's address, which every session shares.
+    """
+    params = {"limit": limit}
+    if before:
+        params["before"] = before
+    validators = feed_validators()
+    key = (limit, before)
+    cached = validators.get(key)
+    headers = dict(_headers or {}, **({"If-None-Match": cached[0]} if cached else {}))
+    response = api("GET", "/posts", params=params, headers=headers)
+    if response.status_code == 304 and cached:
+        return cached[1]
+    # Raising keeps a failed read out of st.cache_data, so the next rerun asks again
+    response.raise_for_status()
+    data = response.json()
+    if response.headers.get("ETag"):
+        validators[key] = (response.headers["ETag"], data)
+    return data
 
 def like_post(post_id):
-    return requests.post(f"{BASE_URL}/posts/like", json={"post_id": post_id}).json()
+    result = api("POST", "/posts/like", json={"post_id": post_id}, headers=auth_headers()).json()
+    feed_changed()
+    return result
 
 def unlike_post(post_id):
-    return requests.post(f"{BASE_URL}/posts/unlike", json={"post_id": post_id}).json()
+    result = api("POST", "/posts/unlike", json={"post_id": post_id}, headers=auth_headers()).json()
+    feed_changed()
+    return result
 
 def comment_post(post_id, content):
-    return requests.post(f"{BASE_URL}/posts/comment", json={
+    result = api("POST", "/posts/comment", json={
         "post_id": post_id,
         "content": content
-    }).json()
+    }, headers=auth_headers()).json()
+    feed_changed()
+    return result
+
+@st.cache_data(ttl=FEED_TTL, show_spinner=False)
+def get_comments(post_id, before=None, _headers=None):
+    params = {"before": before} if before else {}
+    return api("GET", f"/posts/{post_id}/comments", params=params, headers=_headers).json()
+
+def load_feed_page():
+    """Fetch the next page of the feed and append it to the session feed; False if the API failed"""
+    try:
+        data = get_posts(before=st.session_state.feed_cursor, _headers=auth_headers())
+    except requests.RequestException:
+        st.warning("Couldn't load posts right now, try again shortly")
+        return False
+    if data.get("partial"):
+        # Only the server's own pending posts while the datastore is down; reload the real page next time
+        st.warning("Showing recent posts only, the full feed is temporarily unavailable")
+        if st.session_state.feed_cursor is None:
+            st.session_state.feed_posts = data.get("posts", [])
+        return False
+    if st.session_state.feed_cursor is None:
+        st.session_state.feed_posts = []
+        st.session_state.feed_head = copy.deepcopy(data.get("posts", []))
+    st.session_state.feed_posts.extend(data.get("posts", []))
+    st.session_state.feed_cursor = data.get("next_cursor")
+    st.session_state.feed_done = not st.session_state.feed_cursor
+    return True
+
+def refresh_feed_head():
+    """On a full rerun, revalidate the newest page and merge what changed into the loaded feed.
+
+    get_posts asks again at most every FEED_TTL seconds and with If-None-Match,
+    so an unchanged feed costs a 304. New posts go on top; posts already shown
+    take the fresh like counts, comments and image status.
+    """
+    try:
+        data = get_posts(_headers=auth_headers())
+    except requests.RequestException:
+        return
+    head = data.get("posts", [])
+    if data.get("partial") or head == st.session_state.feed_head:
+        return
+    st.session_state.feed_head = copy.deepcopy(head)
+    loaded = {post["id"]: post for post in st.session_state.feed_posts}
+    for post in head:
+        if post["id"] in loaded:
+            loaded[post["id"]].update(post)
+    st.session_state.feed_posts[:0] = [post for post in head if post["id"] not in loaded]
+
+def reset_feed():
+    """Drop the loaded pages so the next render starts again from the newest post"""
+    st.session_state.feed_posts = []
+    st.session_state.feed_head = None
+    st.session_state.feed_cursor = None
+    st.session_state.feed_done = False
+    st.session_state.feed_loaded = False
+
+# -------------------------------
+# Post card
+# -------------------------------
+@st.fragment
+def post_card(post):
+    """One feed card. Clicks rerun only this fragment and patch `post` from the API response.
+
+    `post` is the dict held in st.session_state.feed_posts, so the patched like
+    count and comments survive full reruns too.
+    """
+    with st.container():
+        st.markdown('<div class="card">', unsafe_allow_html=True)
+        st.markdown(f"**{post['content']}**")
+        if post.get("author"):
+            st.caption(f"by {post['author']['username']}")
+        if post.get("image_url"):
+            st.image(post["image_url"], width=300, caption="Post Image")
+        elif post.get("image_status") == "pending":
+            st.caption("🖼️ Image is still processing…")
+        st.write(f"👍 {post.get('like_count', 0)} Likes")
+
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("👍 Like", key=f"like_{post['id']}"):
+                result = like_post(post["id"])
+                if "like_count" in result:
+                    post["like_count"] = result["like_count"]
+                    st.rerun(scope="fragment")
+        with col2:
+            if st.button("👎 Unlike", key=f"unlike_{post['id']}"):
+                result = unlike_post(post["id"])
+                if "like_count" in result:
+                    post["like_count"] = result["like_count"]
+                    st.rerun(scope="fragment")
+
+        comment_count = post.get("comment_count", len(post.get("comments", [])))
+        with st.expander(f"💬 Comments ({comment_count})"):
+            # The feed carries only the newest few; older ones are paged in on demand
+            extra_key = f"more_comments_{post['id']}"
+            extra = st.session_state.get(extra_key)
+            shown = extra["comments"] if extra else post.get("comments", [])
+            for c in shown:
+                author = (c.get("author") or {}).get("username")
+                st.write(f"- **{author}**: {c['content']}" if author else f"- {c['content']}")
+            if len(shown) < comment_count:
+                if st.button("Show more comments", key=f"more_btn_{post['id']}"):
+                    page = get_comments(post["id"], before=extra["next_cursor"] if extra else None,
+                                         _headers=auth_headers())
+                    st.session_state[extra_key] = {
+                        "comments": (extra["comments"] if extra else []) + page.get("comments", []),
+                        "next_cursor": page.get("next_cursor")
+                    }
+                    st.rerun(scope="fragment")
+            with st.form(key=f"comment_form_{post['id']}", clear_on_submit=True, border=False):
+                comment_text = st.text_input("Add a comment")
+                if st.form_submit_button("Comment") and comment_text:
+                    added = comment_post(post["id"], comment_text).get("comment") or []
+                    if added:
+                        # Newest first, like the feed preview
+                        post["comments"] = added + post.get("comments", [])
+                        post["comment_count"] = comment_count + len(added)
+                        if extra:
+                            extra["comments"] = added + extra["comments"]
+                        st.rerun(scope="fragment")
+        st.markdown('</div>', unsafe_allow_html=True)
 
 # -------------------------------
 # Streamlit UI Config
@@ -102,6 +294,11 @@ if "username" not in st.session_state:
     st.session_state.username = None
 if "page" not in st.session_state:
     st.session_state.page = "Login"  # default = Login page
+if "feed_posts" not in st.session_state:
+    reset_feed()
+# Per-rerun timing, shown at the bottom of the page when enabled in the sidebar
+render_started = time.perf_counter()
+st.session_state.api_timings = []
 
 # -------------------------------
 # Navigation (only visible after login)
@@ -136,6 +333,7 @@ if st.session_state.username:
         with col3:
             if st.button("🔒 Logout"):
                 st.session_state.username = None
+                st.session_state.token = None
                 st.session_state.page = "Login"
                 st.rerun()
 
@@ -158,6 +356,7 @@ if st.session_state.page == "Login" and not st.session_state.username:
             result = login(username, password)
             if "message" in result:
                 st.session_state.username = username
+                st.session_state.token = result.get("access_token")
                 st.session_state.page = "Home"   # directly go home
                 st.rerun()
             else:
@@ -202,39 +401,36 @@ elif st.session_state.page == "Home":
             if st.button("Post"):
                 result = create_post(content, image_url)
                 st.success(result.get("message", "Post created"))
+                reset_feed()
 
-        # Display Posts
-        st.subheader("📢 All Posts")
-        posts_data = get_posts()
-        posts = posts_data.get("posts", [])
+        # Display Posts (pages are fetched lazily, one cursor step at a time)
+        head_col, refresh_col = st.columns([4, 1])
+        head_col.subheader("📢 All Posts")
+        if refresh_col.button("🔄 Refresh"):
+            get_posts.clear()
+        if not st.session_state.feed_loaded:
+            st.session_state.feed_loaded = load_feed_page()
+        else:
+            refresh_feed_head()
+        posts = st.session_state.feed_posts
 
         if posts:
             for post in posts:
-                with st.container():
-                    st.markdown('<div class="card">', unsafe_allow_html=True)
-                    st.markdown(f"**{post['content']}**")
-                    if post.get("image_url"):
-                        st.image(post["image_url"], width=300, caption="Post Image")
-                    st.write(f"👍 {post.get('like_count', 0)} Likes")
-
-                    col1, col2 = st.columns(2)
-                    with col1:
-                        if st.button("👍 Like", key=f"like_{post['id']}"):
-                            like_post(post["id"])
-                            st.rerun()
-                    with col2:
-                        if st.button("👎 Unlike", key=f"unlike_{post['id']}"):
-                            unlike_post(post["id"])
-                            st.rerun()
-
-                    with st.expander("💬 Comments"):
-                        for c in post.get("comments", []):
-                            st.write(f"- {c['content']}")
-                        comment_text = st.text_input("Add a comment", key=f"comment_{post['id']}")
-                        if st.button("Comment", key=f"comment_btn_{post['id']}"):
-                            if comment_text:
-                                comment_post(post["id"], comment_text)
-                                st.rerun()
-                    st.markdown('</div>', unsafe_allow_html=True)
-        else:
+                post_card(post)
+            if not st.session_state.feed_done:
+                if st.button("⬇️ Load more") and load_feed_page():
+                    st.rerun()
+        elif st.session_state.feed_loaded:
             st.info("No posts yet. Be the first one!")
+
+# -------------------------------
+# Timing overlay
+# -------------------------------
+if st.sidebar.toggle("⏱️ Show timings"):
+    calls = st.session_state.api_timings
+    st.sidebar.caption(
+        f"Render {(time.perf_counter() - render_started) * 1000:.0f} ms, "
+        f"{len(calls)} API calls, {sum(t for _, t in calls) * 1000:.0f} ms in the API"
+    )
+    for name, elapsed in calls:
+        st.sidebar.text(f"{elapsed * 1000:7.1f} ms  {name}")
@@ -1,13 +1,4 @@
-import os
-from supabase import create_client, Client  # pip install supabase
-from dotenv import load_dotenv  # pip install python-dotenv
-from datetime import datetime, timedelta
+from src.db import get_client
 
-load_dotenv()
-
-# Get environment variables
-url = os.getenv("url")
-key = os.getenv("key")
-
-# Create Supabase client
-sb: Client = create_client(url, key)
\ No newline at end of file
+# Shared, lazily created Supabase client (reads SUPABASE_URL / SUPABASE_KEY from .env)
+sb = get_client()
@@ -0,0 +1,4 @@
+-- Keyset pagination for GET /posts walks posts by (created_at, id), newest first.
+-- This index lets every feed page be a short index range scan, however deep the cursor.
+create index if not exists posts_created_at_id_idx
+    on public.posts (created_at desc, id desc);
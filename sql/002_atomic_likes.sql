@@ -0,0 +1,53 @@
+-- One row per (post, user): drop historical duplicates, then let the database enforce it.
+delete from public.likes a
+    using public.likes b
+    where a.post_id = b.post_id
+      and a.user_id = b.user_id
+      and a.id > b.id;
+
+alter table public.likes
+    add constraint likes_post_user_key unique (post_id, user_id);
+
+-- Toggle a like and move posts.like_count by +/-1 in the same transaction.
+-- Returns whether anything changed and the resulting like_count.
+create or replace function public.set_like(p_post_id bigint, p_user_id bigint, p_liked boolean)
+returns table (changed boolean, like_count integer)
+language plpgsql
+as $$
+declare
+    v_rows integer;
+begin
+    if p_liked then
+        insert into public.likes (post_id, user_id)
+        values (p_post_id, p_user_id)
+        on conflict (post_id, user_id) do nothing;
+    else
+        delete from public.likes l
+        where l.post_id = p_post_id and l.user_id = p_user_id;
+    end if;
+    get diagnostics v_rows = row_count;
+    changed := v_rows > 0;
+
+    if changed then
+        update public.posts p
+        set like_count = greatest(coalesce(p.like_count, 0) + case when p_liked then 1 else -1 end, 0)
+        where p.id = p_post_id
+        returning p.like_count into like_count;
+    else
+        select coalesce(p.like_count, 0) into like_count
+        from public.posts p
+        where p.id = p_post_id;
+    end if;
+    return next;
+end;
+$$;
+
+-- Background reconciliation: exact recount for a batch of posts in one call.
+create or replace function public.reconcile_like_counts(p_post_ids bigint[])
+returns void
+language sql
+as $$
+    update public.posts p
+    set like_count = (select count(*) from public.likes l where l.post_id = p.id)
+    where p.id = any(p_post_ids);
+$$;
@@ -0,0 +1,51 @@
+-- Write-behind like counts: set_like can skip the posts.like_count update and leave
+-- it to the in-process buffer, which applies aggregated deltas with apply_like_deltas.
+drop function if exists public.set_like(bigint, bigint, boolean);
+
+create or replace function public.set_like(
+    p_post_id bigint,
+    p_user_id bigint,
+    p_liked boolean,
+    p_bump_count boolean default true
+)
+returns table (changed boolean, like_count integer)
+language plpgsql
+as $$
+declare
+    v_rows integer;
+begin
+    if p_liked then
+        insert into public.likes (post_id, user_id)
+        values (p_post_id, p_user_id)
+        on conflict (post_id, user_id) do nothing;
+    else
+        delete from public.likes l
+        where l.post_id = p_post_id and l.user_id = p_user_id;
+    end if;
+    get diagnostics v_rows = row_count;
+    changed := v_rows > 0;
+
+    if changed and p_bump_count then
+        update public.posts p
+        set like_count = greatest(coalesce(p.like_count, 0) + case when p_liked then 1 else -1 end, 0)
+        where p.id = p_post_id
+        returning p.like_count into like_count;
+    else
+        select coalesce(p.like_count, 0) into like_count
+        from public.posts p
+        where p.id = p_post_id;
+    end if;
+    return next;
+end;
+$$;
+
+-- Apply a batch of [{"post_id": 1, "delta": 3}, ...] in a single statement.
+create or replace function public.apply_like_deltas(p_deltas jsonb)
+returns void
+language sql
+as $$
+    update public.posts p
+    set like_count = greatest(coalesce(p.like_count, 0) + d.delta, 0)
+    from jsonb_to_recordset(p_deltas) as d(post_id bigint, delta integer)
+    where p.id = d.post_id;
+$$;
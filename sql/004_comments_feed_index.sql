@@ -0,0 +1,4 @@
+-- The feed embeds the newest comments per post and GET /posts/{id}/comments pages
+-- through the rest; both read comments by (post_id, created_at, id).
+create index if not exists comments_post_created_at_id_idx
+    on public.comments (post_id, created_at desc, id desc);
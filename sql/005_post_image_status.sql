@@ -0,0 +1,4 @@
+-- Images are ingested after the post is created; track where each one is.
+alter table public.posts
+    add column if not exists image_status text
+    check (image_status in ('pending', 'ready', 'failed'));
@@ -0,0 +1,16 @@
+-- The feed embeds each post's author (author:profiles!user_id(username)); PostgREST
+-- resolves that join through this foreign key. NOT VALID skips checking old rows.
+do $$
+begin
+    if not exists (
+        select 1 from pg_constraint
+        where conrelid = 'public.posts'::regclass
+          and contype = 'f'
+          and confrelid = 'public.profiles'::regclass
+    ) then
+        alter table public.posts
+            add constraint posts_user_id_fkey
+            foreign key (user_id) references public.profiles (id) not valid;
+    end if;
+end;
+$$;
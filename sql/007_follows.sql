@@ -0,0 +1,54 @@
+-- Follow graph for home timelines.
+create table if not exists public.follows (
+    follower_id bigint not null references public.profiles (id) on delete cascade,
+    followee_id bigint not null references public.profiles (id) on delete cascade,
+    created_at timestamptz not null default now(),
+    primary key (follower_id, followee_id),
+    check (follower_id <> followee_id)
+);
+
+-- Fan-out reads a user's followers; the primary key already covers "who do I follow".
+create index if not exists follows_followee_idx
+    on public.follows (followee_id, follower_id);
+
+-- Lets the timeline engine tell big accounts (fan-out on read) from the rest
+-- without counting follows rows.
+alter table public.profiles
+    add column if not exists follower_count integer not null default 0;
+
+-- Timeline rebuilds read the newest posts of a set of authors.
+create index if not exists posts_user_id_id_idx
+    on public.posts (user_id, id desc);
+
+-- Follow or unfollow and move profiles.follower_count in the same transaction.
+create or replace function public.set_follow(p_follower_id bigint, p_followee_id bigint, p_follow boolean)
+returns table (changed boolean, follower_count integer)
+language plpgsql
+as $$
+declare
+    v_rows integer;
+begin
+    if p_follow then
+        insert into public.follows (follower_id, followee_id)
+        values (p_follower_id, p_followee_id)
+        on conflict (follower_id, followee_id) do nothing;
+    else
+        delete from public.follows f
+        where f.follower_id = p_follower_id and f.followee_id = p_followee_id;
+    end if;
+    get diagnostics v_rows = row_count;
+    changed := v_rows > 0;
+
+    if changed then
+        update public.profiles p
+        set follower_count = greatest(p.follower_count + case when p_follow then 1 else -1 end, 0)
+        where p.id = p_followee_id
+        returning p.follower_count into follower_count;
+    else
+        select p.follower_count into follower_count
+        from public.profiles p
+        where p.id = p_followee_id;
+    end if;
+    return next;
+end;
+$$;
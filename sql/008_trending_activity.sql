@@ -0,0 +1,27 @@
+-- Trending scores are rebuilt at startup from recent likes and comments.
+alter table public.likes
+    add column if not exists created_at timestamptz;
+
+-- Likes from before this column have no time of their own. Filling them with now() would make
+-- all of them look fresh to the rebuild, so give them their post's creation time, the
+-- earliest they can have happened.
+update public.likes l
+set created_at = p.created_at
+from public.posts p
+where l.post_id = p.id and l.created_at is null;
+
+-- Likes left pointing at a deleted post: old enough for every rebuild cutoff to skip them
+update public.likes
+set created_at = 'epoch'
+where created_at is null;
+
+alter table public.likes
+    alter column created_at set default now(),
+    alter column created_at set not null;
+
+-- The rebuild walks each table by (created_at, id) from a cutoff a few half-lives back.
+create index if not exists likes_created_at_id_idx
+    on public.likes (created_at, id);
+
+create index if not exists comments_created_at_id_idx
+    on public.comments (created_at, id);
@@ -0,0 +1,82 @@
+-- Idempotent replay for the local write journal (src/journal.py). Each journaled
+-- write carries a random key; the first application stores its result here in the
+-- same transaction, so a replay after a crash or a lost response gets that result
+-- back instead of writing twice.
+create table if not exists public.journal_applied (
+    key text primary key,
+    result jsonb,
+    applied_at timestamptz not null default now()
+);
+
+-- Keys only need to outlive the longest time an entry can wait in a journal before its
+-- applied marker is written. Prune with, for example:
+--   delete from public.journal_applied where applied_at < now() - interval '7 days';
+create index if not exists journal_applied_applied_at_idx
+    on public.journal_applied (applied_at);
+
+-- Apply one journaled write. Posts and comments keep the time they were acknowledged.
+create or replace function public.apply_journal_entry(
+    p_key text,
+    p_op text,
+    p_user_id bigint,
+    p_args jsonb,
+    p_at timestamptz,
+    p_bump_count boolean default true
+)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_result jsonb;
+begin
+    -- Two replays of the same key serialize here; the second sees the first's result
+    perform pg_advisory_xact_lock(hashtext(p_key));
+    select j.result into v_result from public.journal_applied j where j.key = p_key;
+    if found then
+        return v_result;
+    end if;
+
+    if p_op = 'create_post' then
+        insert into public.posts as p (content, user_id, image_url, image_status, created_at)
+        values (p_args->>'content', p_user_id, null,
+                case when coalesce(p_args->>'image_url', '') <> '' then 'pending' end, p_at)
+        returning to_jsonb(p.*) into v_result;
+    elsif p_op in ('like', 'unlike') then
+        select to_jsonb(s.*) into v_result
+        from public.set_like((p_args->>'post_id')::bigint, p_user_id, p_op = 'like', p_bump_count) s;
+    elsif p_op = 'comment' then
+        insert into public.comments as c (post_id, user_id, content, created_at)
+        values ((p_args->>'post_id')::bigint, p_user_id, p_args->>'content', p_at)
+        returning to_jsonb(c.*) into v_result;
+    else
+        raise exception 'Unknown journal op %', p_op;
+    end if;
+
+    insert into public.journal_applied (key, result) values (p_key, v_result);
+    return v_result;
+end;
+$$;
+
+-- Apply a batch in order, in one transaction and one round trip; returns one result per entry.
+-- An error rolls the whole batch back and the replayer retries it entry by entry.
+create or replace function public.apply_journal_entries(p_entries jsonb, p_bump_count boolean default true)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_entry jsonb;
+    v_results jsonb := '[]'::jsonb;
+begin
+    for v_entry in select value from jsonb_array_elements(p_entries) loop
+        v_results := v_results || jsonb_build_array(public.apply_journal_entry(
+            v_entry->>'key',
+            v_entry->>'op',
+            (v_entry->>'user_id')::bigint,
+            v_entry->'args',
+            (v_entry->>'at')::timestamptz,
+            p_bump_count
+        ));
+    end loop;
+    return v_results;
+end;
+$$;
@@ -0,0 +1,202 @@
+import asyncio
+import logging
+import os
+import time
+from typing import TYPE_CHECKING
+from src.db import (
+    DatabaseManager, FEED_PAGE_SIZE, COMMENTS_PAGE_SIZE, EXPORT_CHUNK_SIZE, record_round_trip, supabase_settings
+)
+from src.limits import REQUEST_LIMIT, Overloaded
+
+if TYPE_CHECKING:
+    from supabase import AsyncClient
+
+logger = logging.getLogger(__name__)
+
+# Supabase calls the async client keeps in flight, over small kept-alive pools (src/http_pool.py)
+ASYNC_POOL_SIZE = int(os.getenv("SUPABASE_ASYNC_POOL_SIZE", "40"))
+ASYNC_TIMEOUT = float(os.getenv("SUPABASE_ASYNC_TIMEOUT", "120"))
+
+
+async def aexecute(query, op: str):
+    """Await a query builder's execute() and record it under `op`, within the request's datastore cap"""
+    limit = REQUEST_LIMIT.get()
+    if limit is not None:
+        limit.acquire()
+    started = time.perf_counter()
+    try:
+        response = await query.execute()
+    except Exception:
+        record_round_trip(op, started, failed=True)
+        raise
+    finally:
+        if limit is not None:
+            limit.release()
+    record_round_trip(op, started, response.data)
+    return response
+
+
+class AsyncDatabaseManager(DatabaseManager):
+    """DatabaseManager with awaitable versions of the hot read/write paths.
+
+    The `a*` methods run on the async Supabase client, whose httpx pools keep
+    ASYNC_POOL_SIZE connections alive between requests, so FastAPI `async def`
+    endpoints no longer pin a threadpool worker for the whole Supabase round trip.
+    Everything else (and all sync methods) still goes through the sync client,
+    so scripts keep working unchanged.
+    """
+
+    def __init__(self, client=None, async_client: "AsyncClient" = None, like_buffer=None, image_ingestor=None,
+                 password_hasher=None, usernames=None, journal=None):
+        super().__init__(client=client, like_buffer=like_buffer, image_ingestor=image_ingestor,
+                         password_hasher=password_hasher, usernames=usernames, journal=journal)
+        self.asb = async_client
+
+    async def connect(self):
+        """Create the async client; call once from inside the running event loop"""
+        if self.asb is None:
+            import httpx
+            from supabase import AsyncClientOptions, acreate_client
+            from src.http_pool import ShardedTransport
+            # Not httpx's default pool: it keeps 20 of 100 connections alive and its bookkeeping
+            # grows with the square of the pool size, which costs more CPU than the sync client
+            transport = ShardedTransport(ASYNC_POOL_SIZE, http2=True)
+            http = httpx.AsyncClient(transport=transport, timeout=ASYNC_TIMEOUT, follow_redirects=True)
+            self.asb = await acreate_client(*supabase_settings(), options=AsyncClientOptions(httpx_client=http))
+        return self
+
+    async def awarm_up(self):
+        """Connect both clients and open pooled connections; called from the API lifespan"""
+        await self.connect()
+        try:
+            await aexecute(self.asb.table("posts").select("id").limit(1), "warm_up")
+        except Exception as e:
+            logger.warning("Async warm-up query failed: %s", e)
+        # Sync endpoints (signup, login, create_post) use the sync client
+        await asyncio.to_thread(self.warm_up)
+
+    async def asignup(self, username: str, password: str, role: str = "user"):
+        if self._maybe_taken(username):
+            existing_user = await aexecute(self._exists_query(self.asb, username), "profiles.exists")
+            if existing_user.data:
+                return {"error": "Username already exists"}
+
+        row = self._profile_row(username, await self.password_hasher.ahash(password), role)
+        try:
+            result = await aexecute(self.asb.table("profiles").insert(row), "profiles.insert")
+        except Exception as e:
+            return self._signup_failed(username, e)
+        return self._signed_up(username, result.data)
+
+    async def aauthenticate(self, username: str, password: str) -> dict:
+        result = await aexecute(self._login_query(self.asb, username), "profiles.login")
+        if not result.data:
+            return {"error": "User not found"}
+
+        user = result.data[0]
+        matches, rehash = await self.password_hasher.averify(password, user["password"])
+        if not matches:
+            return {"error": "Invalid password"}
+        if rehash:
+            try:
+                new_hash = await self.password_hasher.ahash(password)
+                await aexecute(self._rehash_query(self.asb, user, new_hash), "profiles.rehash")
+            except Exception as e:
+                logger.warning("Password rehash failed for user %s: %s", user["id"], e)
+        return self._authenticated(user)
+
+    async def aget_posts(self, limit: int = FEED_PAGE_SIZE, before: str = None, after: str = None):
+        query = self._feed_query(self.asb, limit, before, after)
+        if isinstance(query, dict):
+            return query
+        try:
+            rows = (await aexecute(query, "posts.feed")).data
+        except Overloaded:
+            raise
+        except Exception as e:
+            logger.error("Error fetching posts: %s", e)
+            return self._feed_failed(limit, before, after)
+        return self._feed_page(rows, limit, before, after)
+
+    async def aget_post_by_id(self, post_id: int):
+        post_id = self._real_post_id(post_id)
+        if post_id < 0:
+            return self._pending_post(post_id)
+        result = await aexecute(self._post_query(self.asb, post_id), "posts.by_id")
+        return self._post_rows(result.data)
+
+    async def aget_posts_by_ids(self, post_ids: list) -> list:
+        if not post_ids:
+            return []
+        result = await aexecute(self._posts_by_ids_query(self.asb, post_ids), "posts.by_ids")
+        return self._ordered(self._post_rows(result.data), post_ids)
+
+    async def aget_profiles_by_ids(self, user_ids: list) -> list:
+        if not user_ids:
+            return []
+        return (await aexecute(self._profiles_query(self.asb, user_ids), "profiles.by_ids")).data
+
+    async def aget_comments(self, post_id: int, limit: int = COMMENTS_PAGE_SIZE, before: str = None):
+        post_id = self._real_post_id(post_id)
+        query = self._comments_query(self.asb, post_id, limit, before)
+        if isinstance(query, dict):
+            return query
+        rows = (await aexecute(query, "comments.page")).data if post_id >= 0 else []
+        return self._comments_page(self._with_pending_comments(post_id, rows, before), limit)
+
+    async def aexport_posts(self, since: str = None, chunk_size: int = EXPORT_CHUNK_SIZE):
+        cursor = None
+        while True:
+            rows = (await aexecute(self._export_query(self.asb, since, cursor, chunk_size), "posts.export")).data
+            for row in rows:
+                yield row
+            if len(rows) < chunk_size:
+                return
+            cursor = (rows[-1]["created_at"], rows[-1]["id"])
+
+    async def alike_post(self, post_id: int, user: dict = None):
+        user = user or self.current_user
+        if not user:
+            return {"error": "User not logged in"}
+        if self.journal is not None:
+            return self._queued_response(await self._aqueued("like", user, {"post_id": post_id}))
+        return self._like_response(await self._aset_like(post_id, True, user), True)
+
+    async def aunlike_post(self, post_id: int, user: dict = None):
+        user = user or self.current_user
+        if not user:
+            return {"error": "User not logged in"}
+        if self.journal is not None:
+            return self._queued_response(await self._aqueued("unlike", user, {"post_id": post_id}))
+        return self._like_response(await self._aset_like(post_id, False, user), False)
+
+    async def _aset_like(self, post_id: int, liked: bool, user: dict) -> dict:
+        buffer = self.like_buffer
+        if buffer is not None:
+            # Polled rather than blocking the event loop while a recount runs (see LikeCountBuffer.recount)
+            while not buffer.enter(blocking=False):
+                await asyncio.sleep(0.005)
+        try:
+            params = self._set_like_params(post_id, liked, user)
+            result = await aexecute(self.asb.rpc("set_like", params), "rpc.set_like")
+            return self._apply_set_like(post_id, liked, result.data)
+        finally:
+            if buffer is not None:
+                buffer.leave()
+
+    async def acomment_post(self, post_id: int, content: str, user: dict = None):
+        user = user or self.current_user
+        if not user:
+            return {"error": "User not logged in"}
+        if self.journal is not None:
+            return self._queued_response(await self._aqueued("comment", user, {"post_id": post_id, "content": content}))
+        result = await aexecute(
+            self.asb.table("comments").insert(self._comment_row(post_id, content, user)), "comments.insert"
+        )
+        return result.data
+
+    async def _aqueued(self, op: str, user: dict, args: dict) -> dict:
+        """Journal a write and await its fsync without blocking the event loop"""
+        if not self.journal.knows(args.get("post_id", 0)):
+            return {"error": "Post not found"}
+        return await self.journal.aappend(op, user, args)
@@ -0,0 +1,183 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+TOKEN_TTL = 24 * 60 * 60
+# scrypt cost: 2**14 * 8 * 128 bytes = 16 MiB and roughly 50 ms of one core per hash
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+logger = logging.getLogger(__name__)
+
+
+class TokenError(Exception):
+    pass
+
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+class TokenSigner:
+    """Issues and verifies HMAC-SHA256 signed session tokens.
+
+    A token is `<payload>.<signature>`, where the payload is the user's id,
+    username and role plus an expiry time. Verification is local: nothing
+    is looked up in the database. Recently verified tokens are kept in a
+    small LRU, so a repeat request skips the HMAC and JSON decoding too.
+    Every worker that shares SECRET_KEY accepts the same tokens.
+    """
+
+    def __init__(self, secret: str = None, ttl: int = TOKEN_TTL, cache_size: int = 4096):
+        if not secret:
+            secret = secrets.token_hex(32)
+            logger.warning("SECRET_KEY not set; tokens will not survive a restart or work across workers")
+        self._key = secret.encode()
+        self.ttl = ttl
+        self.cache_size = cache_size
+        self._cache = OrderedDict()     # token -> (expires_at, user)
+        self._lock = threading.Lock()
+
+    def issue(self, user: dict) -> str:
+        payload = {
+            "sub": user["id"],
+            "usr": user["username"],
+            "role": user.get("role", "user"),
+            "exp": int(time.time()) + self.ttl,
+        }
+        body = _b64encode(json.dumps(payload, separators=(",", ":")).encode())
+        return f"{body}.{self._sign(body)}"
+
+    def verify(self, token: str) -> dict:
+        """Return {"id", "username", "role"} for a valid token; raise TokenError otherwise"""
+        now = time.time()
+        with self._lock:
+            cached = self._cache.get(token)
+            if cached is not None:
+                if cached[0] > now:
+                    self._cache.move_to_end(token)
+                    return cached[1]
+                del self._cache[token]
+
+        body, _, signature = token.partition(".")
+        try:
+            # Compared as bytes: compare_digest rejects str with non-ASCII characters with a TypeError
+            if not signature or not hmac.compare_digest(signature.encode(), self._sign(body).encode()):
+                raise TokenError("Invalid token")
+            payload = json.loads(_b64decode(body))
+            expires_at = payload["exp"]
+            user = {"id": payload["sub"], "username": payload["usr"], "role": payload["role"]}
+            expired = expires_at <= now
+        except (ValueError, TypeError, KeyError):
+            # binascii.Error and UnicodeError are ValueErrors
+            raise TokenError("Invalid token")
+        if expired:
+            raise TokenError("Token expired")
+
+        with self._lock:
+            self._cache[token] = (expires_at, user)
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return user
+
+    def _sign(self, body: str) -> str:
+        return _b64encode(hmac.new(self._key, body.encode(), hashlib.sha256).digest())
+
+
+def signer_from_env() -> TokenSigner:
+    return TokenSigner(os.getenv("SECRET_KEY"), ttl=int(os.getenv("TOKEN_TTL", str(TOKEN_TTL))))
+
+
+class PasswordHasher:
+    """Salted scrypt password hashes, computed in a bounded thread pool.
+
+    hashlib.scrypt releases the GIL, so `workers` threads (one per core by
+    default) hash in parallel while request threads and the event loop stay
+    free; extra logins queue for a worker instead of oversubscribing the
+    CPU. Hashes are stored as `scrypt$n$r$p$salt$key`. verify() also accepts
+    rows from before hashing (plaintext) and hashes made with a lower cost,
+    and reports that they should be rehashed with the current parameters.
+    """
+
+    PREFIX = "scrypt"
+
+    def __init__(self, n: int = SCRYPT_N, r: int = SCRYPT_R, p: int = SCRYPT_P, workers: int = None):
+        self.n, self.r, self.p = n, r, p
+        self.workers = workers or os.cpu_count() or 1
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+        self.hashes = 0
+        self.verifications = 0
+
+    def hash(self, password: str) -> str:
+        return self._pool.submit(self._hash, password).result()
+
+    def verify(self, password: str, stored: str) -> tuple:
+        """(matches, needs_rehash) for `password` against a stored value"""
+        return self._pool.submit(self._verify, password, stored).result()
+
+    async def ahash(self, password: str) -> str:
+        return await asyncio.wrap_future(self._pool.submit(self._hash, password))
+
+    async def averify(self, password: str, stored: str) -> tuple:
+        return await asyncio.wrap_future(self._pool.submit(self._verify, password, stored))
+
+    def needs_rehash(self, stored: str) -> bool:
+        params = self._params(stored)
+        return params is None or params[:3] != (self.n, self.r, self.p)
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        return {"workers": self.workers, "cost_n": self.n, "hashes": self.hashes, "verifications": self.verifications}
+
+    def _hash(self, password: str) -> str:
+        salt = secrets.token_bytes(16)
+        key = self._derive(password, salt, self.n, self.r, self.p)
+        self.hashes += 1
+        return f"{self.PREFIX}${self.n}${self.r}${self.p}${_b64encode(salt)}${_b64encode(key)}"
+
+    def _verify(self, password: str, stored: str) -> tuple:
+        self.verifications += 1
+        params = self._params(stored)
+        if params is None:
+            # Plaintext from before passwords were hashed
+            return hmac.compare_digest(password.encode(), (stored or "").encode()), True
+        n, r, p, salt, key = params
+        matches = hmac.compare_digest(self._derive(password, salt, n, r, p), key)
+        return matches, matches and (n, r, p) != (self.n, self.r, self.p)
+
+    def _params(self, stored: str):
+        parts = (stored or "").split("$")
+        if len(parts) != 6 or parts[0] != self.PREFIX:
+            return None
+        try:
+            return int(parts[1]), int(parts[2]), int(parts[3]), _b64decode(parts[4]), _b64decode(parts[5])
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _derive(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+        return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                              maxmem=128 * r * (n + p + 2) + 2 ** 20, dklen=32)
+
+
+def hasher_from_env() -> PasswordHasher:
+    workers = os.getenv("PASSWORD_HASH_WORKERS")
+    return PasswordHasher(
+        n=int(os.getenv("PASSWORD_SCRYPT_N", str(SCRYPT_N))),
+        workers=int(workers) if workers else None
+    )
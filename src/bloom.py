@@ -0,0 +1,57 @@
+import hashlib
+import math
+import threading
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings.
+
+    Sized for `capacity` items at `error_rate` false positives; adding more
+    items than that still works but the false-positive rate climbs. A miss
+    is definite, a hit only means "maybe". `ready` is set once the filter
+    has been filled from the source of truth; until then callers should
+    treat every lookup as a maybe.
+    """
+
+    def __init__(self, capacity: int = 1_000_000, error_rate: float = 0.01):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.bits = max(int(-capacity * math.log(error_rate) / math.log(2) ** 2), 8)
+        self.hashes = max(round(self.bits / capacity * math.log(2)), 1)
+        self._array = bytearray((self.bits + 7) // 8)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.ready = False
+
+    def add(self, item: str):
+        with self._lock:
+            for i in self._positions(item):
+                self._array[i >> 3] |= 1 << (i & 7)
+            self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._array[i >> 3] & (1 << (i & 7)) for i in self._positions(item))
+
+    def bootstrap(self, items) -> int:
+        """Add every item from a full scan, then mark the filter ready"""
+        count = 0
+        for item in items:
+            self.add(item)
+            count += 1
+        self.ready = True
+        return count
+
+    def stats(self) -> dict:
+        return {
+            "items": self.count,
+            "capacity": self.capacity,
+            "bits": self.bits,
+            "hashes": self.hashes,
+            "ready": self.ready,
+        }
+
+    def _positions(self, item: str):
+        # Double hashing: k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
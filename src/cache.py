@@ -0,0 +1,187 @@
+import hashlib
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+
+class FeedCache:
+    """TTL + LRU cache of feed pages keyed by (limit, before, after).
+
+    Entries are indexed by the post ids they contain so a mutation only
+    touches the pages that actually show that post.
+
+    `version` counts feed mutations seen by this process and backs the ETags
+    on feed reads. A tag also carries a per-process id and the current TTL
+    window, so it never matches on another worker and stops matching after at
+    most `ttl` seconds, the same staleness the cache itself allows.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: float = 30.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()   # key -> (expires_at, page)
+        self._by_post = {}              # post_id -> set of keys
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.version = 0
+        self._instance = secrets.token_hex(4)
+
+    @staticmethod
+    def key(limit: int, before: str = None, after: str = None):
+        return (limit, before, after)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, page = entry
+            if expires_at <= time.monotonic():
+                self._drop(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return page
+
+    def put(self, key, page: dict):
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.monotonic() + self.ttl, page)
+            for post in page.get("posts", []):
+                self._by_post.setdefault(post["id"], set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def patch_post(self, post_id: int, **fields):
+        """Update fields of one post in every cached page that shows it"""
+        with self._lock:
+            for key in self._by_post.get(post_id, ()):
+                expires_at, page = self._entries[key]
+                # Copy on write: a page handed out earlier may still be serializing
+                posts = [dict(p, **fields) if p["id"] == post_id else p for p in page["posts"]]
+                self._entries[key] = (expires_at, dict(page, posts=posts))
+
+    def invalidate_post(self, post_id: int):
+        """Drop every cached page that shows this post"""
+        with self._lock:
+            for key in list(self._by_post.get(post_id, ())):
+                self._drop(key)
+                self.invalidations += 1
+
+    def invalidate_head(self):
+        """Drop pages a brand-new post could appear on: the first page and `after` polls.
+
+        Pages fetched with a `before` cursor only hold older posts and stay valid.
+        """
+        with self._lock:
+            for key in [k for k in self._entries if k[1] is None]:
+                self._drop(key)
+                self.invalidations += 1
+
+    def bump_version(self):
+        """Record a feed mutation; every ETag handed out so far stops matching"""
+        with self._lock:
+            self.version += 1
+
+    def etag(self, *request) -> str:
+        """Weak ETag for a feed read identified by `request`, computed without any I/O"""
+        window = int(time.time() // max(self.ttl, 1))
+        digest = hashlib.blake2b(repr(request).encode(), digest_size=6).hexdigest()
+        return f'W/"{self._instance}-{self.version}-{window}-{digest}"'
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_post.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "version": self.version,
+            }
+
+    def _drop(self, key):
+        _, page = self._entries.pop(key)
+        for post in page.get("posts", []):
+            keys = self._by_post.get(post["id"])
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_post[post["id"]]
+
+
+class ProfileCache:
+    """TTL + LRU cache of public profiles by user id, shared by every request.
+
+    Usernames never change, so the TTL only bounds how long a deleted or
+    edited profile can still be shown.
+    """
+
+    def __init__(self, max_entries: int = 10_000, ttl: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()   # user_id -> (expires_at, profile)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_many(self, user_ids) -> tuple:
+        """({user_id: profile} for cached ids, [ids to fetch])"""
+        found, missing = {}, []
+        now = time.monotonic()
+        with self._lock:
+            for user_id in user_ids:
+                entry = self._entries.get(user_id)
+                if entry is not None and entry[0] > now:
+                    self._entries.move_to_end(user_id)
+                    found[user_id] = entry[1]
+                else:
+                    missing.append(user_id)
+            self.hits += len(found)
+            self.misses += len(missing)
+        return found, missing
+
+    def put_many(self, profiles: list):
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            for profile in profiles:
+                self._entries[profile["id"]] = (expires_at, profile)
+                self._entries.move_to_end(profile["id"])
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
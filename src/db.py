@@ -1,53 +1,553 @@
 import os
-from supabase import create_client, Client
 from dotenv import load_dotenv
-import requests
-from datetime import datetime
-load_dotenv()
+import base64
+import itertools
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import TYPE_CHECKING
+from src.metrics import DB_CALLS, DB_ERRORS, DB_BYTES, DB_LATENCY
+from src.logs import log_event
+from src.auth import PasswordHasher
+from src.bloom import BloomFilter
+from src.limits import REQUEST_LIMIT, Overloaded
+from src.trending import timestamp
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-if not SUPABASE_KEY:
-    raise ValueError("Supabase Key not found. Please check your .env file.")
-if not SUPABASE_URL:
-    raise ValueError("Supabase URL not found. Please check your .env file.")
+if TYPE_CHECKING:
+    from supabase import Client
+    from src.journal import WriteJournal
 
-sb: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+
+def supabase_settings():
+    """Read (SUPABASE_URL, SUPABASE_KEY) from the environment / .env"""
+    load_dotenv()
+    url = os.getenv("SUPABASE_URL")
+    key = os.getenv("SUPABASE_KEY")
+    if not key:
+        raise ValueError("Supabase Key not found. Please check your .env file.")
+    if not url:
+        raise ValueError("Supabase URL not found. Please check your .env file.")
+    return url, key
+
+
+def get_client() -> "Client":
+    """Return this process's shared Supabase client, creating it on first use.
+
+    Importing this module does no I/O; the client (and its connection pool)
+    is built lazily once per process, so a forked worker builds its own
+    instead of inheriting its parent's sockets.
+    """
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is None or _client_pid != pid:
+        with _client_lock:
+            if _client is None or _client_pid != pid:
+                from supabase import create_client
+                _client = create_client(*supabase_settings())
+                _client_pid = pid
+    return _client
+
+
+def set_client(client):
+    """Use `client` as this process's shared client (benchmarks, fakes)"""
+    global _client, _client_pid
+    with _client_lock:
+        _client, _client_pid = client, os.getpid()
+
+
+def _reset_after_fork():
+    global _client, _client_pid, _client_lock
+    _client, _client_pid, _client_lock = None, None, threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+logger = logging.getLogger(__name__)
+
+FEED_PAGE_SIZE = 20
+MAX_FEED_PAGE_SIZE = 100
+# Newest comments embedded with each feed post; the rest come from GET /posts/{id}/comments
+FEED_COMMENT_PREVIEW = 3
+COMMENTS_PAGE_SIZE = 20
+# Rows per ranged read when streaming an export
+EXPORT_CHUNK_SIZE = 500
+# Items per batch request; each batch costs a fixed handful of round trips
+MAX_BATCH_SIZE = 100
+# Follow lists are read in pages of this many rows, at most PostgREST's default max-rows,
+# so the server never cuts a page short and the last page is the first short one
+FOLLOWS_PAGE_SIZE = 1000
+# Only the columns a feed card renders; everything else stays in the database
+POST_COLUMNS = "id, user_id, content, image_url, image_status, like_count, created_at"
+COMMENT_COLUMNS = "id, user_id, content, created_at"
+# Author is joined on posts.user_id (sql/006_posts_author_fk.sql)
+AUTHOR_SELECT = "author:profiles!user_id(username)"
+# Public profile fields served by /users/batch and the author loader
+PROFILE_COLUMNS = "id, username, created_at"
+# Posts plus author, newest comments and comment total, resolved by PostgREST in one query
+FEED_SELECT = f"{POST_COLUMNS}, {AUTHOR_SELECT}, comments({COMMENT_COLUMNS}), comment_total:comments(count)"
+
+FEED_UNAVAILABLE = "Posts are unavailable right now, try again shortly"
+# Response bytes are measured on one call in this many and scaled up: re-serializing every
+# payload just to count it would cost the hot path a second json.dumps
+DB_BYTES_SAMPLE = max(1, int(os.getenv("DB_BYTES_SAMPLE", "20")))
+_sampled_calls = itertools.count()
+
+
+def record_round_trip(op: str, started: float, data=None, failed: bool = False):
+    """Count one Supabase call for /metrics: latency, round trips, sampled response bytes"""
+    DB_LATENCY.observe(time.perf_counter() - started, op)
+    DB_CALLS.inc(op)
+    if failed:
+        DB_ERRORS.inc(op)
+    elif data and next(_sampled_calls) % DB_BYTES_SAMPLE == 0:
+        DB_BYTES.inc(op, amount=DB_BYTES_SAMPLE * len(json.dumps(data, default=str)))
+
+
+def execute(query, op: str):
+    """Run a query builder's execute() and record it under `op`.
+
+    Inside an API request the call first takes a slot from the request's
+    ConcurrencyLimit and raises Overloaded if none is free.
+    """
+    limit = REQUEST_LIMIT.get()
+    if limit is not None:
+        limit.acquire()
+    started = time.perf_counter()
+    try:
+        response = query.execute()
+    except Exception:
+        record_round_trip(op, started, failed=True)
+        raise
+    finally:
+        if limit is not None:
+            limit.release()
+    record_round_trip(op, started, response.data)
+    return response
+
+
+def encode_cursor(post: dict) -> str:
+    """Pack a post's (created_at, id) position into an opaque feed cursor"""
+    raw = json.dumps([post["created_at"], post["id"]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """Unpack a feed cursor into (created_at, id); raises ValueError if malformed.
+
+    Cursors come from clients and end up inside a PostgREST filter string
+    (keyset_filter), so only an ISO timestamp and an integer id get through.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, post_id = json.loads(raw)
+        if not isinstance(created_at, str) or not isinstance(post_id, int) or isinstance(post_id, bool):
+            raise ValueError("Invalid cursor")
+        timestamp(created_at)
+        return created_at, post_id
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+
+def keyset_filter(cursor, op: str) -> str:
+    """PostgREST `or` filter for rows strictly after a decoded cursor (op is "lt" or "gt")"""
+    created_at, row_id = cursor
+    return f'created_at.{op}."{created_at}",and(created_at.eq."{created_at}",id.{op}.{row_id})'
+
+
+def is_unique_violation(error: Exception) -> bool:
+    """True for a Postgres unique_violation (23505) surfaced by PostgREST"""
+    return getattr(error, "code", None) == "23505" or "duplicate key" in str(error)
+
+
+def feed_unavailable() -> dict:
+    """A feed read that failed in the datastore; never cached, tagged or shown as an empty feed"""
+    return {"error": FEED_UNAVAILABLE, "unavailable": True}
+
+
+def shape_post(post: dict) -> dict:
+    """Flatten the embedded comment aggregate into a plain comment_count"""
+    if post.get("like_count") is None:
+        post["like_count"] = 0
+    total = post.pop("comment_total", None)
+    if isinstance(total, list):
+        post["comment_count"] = total[0]["count"] if total else 0
+    return post
+
+
+class LikeCountBuffer:
+    """Write-behind aggregation of like_count deltas per post.
+
+    like/unlike add +1/-1 here instead of updating the posts row; a background
+    thread applies the summed deltas in one `apply_like_deltas` call every
+    `interval` seconds, or sooner once `max_pending` events are buffered.
+    Reads add `pending(post_id)` on top of the stored count until the flush lands.
+    A like writes its row, then adds its delta; `changing()` spans the two so
+    `recount()` never lands in between.
+    """
+
+    def __init__(self, client: "Client" = None, interval: float = 1.0, max_pending: int = 1000):
+        self._client = client
+        self.interval = interval
+        self.max_pending = max_pending
+        self._deltas = {}       # post_id -> summed delta not yet sent
+        self._inflight = {}     # post_id -> delta sent but not yet confirmed
+        self._events = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._gate = threading.Condition()
+        self._changing = 0      # likes between their row write and their add()
+        self._recounting = False
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def sb(self):
+        return self._client or get_client()
+
+    def add(self, post_id: int, delta: int):
+        with self._lock:
+            self._deltas[post_id] = self._deltas.get(post_id, 0) + delta
+            self._events += 1
+            full = self._events >= self.max_pending
+        if full:
+            self._wake.set()
+
+    def pending(self, post_id: int) -> int:
+        with self._lock:
+            return self._deltas.get(post_id, 0) + self._inflight.get(post_id, 0)
+
+    def overlay(self, posts: list) -> list:
+        """Add not-yet-flushed deltas to the like_count of each post dict in place"""
+        with self._lock:
+            if not self._deltas and not self._inflight:
+                return posts
+            for post in posts:
+                delta = self._deltas.get(post["id"], 0) + self._inflight.get(post["id"], 0)
+                if delta:
+                    post["like_count"] = max((post.get("like_count") or 0) + delta, 0)
+        return posts
+
+    @contextmanager
+    def changing(self):
+        """Held by a like from before its row write until its delta is added"""
+        self.enter()
+        try:
+            yield
+        finally:
+            self.leave()
+
+    def enter(self, blocking: bool = True) -> bool:
+        """Start a like; waits out a running recount, or returns False if not blocking"""
+        with self._gate:
+            while self._recounting:
+                if not blocking:
+                    return False
+                self._gate.wait()
+            self._changing += 1
+            return True
+
+    def leave(self):
+        with self._gate:
+            self._changing -= 1
+            if not self._changing:
+                self._gate.notify_all()
+
+    def recount(self, post_ids, recount):
+        """Run `recount()` for post_ids with no like half done, dropping their buffered deltas.
+
+        The recount counts every like row, so a delta still buffered or in
+        flight for those posts would count its like twice; one added after
+        the recount, for a row it had already counted, would too.
+        """
+        with self._gate:
+            while self._recounting:
+                self._gate.wait()
+            self._recounting = True
+            while self._changing:
+                self._gate.wait()
+        try:
+            # Holding the flush lock waits out a flush in flight and keeps the next one off these posts
+            with self._flush_lock:
+                with self._lock:
+                    dropped = {post_id: self._deltas.pop(post_id) for post_id in post_ids if post_id in self._deltas}
+                try:
+                    recount()
+                except Exception:
+                    with self._lock:
+                        for post_id, delta in dropped.items():
+                            self._deltas[post_id] = self._deltas.get(post_id, 0) + delta
+                    raise
+        finally:
+            with self._gate:
+                self._recounting = False
+                self._gate.notify_all()
+
+    def flush(self) -> int:
+        """Send all buffered deltas in one round trip; returns the number of posts updated"""
+        with self._flush_lock:
+            with self._lock:
+                batch = {k: v for k, v in self._deltas.items() if v}
+                self._inflight = batch
+                self._deltas = {}
+                self._events = 0
+            if not batch:
+                return 0
+            try:
+                execute(self.sb.rpc("apply_like_deltas", {
+                    "p_deltas": [{"post_id": k, "delta": v} for k, v in batch.items()]
+                }), "rpc.apply_like_deltas")
+            except Exception as e:
+                logger.error("Error flushing like counts: %s", e)
+                # Put the batch back so the next flush retries it
+                with self._lock:
+                    for post_id, delta in batch.items():
+                        self._deltas[post_id] = self._deltas.get(post_id, 0) + delta
+                    self._events += len(batch)
+                return 0
+            finally:
+                with self._lock:
+                    self._inflight = {}
+            return len(batch)
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="like-count-buffer", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the flusher and drain whatever is still buffered"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
 
 
 class DatabaseManager:
-    def __init__(self):
-        self.sb = sb
+    def __init__(self, client: "Client" = None, like_buffer: LikeCountBuffer = None, image_ingestor=None,
+                 password_hasher: PasswordHasher = None, usernames: BloomFilter = None,
+                 journal: "WriteJournal" = None):
+        self._client = client
         self.current_user = None
+        # Password hashing and checks run in this pool, off request threads and the event loop
+        self.password_hasher = password_hasher or PasswordHasher()
+        # Taken usernames; a definite miss lets signup skip its existence query
+        self.usernames = usernames or BloomFilter()
+        # When set, like_count changes are aggregated and written behind
+        self.like_buffer = like_buffer
+        # When set, post images are downloaded and uploaded by a worker pool
+        self.image_ingestor = image_ingestor
+        # When set, posts, likes and comments are acknowledged once journaled locally
+        # and applied to Supabase by a JournalReplayer
+        self.journal = journal
+        # Posts whose like_count moved since the last exact recount
+        self._touched_like_posts = set()
+        self._touched_lock = threading.Lock()
+
+    @property
+    def sb(self):
+        """The injected client, or the lazily created per-process shared one"""
+        return self._client or get_client()
+
+    def warm_up(self):
+        """Build the client and open a pooled connection before the first real request"""
+        try:
+            execute(self.sb.table("posts").select("id").limit(1), "warm_up")
+        except Exception as e:
+            logger.warning("Warm-up query failed: %s", e)
 
     def signup(self, username, password, role: str = "user"):
-        existing_user = self.sb.table("profiles").select("id").eq("username", username).execute()
-        if existing_user.data:
-            return {"error": "Username already exists"}
+        if self._maybe_taken(username):
+            existing_user = execute(self._exists_query(self.sb, username), "profiles.exists")
+            if existing_user.data:
+                return {"error": "Username already exists"}
+
+        row = self._profile_row(username, self.password_hasher.hash(password), role)
+        try:
+            result = execute(self.sb.table("profiles").insert(row), "profiles.insert")
+        except Exception as e:
+            return self._signup_failed(username, e)
+        return self._signed_up(username, result.data)
+
+    # The unique constraint on profiles.username decides; the filter only saves the
+    # pre-check for names it has never seen (other workers' signups included)
+    def _maybe_taken(self, username: str) -> bool:
+        return not self.usernames.ready or username in self.usernames
+
+    @staticmethod
+    def _exists_query(client, username: str):
+        return client.table("profiles").select("id").eq("username", username)
 
-        result = self.sb.table("profiles").insert({
+    @staticmethod
+    def _profile_row(username: str, password_hash: str, role: str) -> dict:
+        return {
             "username": username,
-            "password": password,
+            "password": password_hash,
             "role": role
-        }).execute()
-        return result.data
+        }
+
+    def _signup_failed(self, username: str, error: Exception) -> dict:
+        if not is_unique_violation(error):
+            raise error
+        self.usernames.add(username)
+        return {"error": "Username already exists"}
+
+    def _signed_up(self, username: str, rows: list) -> list:
+        self.usernames.add(username)
+        return [{k: v for k, v in row.items() if k != "password"} for row in rows]
 
     def login(self, username: str, password: str):
-        result = self.sb.table("profiles").select("*").eq("username", username).execute()
+        """Check credentials and remember the user on this manager (for scripts)"""
+        user = self.authenticate(username, password)
+        if "error" in user:
+            return user
+        self.current_user = user
+        return {"message": "Login successful", "user": user['username']}
+
+    def authenticate(self, username: str, password: str) -> dict:
+        """Check credentials and return the profile (id, username, role) without any session state"""
+        result = execute(self._login_query(self.sb, username), "profiles.login")
         if not result.data:
             return {"error": "User not found"}
 
         user = result.data[0]
-        if user["password"] == password:
-            self.current_user = user
-            return {"message": "Login successful", "user": user['username']}
-        else:
+        matches, rehash = self.password_hasher.verify(password, user["password"])
+        if not matches:
             return {"error": "Invalid password"}
+        if rehash:
+            try:
+                new_hash = self.password_hasher.hash(password)
+                execute(self._rehash_query(self.sb, user, new_hash), "profiles.rehash")
+            except Exception as e:
+                logger.warning("Password rehash failed for user %s: %s", user["id"], e)
+        return self._authenticated(user)
+
+    @staticmethod
+    def _login_query(client, username: str):
+        return client.table("profiles").select("id, username, role, password").eq("username", username)
+
+    @staticmethod
+    def _rehash_query(client, user: dict, new_hash: str):
+        """Upgrade a plaintext or lower-cost hash; a no-op if the password changed meanwhile"""
+        return (
+            client.table("profiles").update({"password": new_hash})
+            .eq("id", user["id"]).eq("password", user["password"])
+        )
+
+    @staticmethod
+    def _authenticated(user: dict) -> dict:
+        return {"id": user["id"], "username": user["username"], "role": user.get("role", "user")}
+
+    def export_usernames(self, chunk_size: int = EXPORT_CHUNK_SIZE):
+        """Yield every username, walking profiles by id one ranged read at a time"""
+        last_id = None
+        while True:
+            query = self.sb.table("profiles").select("id, username")
+            if last_id is not None:
+                query = query.gt("id", last_id)
+            rows = execute(query.order("id").limit(chunk_size), "profiles.export").data
+            for row in rows:
+                yield row["username"]
+            if len(rows) < chunk_size:
+                return
+            last_id = rows[-1]["id"]
 
     def get_user_by_username(self, username: str):
-        result = self.sb.table("profiles").select("id", "username", "created_at", "role").eq("username", username).execute()
+        result = execute(
+            self.sb.table("profiles").select("id", "username", "created_at", "role").eq("username", username),
+            "profiles.by_username"
+        )
         return result.data[0]
 
+    def get_profiles_by_ids(self, user_ids: list) -> list:
+        """Public profiles for the given ids in one query; missing ids are skipped"""
+        if not user_ids:
+            return []
+        result = execute(self._profiles_query(self.sb, user_ids), "profiles.by_ids")
+        return result.data
+
+    @staticmethod
+    def _profiles_query(client, user_ids: list):
+        return client.table("profiles").select(PROFILE_COLUMNS).in_("id", sorted(set(user_ids)))
+
+    # Follow graph (sql/007_follows.sql)
+    def follow(self, followee_id: int, user: dict = None):
+        return self._set_follow(followee_id, True, user)
+
+    def unfollow(self, followee_id: int, user: dict = None):
+        return self._set_follow(followee_id, False, user)
+
+    def _set_follow(self, followee_id: int, follow: bool, user: dict):
+        """Insert or delete the follows row and move follower_count in one round trip"""
+        user = user or self.current_user
+        if not user:
+            return {"error": "User not logged in"}
+        if followee_id == user["id"]:
+            return {"error": "You cannot follow yourself"}
+        result = execute(self.sb.rpc("set_follow", {
+            "p_follower_id": user["id"],
+            "p_followee_id": followee_id,
+            "p_follow": follow
+        }), "rpc.set_follow")
+        row = result.data[0] if result.data else {"changed": False, "follower_count": 0}
+        return {"changed": bool(row["changed"]), "follower_count": row["follower_count"] or 0}
+
+    def get_follower_count(self, user_id: int) -> int:
+        result = execute(
+            self.sb.table("profiles").select("follower_count").eq("id", user_id), "profiles.follower_count"
+        )
+        return (result.data[0].get("follower_count") or 0) if result.data else 0
+
+    def get_follower_ids(self, user_id: int) -> list:
+        """Every follower of `user_id`, however many pages that takes"""
+        rows = self._follows_pages("follower_id", "followee_id", user_id, "follower_id", "follows.followers")
+        return [row["follower_id"] for row in rows]
+
+    def get_following(self, user_id: int) -> list:
+        """[(followee_id, follower_count)] for everyone `user_id` follows"""
+        rows = self._follows_pages("followee_id", "follower_id", user_id,
+                                   "followee_id, followee:profiles!followee_id(follower_count)", "follows.following")
+        return [(row["followee_id"], (row.get("followee") or {}).get("follower_count") or 0) for row in rows]
+
+    def _follows_pages(self, key: str, match: str, user_id: int, columns: str, op: str) -> list:
+        """All follows rows with `match` = user_id, keyset-paginated on `key` (both columns are indexed)"""
+        rows, last = [], None
+        while True:
+            query = self.sb.table("follows").select(columns).eq(match, user_id)
+            if last is not None:
+                query = query.gt(key, last)
+            page = execute(query.order(key).limit(FOLLOWS_PAGE_SIZE), op).data
+            rows += page
+            if len(page) < FOLLOWS_PAGE_SIZE:
+                return rows
+            last = page[-1][key]
+
+    def get_author_post_ids(self, author_ids: list, limit: int) -> list:
+        """Newest post ids by any of `author_ids`, newest first"""
+        if not author_ids:
+            return []
+        result = execute(
+            self.sb.table("posts").select("id").in_("user_id", list(author_ids)).order("id", desc=True).limit(limit),
+            "posts.by_authors"
+        )
+        return [row["id"] for row in result.data]
+
     # def create_post(self, content: str, image_url: str = ""):
     #     if not self.current_user:
     #         return {"error": "User not logged in"}
@@ -80,49 +580,69 @@ class DatabaseManager:
     #     except Exception as e:
     #         print("❌ Error uploading image:", e)
     #         return None
-    def upload_image(self, image_url: str) -> str:
-        """Upload image from URL to Supabase storage and return public URL"""
-        try:
-            response = requests.get(image_url)
-            if response.status_code != 200:
-                raise Exception("Failed to download image")
+    def create_post(self, content: str, image_url: str = "", user: dict = None):
+        """Create a new post; an image URL is ingested in the background.
 
-            filename = f"{self.current_user['id']}_{int(datetime.utcnow().timestamp())}.jpg"
-
-            self.sb.storage.from_("images").upload(
-                path=filename,
-                file=response.content,
-                file_options={"content-type": "image/jpeg"}
-            )
-
-            # ✅ Extract only the URL string
-            public_url = self.sb.storage.from_("images").get_public_url(filename)
+        The post is returned straight away with image_status "pending" and is
+        updated to "ready" (with the stored image_url) or "failed" later.
+        """
+        user = user or self.current_user
+        if not user:
+            return {"error": "User not logged in"}
+        if self.journal is not None:
+            return self._queued_response(self._queued("create_post", user, {"content": content,
+                                                                            "image_url": image_url or ""}))
 
+        data = {
+            "content": content,
+            "user_id": user["id"],
+            "image_url": None,
+            "image_status": "pending" if image_url else None
+        }
 
-            return public_url
+        result = execute(self.sb.table("posts").insert(data), "posts.insert")
+        post = result.data[0] if result.data else data
+        if image_url and "id" in post:
+            self._ingest_image(post["id"], image_url)
+        return {"success": True, "message": "Post created", "post": post}
 
-        except Exception as e:
-            print("❌ Error uploading image:", e)
-            return None
+    def _ingest_image(self, post_id: int, image_url: str):
+        if self.image_ingestor is not None:
+            self.image_ingestor.submit(post_id, image_url)
+        else:
+            # Scripts without a worker pool ingest inline
+            from src.images import ImageIngestor
+            ImageIngestor(self.sb).ingest(post_id, image_url)
 
+    def create_posts(self, items: list, user: dict = None):
+        """Create many posts with one bulk insert; items are {"content", "image_url"} dicts.
 
-    def create_post(self, content: str, image_url: str = ""):
-        """Create a new post with optional image upload"""
-        if not self.current_user:
+        Returns {"results": [...]} with one {"success", "post"} per item, in order.
+        """
+        user = user or self.current_user
+        if not user:
             return {"error": "User not logged in"}
+        if not 0 < len(items) <= MAX_BATCH_SIZE:
+            return {"error": f"Batch must contain 1 to {MAX_BATCH_SIZE} items"}
+        if self.journal is not None:
+            # Through the journal like single writes, so replay keeps them in one order
+            entries = self._queued_many("create_post", user, [
+                {"content": item["content"], "image_url": item.get("image_url") or ""} for item in items
+            ])
+            return {"results": [self._queued_response(entry) for entry in entries]}
 
-        final_image_url = None
-        if image_url:
-            final_image_url = self.upload_image(image_url)
-
-        data = {
-            "content": content,
-            "user_id": self.current_user["id"],
-            "image_url": final_image_url
-        }
-
-        self.sb.table("posts").insert(data).execute()
-        return {"success": True, "message": "Post created"}
+        rows = [{
+            "content": item["content"],
+            "user_id": user["id"],
+            "image_url": None,
+            "image_status": "pending" if item.get("image_url") else None
+        } for item in items]
+        posts = execute(self.sb.table("posts").insert(rows), "posts.insert_batch").data
+        # PostgREST returns bulk-inserted rows in input order
+        for item, post in zip(items, posts):
+            if item.get("image_url"):
+                self._ingest_image(post["id"], item["image_url"])
+        return {"results": [{"success": True, "post": post} for post in posts]}
 
     # def like_post(self, post_id: int):
     #     if not self.current_user:
@@ -153,7 +673,7 @@ class DatabaseManager:
     #     return {"message": "Unliked successfully"}
     def count_likes(self, post_id: int) -> int:
         """Count number of likes for a post"""
-        result = self.sb.table("likes").select("id", count="exact").eq("post_id", post_id).execute()
+        result = execute(self.sb.table("likes").select("id", count="exact").eq("post_id", post_id), "likes.count")
         return result.count or 0
 
     # def update_like_count(self, post_id: int) -> int:
@@ -165,7 +685,7 @@ class DatabaseManager:
         """Update the like_count column in posts table"""
         likes = self.count_likes(post_id)
         # Use the correct column name (id instead of post_id)
-        self.sb.table("posts").update({"like_count": likes}).eq("id", post_id).execute()
+        execute(self.sb.table("posts").update({"like_count": likes}).eq("id", post_id), "posts.update_like_count")
         return likes
 
 
@@ -180,74 +700,496 @@ class DatabaseManager:
     #     like_count = self.update_like_count(post_id)
     #     return {"success": True, "like_count": like_count}
 
-    def like_post(self, post_id: int):
-        if not self.current_user:
+    def like_post(self, post_id: int, user: dict = None):
+        """Like a post and return the new like_count in a single round trip"""
+        user = user or self.current_user
+        if not user:
             return {"error": "User not logged in"}
-        
-        user_id = self.current_user["id"]
+        if self.journal is not None:
+            return self._queued_response(self._queued("like", user, {"post_id": post_id}))
 
-        # Check if the user already liked the post
-        existing = self.sb.table("likes").select("id").eq("post_id", post_id).eq("user_id", user_id).execute()
-        if existing.data:
-            return {"message": "Already liked", "like_count": self.count_likes(post_id)}
+        return self._like_response(self._set_like(post_id, True, user), True)
 
-        # Insert new like
-        self.sb.table("likes").insert({"post_id": post_id, "user_id": user_id}).execute()
+    def unlike_post(self, post_id: int, user: dict = None):
+        """Remove a like and return the new like_count in a single round trip"""
+        user = user or self.current_user
+        if not user:
+            return {"error": "User not logged in"}
+        if self.journal is not None:
+            return self._queued_response(self._queued("unlike", user, {"post_id": post_id}))
 
-        # Update like_count
-        like_count = self.update_like_count(post_id)
-        return {"success": True, "like_count": like_count}
+        return self._like_response(self._set_like(post_id, False, user), False)
 
-    def unlike_post(self, post_id: int):
-        """Remove a like and update like_count"""
-        if not self.current_user:
-            return {"error": "User not logged in"}
+    @staticmethod
+    def _like_response(row: dict, liked: bool) -> dict:
+        if not row["changed"]:
+            message = "Already liked" if liked else "You have not liked this post"
+            return {"message": message, "like_count": row["like_count"]}
+        return {"success": True, "like_count": row["like_count"]}
 
-        user_id = self.current_user["id"]
+    def _set_like(self, post_id: int, liked: bool, user: dict) -> dict:
+        """Toggle the (post, user) like row and bump posts.like_count atomically.
 
-        # Check if the user has liked this post
-        existing = self.sb.table("likes").select("id").eq("post_id", post_id).eq("user_id", user_id).execute()
-        if not existing.data:
-            # User hasn't liked this post
-            return {"message": "You have not liked this post", "like_count": self.count_likes(post_id)}
+        See sql/002_atomic_likes.sql for the `set_like` function.
+        """
+        with self._like_change():
+            result = execute(self.sb.rpc("set_like", self._set_like_params(post_id, liked, user)), "rpc.set_like")
+            return self._apply_set_like(post_id, liked, result.data)
 
-        # Delete the like
-        self.sb.table("likes").delete().eq("post_id", post_id).eq("user_id", user_id).execute()
+    def _like_change(self):
+        return self.like_buffer.changing() if self.like_buffer is not None else nullcontext()
+
+    def _set_like_params(self, post_id: int, liked: bool, user: dict) -> dict:
+        return {
+            "p_post_id": post_id,
+            "p_user_id": user["id"],
+            "p_liked": liked,
+            "p_bump_count": self.like_buffer is None
+        }
 
-        # Update the like_count column
-        like_count = self.update_like_count(post_id)
+    def _apply_set_like(self, post_id: int, liked: bool, data: list, record: bool = True) -> dict:
+        """Record a set_like result locally (reconcile set, like buffer) and return it"""
+        row = data[0] if data else {"changed": False, "like_count": 0}
+        like_count = row["like_count"] or 0
+        if row["changed"] and record:
+            self._record_like_change(post_id, liked)
+        if self.like_buffer is not None:
+            like_count = max(like_count + self.like_buffer.pending(post_id), 0)
+        return {"changed": bool(row["changed"]), "like_count": like_count}
 
-        return {"success": True, "like_count": like_count}
+    def _record_like_change(self, post_id: int, liked: bool):
+        with self._touched_lock:
+            self._touched_like_posts.add(post_id)
+        if self.like_buffer is not None:
+            self.like_buffer.add(post_id, 1 if liked else -1)
 
-    
+    def reconcile_like_counts(self, post_ids=None) -> int:
+        """Recount like_count exactly for the given posts (default: posts touched since last run)"""
+        if post_ids is None:
+            with self._touched_lock:
+                post_ids, self._touched_like_posts = self._touched_like_posts, set()
+        post_ids = sorted(post_ids)
+        if not post_ids:
+            return 0
 
-    def comment_post(self, post_id: int, content: str):
-        if not self.current_user:
+        def recount():
+            execute(self.sb.rpc("reconcile_like_counts", {"p_post_ids": post_ids}), "rpc.reconcile_like_counts")
+
+        if self.like_buffer is None:
+            recount()
+        else:
+            self.like_buffer.recount(post_ids, recount)
+        return len(post_ids)
+
+    def comment_post(self, post_id: int, content: str, user: dict = None):
+        user = user or self.current_user
+        if not user:
             return {"error": "User not logged in"}
+        if self.journal is not None:
+            return self._queued_response(self._queued("comment", user, {"post_id": post_id, "content": content}))
+
+        result = execute(self.sb.table("comments").insert(self._comment_row(post_id, content, user)), "comments.insert")
+        return result.data
 
-        result = self.sb.table("comments").insert({
-            "user_id": self.current_user["id"],
+    @staticmethod
+    def _comment_row(post_id: int, content: str, user: dict) -> dict:
+        return {
+            "user_id": user["id"],
             "post_id": post_id,
             "content": content
-        }).execute()
-        return result.data
+        }
+
+    # Journaled writes (src/journal.py): acknowledged once the entry is on local disk,
+    # overlaid on reads until a JournalReplayer applies them
+    def _queued(self, op: str, user: dict, args: dict) -> dict:
+        """Journal a write and wait until it is durable; returns the entry, or an error dict"""
+        if not self.journal.knows(args.get("post_id", 0)):
+            return {"error": "Post not found"}
+        return self.journal.append(op, user, args).result()
+
+    def _queued_many(self, op: str, user: dict, args_list: list) -> list:
+        """Journal a batch in order and wait once: all of it usually shares a single fsync"""
+        futures = [self.journal.append(op, user, args) if self.journal.knows(args.get("post_id", 0))
+                   else None for args in args_list]
+        return [future.result() if future is not None else {"error": "Post not found"} for future in futures]
+
+    def _queued_response(self, entry: dict):
+        """What the direct write returns, minus what only the datastore knows (ids, like_count)"""
+        if "error" in entry:
+            return entry
+        if entry["op"] == "create_post":
+            return {"success": True, "message": "Post created", "pending": True, "post": self.journal.post_row(entry)}
+        if entry["op"] == "comment":
+            return [dict(self.journal.comment_row(entry), pending=True)]
+        return {"success": True, "pending": True}
+
+    def apply_journal_entries(self, entries: list) -> list:
+        """Apply journaled writes in order, in one transaction; returns the row each one produced.
+
+        Each entry's key is stored with its result in the same transaction, so
+        an entry replayed after a crash or a lost response gets the first
+        result back instead of being written twice (sql/009_write_journal.sql).
+        """
+        params = {
+            "p_entries": [{"key": e["key"], "op": e["op"], "user_id": e["user"]["id"], "args": e["args"],
+                           "at": e["at"]} for e in entries],
+            "p_bump_count": self.like_buffer is None
+        }
+        with self._like_change():
+            rows = execute(self.sb.rpc("apply_journal_entries", params), "rpc.apply_journal_entries").data
+            # Buffer the like deltas before leaving the gate; journal_result only reports them
+            for entry, row in zip(entries, rows):
+                if entry["op"] in ("like", "unlike") and row["changed"]:
+                    self._record_like_change(entry["args"]["post_id"], entry["op"] == "like")
+        return rows
+
+    def journal_result(self, entry: dict, row: dict):
+        """Local bookkeeping for an applied entry; returns what the direct write would have"""
+        if entry["op"] == "create_post":
+            if entry["args"].get("image_url"):
+                self._ingest_image(row["id"], entry["args"]["image_url"])
+            return {"success": True, "message": "Post created", "post": row}
+        if entry["op"] == "comment":
+            return [row]
+        liked = entry["op"] == "like"
+        return self._like_response(self._apply_set_like(entry["args"]["post_id"], liked, [row], record=False), liked)
+
+    def _real_post_id(self, post_id: int) -> int:
+        return self.journal.resolve(post_id) if self.journal is not None and post_id < 0 else post_id
+
+    def _pending_post(self, post_id: int) -> list:
+        post = self.journal.post_by_id(post_id) if self.journal is not None else None
+        return self._post_rows([post]) if post else []
+
+    def _with_pending_comments(self, post_id: int, rows: list, before: str) -> list:
+        if self.journal is None:
+            return rows
+        return self.journal.merge_comments(post_id, rows, decode_cursor(before) if before else None)
+
+    # Batch mutations: a fixed number of round trips per batch, whatever its size
+    def _existing_posts(self, post_ids) -> set:
+        ids = sorted(set(post_ids))
+        rows = execute(self.sb.table("posts").select("id").in_("id", ids), "posts.exists_batch").data
+        return {row["id"] for row in rows}
+
+    def set_likes(self, post_ids: list, liked: bool, user: dict = None):
+        """Like or unlike many posts for one user.
+
+        One query finds the posts, one finds the user's existing likes, one
+        bulk insert or delete applies the change, and a single
+        reconcile_like_counts call recounts each distinct changed post. Returns
+        {"results": [...]} with {"post_id", "changed", "like_count"} or an
+        error per requested id, in order.
+        """
+        user = user or self.current_user
+        if not user:
+            return {"error": "User not logged in"}
+        if not 0 < len(post_ids) <= MAX_BATCH_SIZE:
+            return {"error": f"Batch must contain 1 to {MAX_BATCH_SIZE} items"}
+        if self.journal is not None:
+            # A direct write here could land before an earlier journaled like, which replay would then undo
+            unique = list(dict.fromkeys(post_ids))
+            entries = dict(zip(unique, self._queued_many("like" if liked else "unlike", user,
+                                                         [{"post_id": post_id} for post_id in unique])))
+            return {"results": [
+                {"post_id": post_id, "error": entries[post_id]["error"]} if "error" in entries[post_id]
+                else {"post_id": post_id, "pending": True}
+                for post_id in post_ids
+            ]}
+
+        known = self._existing_posts(post_ids)
+        ids = sorted(known)
+        changed = set()
+        if ids:
+            liked_rows = execute(
+                self.sb.table("likes").select("post_id").eq("user_id", user["id"]).in_("post_id", ids),
+                "likes.exists_batch"
+            ).data
+            already = {row["post_id"] for row in liked_rows}
+            if liked:
+                rows = [{"post_id": i, "user_id": user["id"]} for i in ids if i not in already]
+                if rows:
+                    # A like racing in from another request is skipped, not an error
+                    inserted = execute(self.sb.table("likes").upsert(
+                        rows, on_conflict="post_id,user_id", ignore_duplicates=True
+                    ), "likes.insert_batch").data
+                    changed = {row["post_id"] for row in inserted}
+            elif already:
+                deleted = execute(
+                    self.sb.table("likes").delete().eq("user_id", user["id"]).in_("post_id", sorted(already)),
+                    "likes.delete_batch"
+                ).data
+                changed = {row["post_id"] for row in deleted}
+
+        counts = {}
+        if changed:
+            self.reconcile_like_counts(changed)
+        if ids:
+            rows = execute(self.sb.table("posts").select("id", "like_count").in_("id", ids), "posts.like_counts").data
+            if self.like_buffer is not None:
+                self.like_buffer.overlay(rows)
+            counts = {row["id"]: row["like_count"] or 0 for row in rows}
+
+        results, seen = [], set()
+        for post_id in post_ids:
+            if post_id not in known:
+                results.append({"post_id": post_id, "error": "Post not found"})
+                continue
+            # A repeated id only changes things once
+            results.append({"post_id": post_id, "changed": post_id in changed and post_id not in seen,
+                            "like_count": counts.get(post_id, 0)})
+            seen.add(post_id)
+        return {"results": results}
+
+    def comment_posts(self, items: list, user: dict = None):
+        """Add many comments with one existence query and one bulk insert; items are {"post_id", "content"}"""
+        user = user or self.current_user
+        if not user:
+            return {"error": "User not logged in"}
+        if not 0 < len(items) <= MAX_BATCH_SIZE:
+            return {"error": f"Batch must contain 1 to {MAX_BATCH_SIZE} items"}
+        if self.journal is not None:
+            entries = self._queued_many("comment", user, [
+                {"post_id": item["post_id"], "content": item["content"]} for item in items
+            ])
+            return {"results": [
+                {"post_id": item["post_id"], "error": entry["error"]} if "error" in entry
+                else {"post_id": item["post_id"], "comment": self._queued_response(entry)[0]}
+                for item, entry in zip(items, entries)
+            ]}
+
+        known = self._existing_posts(item["post_id"] for item in items)
+        valid = [item for item in items if item["post_id"] in known]
+        inserted = iter(execute(
+            self.sb.table("comments").insert([self._comment_row(i["post_id"], i["content"], user) for i in valid]),
+            "comments.insert_batch"
+        ).data if valid else [])
+        return {"results": [
+            {"post_id": item["post_id"], "comment": next(inserted)} if item["post_id"] in known
+            else {"post_id": item["post_id"], "error": "Post not found"}
+            for item in items
+        ]}
 
     # def get_posts(self):
     #     result = self.sb.table("posts").select("*").execute()
     #     return result.data
-    def get_posts(self):
+    def get_posts(self, limit: int = FEED_PAGE_SIZE, before: str = None, after: str = None):
+        """Return one feed page, newest first, keyset-paginated on (created_at, id).
+
+        `before` pages towards older posts, `after` fetches posts newer than the cursor.
+        """
+        query = self._feed_query(self.sb, limit, before, after)
+        if isinstance(query, dict):
+            return query
         try:
-            response = sb.table("posts").select("*").execute()
-            posts = response.data
-            print("📢 Processed posts:", posts)           # DEBUG
-            return posts
+            rows = execute(query, "posts.feed").data
+        except Overloaded:
+            raise
         except Exception as e:
-            print("❌ Error fetching posts:", e)
-            return []
+            logger.error("Error fetching posts: %s", e)
+            return self._feed_failed(limit, before, after)
+        return self._feed_page(rows, limit, before, after)
+
+    def _feed_query(self, client, limit: int, before: str, after: str):
+        """Build the feed query on `client`, or return an error dict for bad arguments"""
+        if before and after:
+            return {"error": "Use either before or after, not both"}
+        limit = max(1, min(limit, MAX_FEED_PAGE_SIZE))
+        try:
+            cursor = decode_cursor(after or before) if (after or before) else None
+        except ValueError as e:
+            return {"error": str(e)}
+
+        query = (
+            client.table("posts").select(FEED_SELECT)
+            .order("created_at", desc=True, foreign_table="comments")
+            .limit(FEED_COMMENT_PREVIEW, foreign_table="comments")
+        )
+        if after:
+            query = query.or_(keyset_filter(cursor, "gt")).order("created_at").order("id")
+        else:
+            if before:
+                query = query.or_(keyset_filter(cursor, "lt"))
+            query = query.order("created_at", desc=True).order("id", desc=True)
+        # One extra row tells us whether another page exists
+        return query.limit(limit + 1)
+
+    def _feed_failed(self, limit: int, before: str, after: str) -> dict:
+        """The feed read failed: with a journal, this worker's own pending posts, flagged partial"""
+        if self.journal is None:
+            return feed_unavailable()
+        page = self._feed_page([], limit, before, after)
+        if not page["posts"]:
+            return feed_unavailable()
+        # Not a real page boundary, so no cursors to page from
+        return dict(page, next_cursor=None, prev_cursor=None, partial=True)
+
+    def _feed_page(self, rows: list, limit: int, before: str, after: str) -> dict:
+        limit = max(1, min(limit, MAX_FEED_PAGE_SIZE))
+        if self.journal is not None:
+            cursor = decode_cursor(after or before) if (after or before) else None
+            rows = self.journal.merge_posts(rows, None if after else cursor, cursor if after else None)
+        has_more = len(rows) > limit
+        posts = [shape_post(p) for p in rows[:limit]]
+        if after:
+            posts.reverse()
+        if self.like_buffer is not None:
+            self.like_buffer.overlay(posts)
+        if self.journal is not None:
+            self.journal.overlay(posts, FEED_COMMENT_PREVIEW)
+        log_event(logger, "feed_page", posts=len(posts), has_more=has_more, before=before, after=after)
+
+        # next_cursor continues towards older posts (pass as `before`),
+        # prev_cursor polls for newer ones (pass as `after`)
+        if after:
+            next_cursor = encode_cursor(posts[-1]) if posts else before
+            prev_cursor = encode_cursor(posts[0]) if posts else after
+        else:
+            next_cursor = encode_cursor(posts[-1]) if has_more else None
+            prev_cursor = encode_cursor(posts[0]) if posts else None
+        return {"posts": posts, "next_cursor": next_cursor, "prev_cursor": prev_cursor}
 
     def get_post_by_id(self, post_id: int):
-        result = self.sb.table("posts").select("*").eq("id", post_id).execute()
-        return result.data
+        post_id = self._real_post_id(post_id)
+        if post_id < 0:
+            return self._pending_post(post_id)
+        result = execute(self._post_query(self.sb, post_id), "posts.by_id")
+        return self._post_rows(result.data)
+
+    @staticmethod
+    def _post_query(client, post_id: int):
+        return (
+            client.table("posts").select(FEED_SELECT).eq("id", post_id)
+            .order("created_at", desc=True, foreign_table="comments")
+            .limit(FEED_COMMENT_PREVIEW, foreign_table="comments")
+        )
+
+    def get_posts_by_ids(self, post_ids: list) -> list:
+        """Feed-shaped posts for the given ids, in the given order; missing ids are skipped"""
+        if not post_ids:
+            return []
+        result = execute(self._posts_by_ids_query(self.sb, post_ids), "posts.by_ids")
+        return self._ordered(self._post_rows(result.data), post_ids)
+
+    @staticmethod
+    def _posts_by_ids_query(client, post_ids: list):
+        return (
+            client.table("posts").select(FEED_SELECT).in_("id", list(post_ids))
+            .order("created_at", desc=True, foreign_table="comments")
+            .limit(FEED_COMMENT_PREVIEW, foreign_table="comments")
+        )
+
+    @staticmethod
+    def _ordered(posts: list, post_ids: list) -> list:
+        by_id = {p["id"]: p for p in posts}
+        return [by_id[i] for i in post_ids if i in by_id]
+
+    def _post_rows(self, rows: list) -> list:
+        posts = [shape_post(p) for p in rows]
+        if self.like_buffer is not None:
+            self.like_buffer.overlay(posts)
+        if self.journal is not None:
+            self.journal.overlay(posts, FEED_COMMENT_PREVIEW)
+        return posts
+
+    def get_comments(self, post_id: int, limit: int = COMMENTS_PAGE_SIZE, before: str = None):
+        """Return one page of a post's comments, newest first, keyset-paginated like the feed"""
+        post_id = self._real_post_id(post_id)
+        query = self._comments_query(self.sb, post_id, limit, before)
+        if isinstance(query, dict):
+            return query
+        rows = execute(query, "comments.page").data if post_id >= 0 else []
+        return self._comments_page(self._with_pending_comments(post_id, rows, before), limit)
+
+    @staticmethod
+    def _comments_query(client, post_id: int, limit: int, before: str):
+        limit = max(1, min(limit, MAX_FEED_PAGE_SIZE))
+        query = client.table("comments").select(COMMENT_COLUMNS).eq("post_id", post_id)
+        if before:
+            try:
+                query = query.or_(keyset_filter(decode_cursor(before), "lt"))
+            except ValueError as e:
+                return {"error": str(e)}
+        return query.order("created_at", desc=True).order("id", desc=True).limit(limit + 1)
+
+    @staticmethod
+    def _comments_page(rows: list, limit: int) -> dict:
+        limit = max(1, min(limit, MAX_FEED_PAGE_SIZE))
+        comments = rows[:limit]
+        next_cursor = encode_cursor(comments[-1]) if len(rows) > limit else None
+        return {"comments": comments, "next_cursor": next_cursor}
+
+    def export_posts(self, since: str = None, chunk_size: int = EXPORT_CHUNK_SIZE):
+        """Yield every post created after `since`, oldest first, one ranged read at a time.
+
+        Only one chunk is held in memory, whatever the size of the table.
+        """
+        cursor = None
+        while True:
+            rows = execute(self._export_query(self.sb, since, cursor, chunk_size), "posts.export").data
+            yield from rows
+            if len(rows) < chunk_size:
+                return
+            cursor = (rows[-1]["created_at"], rows[-1]["id"])
+
+    @staticmethod
+    def _export_query(client, since: str, cursor, chunk_size: int):
+        query = client.table("posts").select(POST_COLUMNS)
+        if since:
+            query = query.gt("created_at", since)
+        if cursor:
+            query = query.or_(keyset_filter(cursor, "gt"))
+        return query.order("created_at").order("id").limit(chunk_size)
+
+    def export_activity(self, table: str, since: str = None, chunk_size: int = EXPORT_CHUNK_SIZE):
+        """Yield (post_id, created_at) for every `likes` or `comments` row created after `since`, oldest first"""
+        cursor = None
+        while True:
+            query = self.sb.table(table).select("id, post_id, created_at")
+            if since:
+                query = query.gt("created_at", since)
+            if cursor:
+                query = query.or_(keyset_filter(cursor, "gt"))
+            rows = execute(query.order("created_at").order("id").limit(chunk_size), f"{table}.export").data
+            for row in rows:
+                yield row["post_id"], row["created_at"]
+            if len(rows) < chunk_size:
+                return
+            cursor = (rows[-1]["created_at"], rows[-1]["id"])
+
+class LikeReconciler:
+    """Background job that periodically runs the exact like recount for touched posts"""
+
+    def __init__(self, db: DatabaseManager, interval: float = 300.0):
+        self.db = db
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="like-reconciler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        # Final pass so nothing touched before shutdown is left unreconciled
+        self._reconcile()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._reconcile()
+
+    def _reconcile(self):
+        try:
+            self.db.reconcile_like_counts()
+        except Exception as e:
+            logger.error("Error reconciling like counts: %s", e)
+
+
 # s=DatabaseManager()
 # print(s.login("admin","artham432779"))
 # print(s.create_post("image upload","ht108009A3A73D6A8E916D6E5388BE096CA8&selectedIndex=20&itb=0"))
@@ -0,0 +1,105 @@
+import asyncio
+import json
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """One listener's bounded queue of encoded Server-Sent Event frames"""
+
+    def __init__(self, hub, maxsize: int):
+        self._hub = hub
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> str:
+        frame = await self.queue.get()
+        if frame is None:
+            raise StopAsyncIteration
+        return frame
+
+    def close(self):
+        self._hub.unsubscribe(self)
+
+
+class EventHub:
+    """In-process pub/sub for live feed deltas, fanned out to SSE subscribers.
+
+    publish() may be called from any thread (sync endpoints run in the
+    threadpool); delivery always happens on the event loop passed to bind().
+    Each event is encoded once and the same frame is queued for every
+    subscriber. A subscriber whose queue is full is dropped rather than
+    allowed to hold up the others; its stream ends and the client reconnects.
+    """
+
+    def __init__(self, queue_size: int = 256):
+        self.queue_size = queue_size
+        self._subscribers = set()
+        self._loop = None
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self.published = 0
+        self.dropped = 0
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
+
+    def subscribe(self) -> Subscription:
+        sub = Subscription(self, self.queue_size)
+        self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        self._subscribers.discard(sub)
+
+    def publish(self, event: str, **data):
+        """Queue `event` for every subscriber; a no-op until bind() and while nobody listens"""
+        loop = self._loop
+        if loop is None or not self._subscribers:
+            return
+        with self._lock:
+            self._next_id += 1
+            event_id = self._next_id
+        frame = f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data, separators=(',', ':'), default=str)}\n\n"
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._deliver(frame)
+        else:
+            try:
+                loop.call_soon_threadsafe(self._deliver, frame)
+            except RuntimeError:
+                pass    # loop already closed during shutdown
+
+    def close(self):
+        """End every open stream; called from the API lifespan on shutdown"""
+        for sub in list(self._subscribers):
+            self._end(sub)
+
+    def stats(self) -> dict:
+        return {"subscribers": len(self._subscribers), "published": self.published, "dropped": self.dropped}
+
+    def _deliver(self, frame: str):
+        self.published += 1
+        for sub in list(self._subscribers):
+            try:
+                sub.queue.put_nowait(frame)
+            except asyncio.QueueFull:
+                self.dropped += 1
+                sub.dropped = True
+                logger.debug("Dropping event subscriber with %d undelivered events", sub.queue.qsize())
+                self._end(sub)
+
+    def _end(self, sub: Subscription):
+        self._subscribers.discard(sub)
+        # Make room for the end-of-stream marker; undelivered frames are lost anyway
+        while not sub.queue.empty():
+            sub.queue.get_nowait()
+        sub.queue.put_nowait(None)
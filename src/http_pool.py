@@ -0,0 +1,66 @@
+import asyncio
+import math
+import httpx
+
+# Connections per shard. httpcore's pool walks all its connections, and counts the idle
+# ones once per idle connection, each time a request starts or finishes, so that cost
+# grows with the square of its size; many small pools keep it flat.
+SHARD_SIZE = 4
+
+
+class _SlotStream(httpx.AsyncByteStream):
+    """Response body that gives its slot back once httpx has read and closed it"""
+
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            release, self._release = self._release, None
+            if release is not None:
+                release()
+
+
+class ShardedTransport(httpx.AsyncBaseTransport):
+    """httpx transport spreading requests over small connection pools.
+
+    At most `size` requests are in flight; the rest wait on a semaphore
+    instead of in httpcore's queue, which is rescanned on every event. Each
+    request goes to the shard with the fewest in flight, so it never waits
+    inside a shard either. Slots are held until the response body is closed.
+    """
+
+    def __init__(self, size: int, shard_size: int = SHARD_SIZE, **transport_kwargs):
+        shards = max(1, math.ceil(size / shard_size))
+        limits = httpx.Limits(max_connections=shard_size, max_keepalive_connections=shard_size)
+        self._shards = [httpx.AsyncHTTPTransport(limits=limits, **transport_kwargs) for _ in range(shards)]
+        self._in_flight = [0] * shards
+        self._slots = asyncio.Semaphore(shards * shard_size)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await self._slots.acquire()
+        shard = min(range(len(self._shards)), key=self._in_flight.__getitem__)
+        self._in_flight[shard] += 1
+
+        def release():
+            self._in_flight[shard] -= 1
+            self._slots.release()
+
+        try:
+            response = await self._shards[shard].handle_async_request(request)
+        except BaseException:
+            release()
+            raise
+        response.stream = _SlotStream(response.stream, release)
+        return response
+
+    async def aclose(self):
+        for shard in self._shards:
+            await shard.aclose()
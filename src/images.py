@@ -0,0 +1,134 @@
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from src.db import get_client, execute
+
+logger = logging.getLogger(__name__)
+
+IMAGE_BUCKET = "images"
+CONTENT_TYPES = {
+    "image/jpeg": ".jpg",
+    "image/png": ".png",
+    "image/gif": ".gif",
+    "image/webp": ".webp",
+}
+
+
+class ImageTooLarge(Exception):
+    pass
+
+
+class ImageIngestor:
+    """Downloads post images off the request path and stores them by content hash.
+
+    Each image is streamed in `chunk_size` pieces to a temp file while being
+    hashed, so memory per upload is one chunk no matter how big the image is.
+    Objects are named `<sha256><ext>`, so an image that is already in the
+    bucket is never uploaded twice. The post's image_status moves from
+    `pending` to `ready` or `failed` when the worker finishes, and
+    `on_marked(post_id, fields)` then lets the platform update its caches.
+    """
+
+    def __init__(self, client=None, workers: int = 4, chunk_size: int = 64 * 1024,
+                 max_bytes: int = 10 * 1024 * 1024, timeout: float = 10.0, on_marked=None):
+        self._client = client
+        self.on_marked = on_marked
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self._known = set()     # object names already in the bucket
+        self._lock = threading.Lock()
+        self._pool = None
+
+    @property
+    def sb(self):
+        return self._client or get_client()
+
+    def submit(self, post_id: int, image_url: str):
+        """Queue an image for background ingestion and return its Future"""
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="image-ingest")
+            return self._pool.submit(self.ingest, post_id, image_url)
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait)
+
+    def ingest(self, post_id: int, image_url: str) -> str:
+        """Download, dedup and upload one image, then mark the post ready or failed"""
+        try:
+            public_url = self._store(image_url)
+        except Exception as e:
+            logger.error("Error uploading image for post %s: %s", post_id, e)
+            self._mark(post_id, {"image_status": "failed"})
+            return None
+        self._mark(post_id, {"image_url": public_url, "image_status": "ready"})
+        return public_url
+
+    def _store(self, image_url: str) -> str:
+        with requests.get(image_url, stream=True, timeout=self.timeout) as response:
+            if response.status_code != 200:
+                raise Exception(f"Failed to download image (HTTP {response.status_code})")
+            content_type = response.headers.get("content-type", "image/jpeg").split(";")[0].strip()
+            if not content_type.startswith("image/"):
+                raise Exception(f"Not an image: {content_type}")
+            declared = int(response.headers.get("content-length") or 0)
+            if declared > self.max_bytes:
+                raise ImageTooLarge(f"Image is {declared} bytes (limit {self.max_bytes})")
+
+            digest = hashlib.sha256()
+            size = 0
+            fd, tmp_path = tempfile.mkstemp(prefix="ingest-")
+            try:
+                with os.fdopen(fd, "wb") as tmp:
+                    for chunk in response.iter_content(chunk_size=self.chunk_size):
+                        size += len(chunk)
+                        if size > self.max_bytes:
+                            raise ImageTooLarge(f"Image exceeds {self.max_bytes} bytes")
+                        digest.update(chunk)
+                        tmp.write(chunk)
+                name = digest.hexdigest() + CONTENT_TYPES.get(content_type, ".img")
+                self._upload(name, tmp_path, content_type)
+            finally:
+                os.unlink(tmp_path)
+        return self.sb.storage.from_(IMAGE_BUCKET).get_public_url(name)
+
+    def _upload(self, name: str, path: str, content_type: str):
+        with self._lock:
+            if name in self._known:
+                return
+        try:
+            with open(path, "rb") as f:
+                self.sb.storage.from_(IMAGE_BUCKET).upload(
+                    path=name,
+                    file=f,
+                    file_options={"content-type": content_type}
+                )
+        except Exception as e:
+            # Same bytes were uploaded before (possibly by another process)
+            if "Duplicate" not in str(e) and "already exists" not in str(e):
+                raise
+        with self._lock:
+            self._known.add(name)
+
+    def _mark(self, post_id: int, fields: dict):
+        try:
+            execute(self.sb.table("posts").update(fields).eq("id", post_id), "posts.update_image")
+        except Exception as e:
+            logger.error("Error updating image status for post %s: %s", post_id, e)
+            return
+        if self.on_marked is not None:
+            try:
+                self.on_marked(post_id, fields)
+            except Exception as e:
+                logger.error("Error publishing image status for post %s: %s", post_id, e)
@@ -0,0 +1,558 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+# Mutations that can be journaled; each is a branch of apply_journal_entry in sql/009_write_journal.sql
+JOURNAL_OPS = ("create_post", "like", "unlike", "comment")
+# Provisional -> real post ids remembered for clients still holding a provisional id
+ID_MAP_SIZE = 10_000
+REPLAY_BATCH_SIZE = 100
+
+_sync = getattr(os, "fdatasync", os.fsync)
+
+
+def _lock_file(fd: int):
+    """Exclusive, non-blocking lock: BlockingIOError while another process holds it.
+
+    fcntl is imported here, not at the top, so the API still imports on
+    platforms without it (Windows) as long as no journal is configured.
+    """
+    import fcntl
+    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+
+def is_permanent_error(error: Exception) -> bool:
+    """True for errors Postgres raised about the data itself (SQLSTATE classes 22, 23, raise_exception).
+
+    Retrying those cannot succeed; anything else (timeouts, 5xx, connection
+    errors) is assumed to be transient.
+    """
+    code = str(getattr(error, "code", None) or "")
+    return code[:2] in ("22", "23") or code == "P0001"
+
+
+class WriteJournal:
+    """Append-only local log of posts, likes and comments not yet applied to the datastore.
+
+    append() returns a Future that resolves once the entry is on disk. One
+    writer thread turns everything queued since its last write into a single
+    write + fdatasync (group commit), so concurrent requests share the cost
+    of a flush. Entries and the "applied"/"failed" markers written after
+    them are JSON lines; on open, a torn last line from a crash is cut off
+    and every entry without a marker is pending again.
+
+    Pending posts and comments are shown with a provisional negative id
+    taken from the entry's random key, so ids from different workers do
+    not collide; pending likes and comments on a new post are moved to its
+    real id once it is applied. The file is locked while open, so each
+    worker process needs its own (see claim_journal), and reads only
+    overlay this worker's pending writes.
+    """
+
+    def __init__(self, path: str, fsync: bool = True, compact_bytes: int = 64 * 1024 * 1024):
+        self.path = path
+        self.fsync = fsync
+        self.compact_bytes = compact_bytes
+        self._lock = threading.Lock()       # in-memory state and the write queue
+        self._io_lock = threading.Lock()    # the file; taken before _lock when both are needed
+        self._queued = threading.Condition(self._lock)
+        # Set whenever new entries become durable; the replayer waits on it
+        self.ready = threading.Event()
+        self._queue = []                    # (line, entry or None, Future or None)
+        self._pending = OrderedDict()       # seq -> entry, oldest first
+        self._new_posts = OrderedDict()     # provisional id -> pending create_post entry
+        self._by_post = {}                  # post_id -> pending like/unlike/comment entries
+        self._ids = OrderedDict()           # provisional id -> real post id
+        self._next_seq = 1
+        self._durable_seq = 0
+        self._closed = False
+        self.appended = 0
+        self.batches = 0
+        self.applied = 0
+        self.failed = 0
+        self.compactions = 0
+
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            # Raises BlockingIOError while another process has this journal open
+            _lock_file(self._fd)
+            self._size = self._load()
+        except BaseException:
+            os.close(self._fd)
+            raise
+        self._compact_at = max(self.compact_bytes, 2 * self._size)
+        self.ready.set()
+        self._thread = threading.Thread(target=self._run, name="write-journal", daemon=True)
+        self._thread.start()
+
+    # -- writes ---------------------------------------------------------
+    def append(self, op: str, user: dict, args: dict) -> Future:
+        """Queue a mutation by `user`; the Future resolves to its entry once it is durable"""
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Write journal is closed")
+            seq = self._next_seq
+            self._next_seq += 1
+            if "post_id" in args:
+                args = dict(args, post_id=self._ids.get(args["post_id"], args["post_id"]))
+            entry = {
+                "seq": seq,
+                "key": uuid.uuid4().hex,
+                "op": op,
+                "user": {"id": user["id"], "username": user.get("username")},
+                "args": args,
+                "at": datetime.now(timezone.utc).isoformat(timespec="microseconds"),
+            }
+            self._add(entry)
+            self._queue.append((self._encode(entry), entry, future))
+            self._queued.notify()
+            self.appended += 1
+        return future
+
+    async def aappend(self, op: str, user: dict, args: dict) -> dict:
+        return await asyncio.wrap_future(self.append(op, user, args))
+
+    def mark_applied(self, seq: int, post_id: int = None):
+        """Record that entry `seq` landed; `post_id` is the real id of a created post"""
+        marker = {"applied": seq} if post_id is None else {"applied": seq, "post_id": post_id}
+        with self._lock:
+            if self._settle(seq, post_id):
+                self.applied += 1
+            self._queue.append((self._encode(marker), None, None))
+            self._queued.notify()
+
+    def mark_failed(self, seq: int, error: str):
+        """Give up on entry `seq`; the marker keeps the reason next to the entry"""
+        with self._lock:
+            if self._settle(seq):
+                self.failed += 1
+            self._queue.append((self._encode({"failed": seq, "error": error}), None, None))
+            self._queued.notify()
+
+    def close(self):
+        """Write out whatever is queued, then release the file"""
+        with self._lock:
+            self._closed = True
+            self._queued.notify()
+        self._thread.join()
+        os.close(self._fd)
+
+    # -- replay ---------------------------------------------------------
+    def next_batch(self, limit: int = REPLAY_BATCH_SIZE) -> list:
+        """The oldest durable entries not yet applied, in order.
+
+        A batch stops before an entry on a provisional post id, so it only
+        goes out once the post it refers to has landed and been renumbered.
+        """
+        batch = []
+        with self._lock:
+            for seq, entry in self._pending.items():
+                if seq > self._durable_seq or len(batch) == limit:
+                    break
+                if batch and entry["args"].get("post_id", 0) < 0:
+                    break
+                batch.append(entry)
+        return batch
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def maybe_compact(self) -> bool:
+        """Rewrite the file with only the pending entries once it has grown past the threshold"""
+        if self._size < self._compact_at:
+            return False
+        self.compact()
+        return True
+
+    def compact(self):
+        tmp = self.path + ".compact"
+        with self._io_lock:
+            with self._lock:
+                lines = [self._encode({"next_seq": self._next_seq})]
+                lines += [self._encode(e) for seq, e in self._pending.items() if seq <= self._durable_seq]
+            fd = os.open(tmp, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o600)
+            try:
+                # Lock before the rename so no other process can claim the new file in between
+                _lock_file(fd)
+                data = b"".join(lines)
+                self._write_all(fd, data)
+                _sync(fd)
+                os.replace(tmp, self.path)
+                self._sync_dir()
+            except BaseException:
+                os.close(fd)
+                raise
+            os.close(self._fd)
+            self._fd = fd
+            self._size = len(data)
+            self._compact_at = max(self.compact_bytes, 2 * self._size)
+            self.compactions += 1
+
+    # -- reads ----------------------------------------------------------
+    def resolve(self, post_id: int) -> int:
+        """The real id for a provisional post id that has been applied; other ids unchanged"""
+        with self._lock:
+            return self._ids.get(post_id, post_id)
+
+    def knows(self, post_id: int) -> bool:
+        """False for a provisional id this journal never handed out"""
+        with self._lock:
+            return post_id >= 0 or post_id in self._ids or post_id in self._new_posts
+
+    @staticmethod
+    def provisional_id(entry: dict) -> int:
+        return -int(entry["key"][:12], 16) - 1
+
+    def post_row(self, entry: dict) -> dict:
+        """A pending create_post entry as a feed-shaped post"""
+        return {
+            "id": self.provisional_id(entry),
+            "user_id": entry["user"]["id"],
+            "content": entry["args"]["content"],
+            "image_url": None,
+            "image_status": "pending" if entry["args"].get("image_url") else None,
+            "like_count": 0,
+            "created_at": entry["at"],
+            "comments": [],
+            "comment_count": 0,
+            "author": {"username": entry["user"]["username"]},
+        }
+
+    def comment_row(self, entry: dict) -> dict:
+        return {
+            "id": self.provisional_id(entry),
+            "user_id": entry["user"]["id"],
+            "post_id": entry["args"]["post_id"],
+            "content": entry["args"]["content"],
+            "created_at": entry["at"],
+            "author": {"username": entry["user"]["username"]},
+        }
+
+    def merge_posts(self, rows: list, before=None, after=None) -> list:
+        """Add pending posts inside a feed page's (created_at, id) cursor range to `rows`.
+
+        `rows` are in query order: newest first, or oldest first for `after`
+        polls. `before`/`after` are decoded cursors.
+        """
+        with self._lock:
+            if not self._new_posts:
+                return rows
+            pending = [self.post_row(e) for e in self._new_posts.values()]
+        if before:
+            pending = [p for p in pending if (p["created_at"], p["id"]) < tuple(before)]
+        if after:
+            pending = [p for p in pending if (p["created_at"], p["id"]) > tuple(after)]
+        if not pending:
+            return rows
+        return sorted(rows + pending, key=lambda p: (p["created_at"], p["id"]), reverse=not after)
+
+    def post_by_id(self, post_id: int):
+        """The pending post with provisional id `post_id`, or None"""
+        with self._lock:
+            entry = self._new_posts.get(post_id)
+        return self.post_row(entry) if entry else None
+
+    def merge_comments(self, post_id: int, rows: list, before=None) -> list:
+        """Add pending comments on `post_id` older than the decoded `before` cursor to newest-first `rows`"""
+        with self._lock:
+            pending = [self.comment_row(e) for e in self._by_post.get(post_id, ()) if e["op"] == "comment"]
+        if before:
+            pending = [c for c in pending if (c["created_at"], c["id"]) < tuple(before)]
+        if not pending:
+            return rows
+        return sorted(rows + pending, key=lambda c: (c["created_at"], c["id"]), reverse=True)
+
+    def overlay(self, posts: list, preview: int) -> list:
+        """Apply pending likes and comments to feed-shaped post dicts in place.
+
+        Likes are netted per user: only their first and last pending op count,
+        the first standing in for the state before it (a like implies "not
+        liked yet"), so repeating a call moves like_count once. The count is
+        exact again once the entries are applied.
+        """
+        with self._lock:
+            if not self._by_post:
+                return posts
+            changes = {p["id"]: list(self._by_post[p["id"]]) for p in posts if p["id"] in self._by_post}
+        for post in posts:
+            entries = changes.get(post["id"])
+            if not entries:
+                continue
+            first_last = {}
+            for e in entries:
+                if e["op"] != "comment":
+                    first_last[e["user"]["id"]] = (first_last.get(e["user"]["id"], (e["op"],))[0], e["op"])
+            delta = sum((last == "like") - (first == "unlike") for first, last in first_last.values())
+            if delta:
+                post["like_count"] = max((post.get("like_count") or 0) + delta, 0)
+            comments = [self.comment_row(e) for e in reversed(entries) if e["op"] == "comment"]
+            if comments:
+                post["comment_count"] = (post.get("comment_count") or 0) + len(comments)
+                post["comments"] = (comments + post.get("comments", []))[:preview]
+        return posts
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "pending": len(self._pending),
+                "appended": self.appended,
+                "batches": self.batches,
+                "applied": self.applied,
+                "failed": self.failed,
+                "compactions": self.compactions,
+                "bytes": self._size,
+            }
+
+    # -- internals ------------------------------------------------------
+    @staticmethod
+    def _encode(record: dict) -> bytes:
+        return json.dumps(record, separators=(",", ":")).encode() + b"\n"
+
+    def _add(self, entry: dict):
+        self._pending[entry["seq"]] = entry
+        if entry["op"] == "create_post":
+            self._new_posts[self.provisional_id(entry)] = entry
+        else:
+            self._by_post.setdefault(entry["args"]["post_id"], []).append(entry)
+
+    def _settle(self, seq: int, post_id: int = None) -> bool:
+        """Drop entry `seq` from the pending state; False if it was not pending"""
+        entry = self._pending.pop(seq, None)
+        if entry is None:
+            return False
+        if entry["op"] == "create_post":
+            provisional = self.provisional_id(entry)
+            del self._new_posts[provisional]
+            if post_id is not None:
+                self._renumber(provisional, post_id)
+        else:
+            entries = self._by_post[entry["args"]["post_id"]]
+            entries.remove(entry)
+            if not entries:
+                del self._by_post[entry["args"]["post_id"]]
+        return True
+
+    def _renumber(self, provisional: int, post_id: int):
+        self._ids[provisional] = post_id
+        while len(self._ids) > ID_MAP_SIZE:
+            self._ids.popitem(last=False)
+        moved = self._by_post.pop(provisional, [])
+        for entry in moved:
+            entry["args"]["post_id"] = post_id
+        if moved:
+            merged = self._by_post.get(post_id, []) + moved
+            self._by_post[post_id] = sorted(merged, key=lambda e: e["seq"])
+
+    def _load(self) -> int:
+        """Rebuild the pending state from the file; returns the length of its intact prefix"""
+        good = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                self._restore(record)
+                good += len(line)
+            end = f.seek(0, os.SEEK_END)
+        if end > good:
+            logger.warning("Write journal %s: dropping %d bytes after the last complete record", self.path,
+                           end - good)
+            os.ftruncate(self._fd, good)
+            _sync(self._fd)
+        os.lseek(self._fd, good, os.SEEK_SET)
+        self._durable_seq = self._next_seq - 1
+        if self._pending:
+            logger.warning("Write journal %s: %d entries still to apply", self.path, len(self._pending))
+        return good
+
+    def _restore(self, record: dict):
+        if "op" in record:
+            if "post_id" in record["args"]:
+                record["args"]["post_id"] = self._ids.get(record["args"]["post_id"], record["args"]["post_id"])
+            self._add(record)
+            self._next_seq = max(self._next_seq, record["seq"] + 1)
+        elif "applied" in record:
+            self._settle(record["applied"], record.get("post_id"))
+        elif "failed" in record:
+            self._settle(record["failed"])
+        elif "next_seq" in record:
+            self._next_seq = max(self._next_seq, record["next_seq"])
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._queue and not self._closed:
+                    self._queued.wait()
+                if not self._queue:
+                    return
+                batch, self._queue = self._queue, []
+            self._write(batch)
+
+    def _write(self, batch: list):
+        data = b"".join(line for line, _, _ in batch)
+        entries = [(entry, future) for _, entry, future in batch if entry is not None]
+        with self._io_lock:
+            try:
+                self._write_all(self._fd, data)
+                if self.fsync:
+                    _sync(self._fd)
+            except OSError as e:
+                logger.error("Write journal %s: write failed: %s", self.path, e)
+                # Cut the partial write off so later records are not hidden behind a torn line
+                try:
+                    os.ftruncate(self._fd, self._size)
+                    os.lseek(self._fd, self._size, os.SEEK_SET)
+                except OSError:
+                    pass
+                with self._lock:
+                    for entry, _ in entries:
+                        self._settle(entry["seq"])
+                for _, future in entries:
+                    future.set_exception(e)
+                return
+            self._size += len(data)
+            with self._lock:
+                self.batches += 1
+                if entries:
+                    # Queue order is seq order, so everything up to here is on disk
+                    self._durable_seq = entries[-1][0]["seq"]
+        for entry, future in entries:
+            future.set_result(entry)
+        if entries:
+            self.ready.set()
+
+    @staticmethod
+    def _write_all(fd: int, data: bytes):
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+
+    def _sync_dir(self):
+        fd = os.open(os.path.dirname(os.path.abspath(self.path)), os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def claim_journal(directory: str, **kwargs) -> WriteJournal:
+    """Open the first journal-<n>.log in `directory` that no other process holds.
+
+    Every worker gets a file of its own; a restarted worker picks up the one
+    its predecessor left behind, pending entries included.
+    """
+    os.makedirs(directory, exist_ok=True)
+    slot = 0
+    while True:
+        try:
+            return WriteJournal(os.path.join(directory, f"journal-{slot}.log"), **kwargs)
+        except BlockingIOError:
+            slot += 1
+
+
+class JournalReplayer:
+    """Background thread applying a WriteJournal's entries to the datastore, in order.
+
+    `apply(entries)` runs up to `batch_size` entries in one call and returns
+    one row per entry; `on_applied(entry, row)` runs the write's usual side
+    effects afterwards. A failing call is retried with capped exponential
+    backoff and jitter, so a datastore outage only delays the queue.
+    Errors about the data itself (a comment on a deleted post) cannot
+    succeed on retry: the batch is retried entry by entry and the offending
+    entry is marked failed.
+    """
+
+    def __init__(self, journal: WriteJournal, apply, on_applied=None, batch_size: int = REPLAY_BATCH_SIZE,
+                 base_delay: float = 0.1, max_delay: float = 30.0):
+        self.journal = journal
+        self.apply = apply
+        self.on_applied = on_applied
+        self.batch_size = batch_size
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retries = 0
+        self._delay = 0.0
+        self._stop = threading.Event()
+        self._idle = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="journal-replayer", daemon=True)
+            self._thread.start()
+
+    def stop(self, drain_timeout: float = 0.0):
+        """Stop replaying, after up to `drain_timeout` seconds spent emptying the journal.
+
+        Whatever is left stays in the file and is replayed on the next start.
+        """
+        if drain_timeout and self._thread is not None:
+            self._idle.wait(drain_timeout)
+        self._stop.set()
+        self.journal.ready.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def stats(self) -> dict:
+        return {"retries": self.retries, "backoff_seconds": self._delay}
+
+    def replay(self, batch: list) -> int:
+        """Apply `batch` (from next_batch) and settle its entries; raises on a transient error"""
+        head = batch[0]
+        if head["args"].get("post_id", 0) < 0:
+            # The post it refers to was never created
+            self.journal.mark_failed(head["seq"], "Post was not created")
+            return 0
+        try:
+            rows = self.apply(batch)
+        except Exception as e:
+            if not is_permanent_error(e):
+                raise
+            if len(batch) > 1:
+                return sum(self.replay([entry]) for entry in batch)
+            logger.error("Dropping journal entry %s (%s): %s", head["seq"], head["op"], e)
+            self.journal.mark_failed(head["seq"], str(e))
+            return 0
+        for entry, row in zip(batch, rows):
+            self.journal.mark_applied(entry["seq"], row.get("id") if entry["op"] == "create_post" else None)
+            if self.on_applied is not None:
+                try:
+                    self.on_applied(entry, row)
+                except Exception as e:
+                    logger.error("Error after applying journal entry %s: %s", entry["seq"], e)
+        return len(batch)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.journal.ready.clear()
+            batch = self.journal.next_batch(self.batch_size)
+            if not batch:
+                self._idle.set()
+                self.journal.ready.wait(1.0)
+                continue
+            self._idle.clear()
+            try:
+                self.replay(batch)
+                self.journal.maybe_compact()
+                self._delay = 0.0
+            except Exception as e:
+                self.retries += 1
+                self._delay = min(self.max_delay, max(self.base_delay, self._delay * 2))
+                logger.warning("Journal replay failed, retrying in %.1fs: %s", self._delay, e)
+                self._stop.wait(self._delay * random.uniform(0.5, 1.0))
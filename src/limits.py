@@ -0,0 +1,141 @@
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+class Overloaded(Exception):
+    """The datastore is at its concurrency cap; the caller should answer 503 rather than wait"""
+
+    def __init__(self, retry_after: float = 1.0):
+        super().__init__("Datastore is at capacity")
+        self.retry_after = retry_after
+
+
+class ConcurrencyLimit:
+    """Cap on datastore calls in flight across request threads and the event loop.
+
+    acquire() never waits: past the cap it raises Overloaded, so a burst is
+    shed in microseconds instead of piling up behind the connection pool
+    and slowing every other request down.
+    """
+
+    def __init__(self, max_inflight: int, retry_after: float = 1.0):
+        self.max_inflight = max_inflight
+        self.retry_after = retry_after
+        self.inflight = 0
+        self.peak = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            if self.inflight >= self.max_inflight:
+                self.rejected += 1
+                raise Overloaded(self.retry_after)
+            self.inflight += 1
+            self.peak = max(self.peak, self.inflight)
+
+    def release(self):
+        with self._lock:
+            self.inflight -= 1
+
+    @contextmanager
+    def slot(self):
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> dict:
+        return {
+            "inflight": self.inflight,
+            "max_inflight": self.max_inflight,
+            "peak": self.peak,
+            "rejected": self.rejected,
+        }
+
+
+# Set by the API for the duration of each request. Datastore calls made outside
+# a request (like flushes, reconciles, bootstraps) see None and are never shed.
+REQUEST_LIMIT: ContextVar = ContextVar("request_datastore_limit", default=None)
+
+
+def parse_limits(spec: str, defaults: dict) -> dict:
+    """Apply overrides like "POST /posts=1:10,default=20:40,GET /metrics=off" to `defaults`.
+
+    Values are rate (tokens per second) and burst; "off" exempts a route.
+    """
+    limits = dict(defaults)
+    for item in filter(None, (part.strip() for part in (spec or "").split(","))):
+        route, _, value = item.rpartition("=")
+        if value == "off":
+            limits[route] = None
+        else:
+            rate, _, burst = value.partition(":")
+            limits[route] = (float(rate), float(burst or rate))
+    return limits
+
+
+class RateLimiter:
+    """Token buckets keyed by (client, route).
+
+    `limits` maps "METHOD /route/{template}" to (rate per second, burst), or
+    None for an unlimited route; "default" covers the rest. A bucket left
+    alone long enough to refill completely is the same as no bucket, so idle
+    ones are evicted from the front of an LRU on every check: memory stays
+    proportional to the clients seen in the last few seconds.
+    """
+
+    def __init__(self, limits: dict):
+        self.limits = limits
+        self.default = limits.get("default")
+        refills = [burst / rate for rate, burst in filter(None, limits.values())]
+        self._idle = max(refills, default=0.0)
+        self._buckets = OrderedDict()   # (client, route) -> [tokens, updated_at]
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.rejected = 0
+        self.evictions = 0
+
+    def check(self, client: str, route: str) -> float:
+        """Take a token for `client` on `route`: 0 if allowed, else seconds until the next one"""
+        limit = self.limits.get(route, self.default)
+        if limit is None:
+            return 0.0
+        rate, burst = limit
+        key = (client, route)
+        now = time.monotonic()
+        with self._lock:
+            self._evict(now)
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [burst, now]
+            else:
+                bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+                self._buckets.move_to_end(key)
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                self.allowed += 1
+                return 0.0
+            self.rejected += 1
+            return (1 - bucket[0]) / rate
+
+    def stats(self) -> dict:
+        return {
+            "buckets": len(self._buckets),
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+            "evictions": self.evictions,
+        }
+
+    def _evict(self, now: float):
+        while self._buckets:
+            key, (_, updated_at) = next(iter(self._buckets.items()))
+            if now - updated_at < self._idle:
+                return
+            del self._buckets[key]
+            self.evictions += 1
@@ -1,8 +1,30 @@
-from src.db import DatabaseManager 
+import logging
+from src.db import DatabaseManager, FEED_PAGE_SIZE, MAX_BATCH_SIZE, feed_unavailable
+from src.cache import FeedCache, ProfileCache
+from src.events import EventHub
+from src.search import SearchIndex
+from src.timeline import TimelineEngine
+from src.trending import TrendingRanker
+from src.profiles import ProfileLoader
+from src.limits import Overloaded
+from src.logs import log_event
+
+logger = logging.getLogger(__name__)
+
 class SocialMediaPlatform:
-    def __init__(self):
-        self.db = DatabaseManager()
+    def __init__(self, db: DatabaseManager = None, feed_cache: FeedCache = None, events: EventHub = None,
+                 search_index: SearchIndex = None, timelines: TimelineEngine = None,
+                 trending: TrendingRanker = None, profiles: ProfileCache = None):
+        self.db = db or DatabaseManager()
+        self.feed_cache = feed_cache or FeedCache()
+        self.events = events or EventHub()
+        self.search_index = search_index or SearchIndex()
+        self.timelines = timelines or TimelineEngine(self.db)
+        self.trending = trending or TrendingRanker()
+        self.profiles = profiles or ProfileCache()
         self.current_user = None
+        if self.db.image_ingestor is not None and self.db.image_ingestor.on_marked is None:
+            self.db.image_ingestor.on_marked = self.image_marked
 
     def signup(self, username: str, password: str, role: str = "user"):
         return self.db.signup(username, password, role)
@@ -13,28 +35,91 @@ class SocialMediaPlatform:
             self.current_user = self.db.current_user
         return result
 
+    def authenticate(self, username: str, password: str):
+        """Verify credentials without logging anyone in on this instance (used by the API)"""
+        return self.db.authenticate(username, password)
+
+    async def asignup(self, username: str, password: str, role: str = "user"):
+        return await self.db.asignup(username, password, role)
+
+    async def aauthenticate(self, username: str, password: str):
+        return await self.db.aauthenticate(username, password)
+
+    def bootstrap_usernames(self) -> int:
+        """Fill the username filter from profiles; signups run the existence query until it is ready"""
+        return self.db.usernames.bootstrap(self.db.export_usernames())
+
     def get_current_user(self):
         return self.current_user
 
-    def create_post(self, content: str, image_url: str = ""):
-        if not self.current_user:
+    # Mutations act for `user` when given (API requests) and fall back to the
+    # instance's logged-in user otherwise (scripts)
+    def create_post(self, content: str, image_url: str = "", user: dict = None):
+        user = user or self.current_user
+        if not user:
+            return {"error": "User not logged in"}
+        result = self.db.create_post(content, image_url, user=user)
+        return self._write_queued(result) if result.get("pending") else self._post_created(result)
+
+    def like_post(self, post_id: int, user: dict = None):
+        user = user or self.current_user
+        if not user:
             return {"error": "User not logged in"}
-        return self.db.create_post(content, image_url)
+        return self._like_changed(post_id, self.db.like_post(post_id, user=user), True)
 
-    def like_post(self, post_id: int):
-        if not self.current_user:
+    def unlike_post(self, post_id: int, user: dict = None):
+        user = user or self.current_user
+        if not user:
             return {"error": "User not logged in"}
-        return self.db.like_post(post_id)
+        return self._like_changed(post_id, self.db.unlike_post(post_id, user=user), False)
 
-    def unlike_post(self, post_id: int):
-        if not self.current_user:
+    def comment_post(self, post_id: int, content: str, user: dict = None):
+        user = user or self.current_user
+        if not user:
             return {"error": "User not logged in"}
-        return self.db.unlike_post(post_id)
+        return self._comment_added(post_id, self.db.comment_post(post_id, content, user=user), user)
 
-    def comment_post(self, post_id: int, content: str):
-        if not self.current_user:
+    # Batch mutations; the cache and live events see each item like a single call
+    def create_posts(self, items: list, user: dict = None):
+        user = user or self.current_user
+        if not user:
             return {"error": "User not logged in"}
-        return self.db.comment_post(post_id, content)
+        result = self.db.create_posts(items, user=user)
+        for item in result.get("results", []):
+            if item.get("pending"):
+                self._write_queued(item)
+            else:
+                self._post_created(item)
+        return result
+
+    def like_posts(self, post_ids: list, user: dict = None):
+        return self._likes_changed(self._set_likes(post_ids, True, user), True)
+
+    def unlike_posts(self, post_ids: list, user: dict = None):
+        return self._likes_changed(self._set_likes(post_ids, False, user), False)
+
+    def _set_likes(self, post_ids: list, liked: bool, user: dict):
+        user = user or self.current_user
+        if not user:
+            return {"error": "User not logged in"}
+        return self.db.set_likes(post_ids, liked, user=user)
+
+    def comment_posts(self, items: list, user: dict = None):
+        user = user or self.current_user
+        if not user:
+            return {"error": "User not logged in"}
+        result = self.db.comment_posts(items, user=user)
+        for item in result.get("results", []):
+            if "comment" in item:
+                self._comment_added(item["post_id"], [item["comment"]], user)
+        return result
+
+    def follow(self, followee_id: int, user: dict = None):
+        return self._follow_changed(followee_id, self.db.follow(followee_id, user=user or self.current_user), user)
+
+    def unfollow(self, followee_id: int, user: dict = None):
+        return self._follow_changed(followee_id, self.db.unfollow(followee_id, user=user or self.current_user), user)
+
     # def get_posts(self):
     #     try:
     #         response = sb.table("posts").select("*").execute()
@@ -43,14 +128,243 @@ class SocialMediaPlatform:
     #     except Exception as e:
     #         print("Error fetching posts:", e)
     #         return []
-    def get_posts(self):
+    def get_posts(self, limit: int = FEED_PAGE_SIZE, before: str = None, after: str = None):
+        key = FeedCache.key(limit, before, after)
+        page = self.feed_cache.get(key)
+        if page is not None:
+            return page
         try:
-            posts = self.db.get_posts()  # Use your DatabaseManager method
-            print("📢 Fetched posts:", posts)  # DEBUG
-            return posts
+            page = self.db.get_posts(limit=limit, before=before, after=after)
+            if not page.get("partial"):
+                self._with_authors(page.get("posts", []))
+            return self._feed_fetched(key, page)
+        except Overloaded:
+            raise
         except Exception as e:
-            print("❌ Error fetching posts:", e)
-            return []
+            logger.error("Error fetching posts: %s", e)
+            return feed_unavailable()
+
+    def get_post(self, post_id: int):
+        """Return one post with its comment preview, or None if it does not exist"""
+        posts = self._with_authors(self.db.get_post_by_id(post_id))
+        return posts[0] if posts else None
+
+    def get_comments(self, post_id: int, limit: int = 20, before: str = None):
+        page = self.db.get_comments(post_id, limit=limit, before=before)
+        self._with_authors(comments=page.get("comments", []))
+        return page
+
+    def get_users(self, user_ids: list):
+        """Public profiles for `user_ids`, in order, from the profile cache and at most one query"""
+        if not 0 < len(user_ids) <= MAX_BATCH_SIZE:
+            return {"error": f"Batch must contain 1 to {MAX_BATCH_SIZE} items"}
+        profiles = ProfileLoader(self.profiles).collect(user_ids=user_ids).load(self.db.get_profiles_by_ids)
+        return {"users": [profiles[i] for i in dict.fromkeys(user_ids) if i in profiles]}
+
+    def export_posts(self, since: str = None):
+        return self.db.export_posts(since=since)
+
+    def timeline(self, limit: int = FEED_PAGE_SIZE, before: int = None, user: dict = None):
+        """Home timeline: posts by the accounts `user` follows and their own, newest first"""
+        user = user or self.current_user
+        if not user:
+            return {"error": "User not logged in"}
+        ids = self.timelines.read(user["id"], limit, before)
+        posts = self._with_authors(self.db.get_posts_by_ids(ids))
+        return {"posts": posts, "next_before": ids[-1] if len(ids) == limit else None}
+
+    def bootstrap_search(self) -> int:
+        """Fill the search index from the posts table; run once at startup, off the request path"""
+        return self.search_index.bootstrap(self.db.export_posts())
+
+    def search(self, query: str, limit: int = 20):
+        hits = self.search_index.search(query, limit)
+        posts = self.db.get_posts_by_ids([post_id for post_id, _ in hits])
+        return self._scored_posts(hits, self._with_authors(posts))
+
+    def journal_applied(self, entry: dict, row: dict):
+        """Run a replayed journal entry's usual side effects: caches, search, timelines, trending, events"""
+        result = self.db.journal_result(entry, row)
+        if entry["op"] == "create_post":
+            self._post_created(result)
+        elif entry["op"] == "comment":
+            self._comment_added(entry["args"]["post_id"], result, entry["user"])
+        else:
+            self._like_changed(entry["args"]["post_id"], result, entry["op"] == "like")
+
+    def bootstrap_trending(self) -> int:
+        """Rebuild trending scores from recent likes and comments; run once at startup, off the request path"""
+        since = self.trending.cutoff()
+        return self.trending.rebuild(self.db.export_activity("likes", since),
+                                     self.db.export_activity("comments", since))
+
+    def trending_posts(self, limit: int = 20):
+        hits = self.trending.top(limit)
+        posts = self.db.get_posts_by_ids([post_id for post_id, _ in hits])
+        return self._scored_posts(hits, self._with_authors(posts))
+
+    def feed_etag(self, *request) -> str:
+        """ETag for a feed or post read; changes whenever a post, like or comment is written"""
+        return self.feed_cache.etag(*request)
+
+    # Async counterparts, used by the API when self.db is an AsyncDatabaseManager
+    async def aget_posts(self, limit: int = FEED_PAGE_SIZE, before: str = None, after: str = None):
+        key = FeedCache.key(limit, before, after)
+        page = self.feed_cache.get(key)
+        if page is not None:
+            return page
+        try:
+            page = await self.db.aget_posts(limit=limit, before=before, after=after)
+            if not page.get("partial"):
+                await self._awith_authors(page.get("posts", []))
+            return self._feed_fetched(key, page)
+        except Overloaded:
+            raise
+        except Exception as e:
+            logger.error("Error fetching posts: %s", e)
+            return feed_unavailable()
+
+    def aexport_posts(self, since: str = None):
+        """Async iterator over every post created after `since`, oldest first; bypasses the feed cache"""
+        return self.db.aexport_posts(since=since)
+
+    async def asearch(self, query: str, limit: int = 20):
+        hits = self.search_index.search(query, limit)
+        posts = await self.db.aget_posts_by_ids([post_id for post_id, _ in hits])
+        return self._scored_posts(hits, await self._awith_authors(posts))
+
+    async def atrending_posts(self, limit: int = 20):
+        hits = self.trending.top(limit)
+        posts = await self.db.aget_posts_by_ids([post_id for post_id, _ in hits])
+        return self._scored_posts(hits, await self._awith_authors(posts))
+
+    async def aget_post(self, post_id: int):
+        posts = await self._awith_authors(await self.db.aget_post_by_id(post_id))
+        return posts[0] if posts else None
+
+    async def aget_comments(self, post_id: int, limit: int = 20, before: str = None):
+        page = await self.db.aget_comments(post_id, limit=limit, before=before)
+        await self._awith_authors(comments=page.get("comments", []))
+        return page
+
+    async def aget_users(self, user_ids: list):
+        if not 0 < len(user_ids) <= MAX_BATCH_SIZE:
+            return {"error": f"Batch must contain 1 to {MAX_BATCH_SIZE} items"}
+        profiles = await ProfileLoader(self.profiles).collect(user_ids=user_ids).aload(self.db.aget_profiles_by_ids)
+        return {"users": [profiles[i] for i in dict.fromkeys(user_ids) if i in profiles]}
+
+    async def alike_post(self, post_id: int, user: dict = None):
+        user = user or self.current_user
+        if not user:
+            return {"error": "User not logged in"}
+        return self._like_changed(post_id, await self.db.alike_post(post_id, user=user), True)
+
+    async def aunlike_post(self, post_id: int, user: dict = None):
+        user = user or self.current_user
+        if not user:
+            return {"error": "User not logged in"}
+        return self._like_changed(post_id, await self.db.aunlike_post(post_id, user=user), False)
+
+    async def acomment_post(self, post_id: int, content: str, user: dict = None):
+        user = user or self.current_user
+        if not user:
+            return {"error": "User not logged in"}
+        return self._comment_added(post_id, await self.db.acomment_post(post_id, content, user=user), user)
+
+    # Author names for posts and comments: one request-scoped loader, at most one profile query
+    def _with_authors(self, posts=(), comments=()):
+        loader = ProfileLoader(self.profiles).collect(posts, comments)
+        loader.load(self.db.get_profiles_by_ids)
+        loader.attach(posts, comments)
+        return posts
+
+    async def _awith_authors(self, posts=(), comments=()):
+        loader = ProfileLoader(self.profiles).collect(posts, comments)
+        await loader.aload(self.db.aget_profiles_by_ids)
+        loader.attach(posts, comments)
+        return posts
+
+    # Cache bookkeeping and live events shared by the sync and async paths
+    def _feed_fetched(self, key, page: dict) -> dict:
+        log_event(logger, "feed_fetched", posts=len(page.get("posts", [])), cached=False)
+        # A partial page is only this worker's pending posts, standing in while the datastore is down
+        if "error" not in page and not page.get("partial"):
+            self.feed_cache.put(key, page)
+        return page
+
+    def image_marked(self, post_id: int, fields: dict):
+        """An image finished ingesting: patch the cached pages showing the post and move the ETags on"""
+        self.feed_cache.patch_post(post_id, **fields)
+        self.feed_cache.bump_version()
+        self.events.publish("image_changed", post_id=post_id, **fields)
+
+    def _post_created(self, result: dict) -> dict:
+        if "error" not in result:
+            self.feed_cache.invalidate_head()
+            self.feed_cache.bump_version()
+            post = result.get("post") or {}
+            if "id" in post:
+                self.search_index.add(post["id"], post.get("content"))
+                self.timelines.on_post(post["user_id"], post["id"])
+            self.events.publish("post_created", post={
+                k: post.get(k) for k in ("id", "user_id", "content", "image_url", "image_status", "created_at")
+            })
+        return result
+
+    # A journaled write has only been acknowledged: reads overlay it, so cached pages and
+    # ETags go stale now; the usual side effects run once it is applied (journal_applied)
+    def _write_queued(self, result, post_id: int = None):
+        if post_id is None:
+            self.feed_cache.invalidate_head()
+        else:
+            self.feed_cache.invalidate_post(post_id)
+        self.feed_cache.bump_version()
+        return result
+
+    def _like_changed(self, post_id: int, result: dict, liked: bool) -> dict:
+        if result.get("pending"):
+            return self._write_queued(result, post_id)
+        if "like_count" in result:
+            self.feed_cache.patch_post(post_id, like_count=result["like_count"])
+        if result.get("success"):
+            if liked:
+                self.trending.like(post_id)
+            else:
+                self.trending.unlike(post_id)
+            self.feed_cache.bump_version()
+            self.events.publish("like_count_changed", post_id=post_id, like_count=result["like_count"])
+        return result
+
+    @staticmethod
+    def _scored_posts(hits: list, posts: list) -> dict:
+        scores = dict(hits)
+        return {"posts": [dict(p, score=scores[p["id"]]) for p in posts]}
+
+    def _likes_changed(self, result: dict, liked: bool) -> dict:
+        for item in result.get("results", []):
+            if item.get("pending"):
+                self._write_queued(item, item["post_id"])
+            elif "like_count" in item:
+                self._like_changed(item["post_id"], dict(item, success=item["changed"]), liked)
+        return result
+
+    def _follow_changed(self, followee_id: int, result: dict, user: dict) -> dict:
+        if result.get("changed"):
+            self.timelines.on_follow_changed((user or self.current_user)["id"], followee_id)
+        return result
+
+    def _comment_added(self, post_id: int, result, user: dict):
+        if "error" not in result:
+            for comment in result:
+                comment["author"] = {"username": user["username"]}
+            if any(comment.get("pending") for comment in result):
+                return self._write_queued(result, post_id)
+            for _ in result:
+                self.trending.comment(post_id)
+            self.feed_cache.invalidate_post(post_id)
+            self.feed_cache.bump_version()
+            self.events.publish("comment_added", post_id=post_id, comments=result)
+        return result
 
 #Testing
 # s = SocialMediaPlatform()
@@ -0,0 +1,21 @@
+import json
+import logging
+import os
+import random
+
+# Fraction of debug events that are actually emitted
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.01"))
+
+
+def log_event(logger: logging.Logger, event: str, rate: float = None, **fields):
+    """Emit a sampled, JSON-formatted debug event.
+
+    Returns before building anything when DEBUG is off for the logger, so a
+    disabled call costs one level check. Pass counts and ids as fields,
+    never whole payloads.
+    """
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    if random.random() >= (LOG_SAMPLE_RATE if rate is None else rate):
+        return
+    logger.debug(json.dumps({"event": event, **fields}, default=str))
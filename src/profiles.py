@@ -0,0 +1,68 @@
+from src.cache import ProfileCache
+
+
+class ProfileLoader:
+    """Request-scoped author loader: collect every user id a response needs, then resolve them at once.
+
+    `collect` records the authors of posts (when the feed embed did not
+    already supply one), of their preview comments, of loose comments and
+    any explicit user ids.
+    `load` answers what it can from the shared ProfileCache and fetches the
+    rest with a single `in.(...)` query, so a response costs at most one
+    profile query whatever its size. `attach` then sets `author` on every
+    collected row.
+    """
+
+    def __init__(self, cache: ProfileCache):
+        self.cache = cache
+        self._wanted = set()
+        self._profiles = {}
+        self.queries = 0
+
+    def collect(self, posts=(), comments=(), user_ids=()):
+        self._wanted.update(user_ids)
+        for post in posts:
+            if not post.get("author"):
+                self._wanted.add(post.get("user_id"))
+            self._wanted.update(c.get("user_id") for c in post.get("comments") or ())
+        self._wanted.update(c.get("user_id") for c in comments)
+        self._wanted.discard(None)
+        return self
+
+    def load(self, fetch) -> dict:
+        """Resolve collected ids with `fetch(ids) -> profile rows`, called at most once"""
+        missing = self._lookup()
+        if missing:
+            self._fetched(fetch(missing))
+        return self._profiles
+
+    async def aload(self, fetch) -> dict:
+        """`load` with an async `fetch`"""
+        missing = self._lookup()
+        if missing:
+            self._fetched(await fetch(missing))
+        return self._profiles
+
+    def attach(self, posts=(), comments=()):
+        for post in posts:
+            if not post.get("author"):
+                self._set_author(post)
+            for comment in post.get("comments") or ():
+                self._set_author(comment)
+        for comment in comments:
+            self._set_author(comment)
+
+    def _lookup(self) -> list:
+        found, missing = self.cache.get_many(sorted(self._wanted - self._profiles.keys()))
+        self._profiles.update(found)
+        return missing
+
+    def _fetched(self, rows: list):
+        self.queries += 1
+        self.cache.put_many(rows)
+        self._profiles.update((row["id"], row) for row in rows)
+
+    def _set_author(self, row: dict):
+        profile = self._profiles.get(row.get("user_id"))
+        if profile is not None:
+            row["author"] = {"username": profile["username"]}
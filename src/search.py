@@ -0,0 +1,188 @@
+import bisect
+import heapq
+import logging
+import math
+import re
+import threading
+from array import array
+from itertools import chain
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r"[#@]?\w+")
+MAX_TOKEN_LENGTH = 64
+# Vocabulary terms a trailing prefix may expand to, and how many candidates are weighed to pick them
+MAX_PREFIX_TERMS = 16
+MAX_PREFIX_SCAN = 10_000
+# Matches scored per requested result, and postings of the rarest term scanned at most per query
+CANDIDATE_FACTOR = 8
+MAX_SCAN = 200_000
+
+
+def tokenize(text: str) -> set:
+    """Lowercased words, plus `#tag` / `@name` terms for hashtags and mentions"""
+    terms = set()
+    for token in TOKEN_RE.findall((text or "").lower()):
+        if len(token) > MAX_TOKEN_LENGTH:
+            continue
+        terms.add(token)
+        if token[0] in "#@" and len(token) > 1:
+            terms.add(token[1:])
+    return terms
+
+
+def _contains(postings: array, post_id: int) -> bool:
+    i = bisect.bisect_left(postings, post_id)
+    return i < len(postings) and postings[i] == post_id
+
+
+class SearchIndex:
+    """In-memory inverted index over post content.
+
+    Each term maps to a sorted array of post ids (8 bytes per posting).
+    A query matches posts containing every term, with the last term also
+    matching as a prefix (search-as-you-type). Postings are intersected in
+    id windows from the newest post backwards, so the work depends on the
+    number of results wanted rather than the number of posts. The first
+    `limit * CANDIDATE_FACTOR` matches are ranked by idf of the matched terms
+    (an exact last term beats a prefix match), then by recency.
+    """
+
+    def __init__(self):
+        self._postings = {}     # term -> array of post ids, ascending
+        self._vocab = []        # sorted terms, for prefix expansion
+        self._unsorted = None   # terms first seen during bootstrap, sorted into _vocab at the end
+        self._lock = threading.Lock()
+        self.posts = 0
+        self.postings = 0
+        self.ready = False
+
+    def add(self, post_id: int, content: str):
+        with self._lock:
+            added = 0
+            for term in tokenize(content):
+                postings = self._postings.get(term)
+                if postings is None:
+                    self._postings[term] = array("q", [post_id])
+                    if self._unsorted is not None:
+                        self._unsorted.append(term)
+                    else:
+                        bisect.insort(self._vocab, term)
+                    added += 1
+                elif not postings or postings[-1] < post_id:
+                    postings.append(post_id)
+                    added += 1
+                elif not _contains(postings, post_id):
+                    # Out of order (bootstrap racing a live insert)
+                    postings.insert(bisect.bisect_left(postings, post_id), post_id)
+                    added += 1
+            if added:
+                self.posts += 1
+                self.postings += added
+
+    def bootstrap(self, rows):
+        """Index (id, content) rows from a full table scan, e.g. DatabaseManager.export_posts"""
+        count = 0
+        with self._lock:
+            self._unsorted = []
+        try:
+            for row in rows:
+                self.add(row["id"], row.get("content"))
+                count += 1
+        finally:
+            with self._lock:
+                self._vocab = sorted(self._vocab + self._unsorted)
+                self._unsorted = None
+        self.ready = True
+        logger.info("Search index bootstrapped with %d posts, %d terms", count, len(self._postings))
+        return count
+
+    def search(self, query: str, limit: int = 20) -> list:
+        """Return up to `limit` (post_id, score) pairs, best first"""
+        tokens = [t for t in TOKEN_RE.findall((query or "").lower()) if len(t) <= MAX_TOKEN_LENGTH]
+        if not tokens:
+            return []
+        *exact, last = tokens
+        exact_lists = []
+        for term in dict.fromkeys(exact):
+            postings = self._postings.get(term)
+            if not postings:
+                return []
+            exact_lists.append((term, postings))
+        prefix_lists = [(term, self._postings[term]) for term in self._expand(last, exact)]
+        if not prefix_lists:
+            return []
+
+        total = max(self.posts, 1)
+        base = sum(math.log(1 + total / len(p)) for _, p in exact_lists)
+        prefix_weights = [(p, (1.0 if term == last else 0.5) * math.log(1 + total / len(p)))
+                          for term, p in prefix_lists]
+        groups = [[p] for _, p in exact_lists] + [[p for _, p in prefix_lists]]
+
+        wanted = limit * CANDIDATE_FACTOR
+        scored = []
+        for lo, hi, ids in self._matches(groups, wanted):
+            best = {}
+            for postings, weight in prefix_weights:
+                start, stop = bisect.bisect_left(postings, lo), bisect.bisect_left(postings, hi)
+                for post_id in ids.intersection(postings[start:stop]):
+                    if weight > best.get(post_id, 0.0):
+                        best[post_id] = weight
+            scored.extend((base + score, post_id) for post_id, score in best.items())
+            if len(scored) >= wanted:
+                break
+        return [(post_id, round(score, 4)) for score, post_id in heapq.nlargest(limit, scored)]
+
+    @staticmethod
+    def _matches(groups: list, wanted: int):
+        """Yield (lo, hi, ids) for id windows [lo, hi), newest first, where ids are in every group.
+
+        A group matches if any of its postings arrays has the id. Each window
+        is intersected with C-level set operations and is four times wider
+        than the last, so a query stops as soon as the newest windows hold
+        enough matches and gives up after MAX_SCAN postings of the rarest group.
+        """
+        groups = sorted(groups, key=lambda g: sum(len(p) for p in g))
+        driver = groups[0]
+        size = sum(len(p) for p in driver)
+        oldest, newest = min(p[0] for p in driver), max(p[-1] for p in driver)
+        # Start with a window expected to hold about `wanted` of the rarest group's postings
+        span = max(int(wanted * (newest - oldest + 1) / size), 1)
+        hi, scanned = newest + 1, 0
+        while hi > oldest and scanned < MAX_SCAN:
+            lo = max(oldest, hi - span)
+            slices = [p[bisect.bisect_left(p, lo):bisect.bisect_left(p, hi)] for p in driver]
+            scanned += sum(len(sl) for sl in slices)
+            ids = set(chain.from_iterable(slices))
+            for group in groups[1:]:
+                if not ids:
+                    break
+                ids.intersection_update(chain.from_iterable(
+                    p[bisect.bisect_left(p, lo):bisect.bisect_left(p, hi)] for p in group))
+            if ids:
+                yield lo, hi, ids
+            hi, span = lo, span * 4
+
+    def _expand(self, prefix: str, query_terms=()) -> list:
+        """Terms the trailing `prefix` stands for, at most MAX_PREFIX_TERMS beyond the query's own.
+
+        The term itself and the query's other terms starting with it always
+        count, so "w299 w2" still finds a post with just w299; the rest are
+        the terms with the most postings among the first MAX_PREFIX_SCAN
+        starting with the prefix, not the first ones alphabetically.
+        """
+        terms = [t for t in dict.fromkeys((prefix, *query_terms)) if t.startswith(prefix) and t in self._postings]
+        lo = bisect.bisect_left(self._vocab, prefix)
+        hi = bisect.bisect_left(self._vocab, prefix + "\U0010ffff", lo, min(len(self._vocab), lo + MAX_PREFIX_SCAN))
+        taken = set(terms)
+        candidates = [t for t in self._vocab[lo:hi] if t not in taken]
+        terms += heapq.nlargest(MAX_PREFIX_TERMS, candidates, key=lambda t: len(self._postings[t]))
+        return terms
+
+    def stats(self) -> dict:
+        return {
+            "posts": self.posts,
+            "terms": len(self._postings),
+            "postings": self.postings,
+            "ready": self.ready,
+        }
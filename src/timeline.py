@@ -0,0 +1,164 @@
+import heapq
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+
+logger = logging.getLogger(__name__)
+
+TIMELINE_LENGTH = 800
+# Accounts with more followers than this are merged in at read time instead of fanned out
+FANOUT_LIMIT = 10_000
+# Per map (timelines, follower lists, big authors' posts); past it the soonest to expire go first
+MAX_ENTRIES = 10_000
+
+
+class _Timeline:
+    __slots__ = ("ids", "big_followees")
+
+    def __init__(self, ids, big_followees: tuple, length: int):
+        self.ids = deque(ids, maxlen=length)     # post ids, newest first
+        self.big_followees = big_followees
+
+
+class TimelineEngine:
+    """Home timelines: fan-out on write for most authors, fan-out on read for big ones.
+
+    Each active reader has a bounded buffer of post ids. create_post pushes
+    the new id into the buffers of the author's followers, unless the
+    author has more than `fanout_limit` followers (profiles.follower_count,
+    which the read side goes by too); those authors' recent
+    ids are kept once, shared by all readers, and merged in when a
+    timeline is read. A buffer is rebuilt from the database (one query for
+    the follow list, one for the followees' newest posts) when it is
+    missing or older than `ttl`, which also picks up posts written by other
+    workers. Reading a warm timeline touches no database at all; the API
+    then hydrates the ids with one batched query.
+
+    Every entry lives `ttl` from when it was built, so each map is kept in
+    build order: expired entries are swept from the front whenever one is
+    stored, and past `max_entries` the oldest go too.
+    """
+
+    def __init__(self, db, length: int = TIMELINE_LENGTH, fanout_limit: int = FANOUT_LIMIT, ttl: float = 60.0,
+                 max_entries: int = MAX_ENTRIES):
+        self.db = db
+        self.length = length
+        self.fanout_limit = fanout_limit
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._timelines = OrderedDict()     # user_id -> (expires_at, _Timeline)
+        self._followers = OrderedDict()     # author_id -> (expires_at, follower ids, or None for big accounts)
+        self._big_posts = OrderedDict()     # big author_id -> (expires_at, deque of post ids, newest first)
+        self._lock = threading.Lock()
+        self.fanout_pushes = 0
+        self.rebuilds = 0
+        self.evictions = 0
+
+    def read(self, user_id: int, limit: int, before: int = None) -> list:
+        """Up to `limit` post ids for `user_id`'s home timeline, newest first, older than `before`"""
+        timeline = self._timeline(user_id)
+        sources = [timeline.ids] + [self._big_author_posts(a) for a in timeline.big_followees]
+        merged = heapq.merge(*(list(ids) for ids in sources), reverse=True)
+        result = []
+        for post_id in merged:
+            if before is not None and post_id >= before:
+                continue
+            if result and result[-1] == post_id:
+                continue
+            result.append(post_id)
+            if len(result) >= limit:
+                break
+        return result
+
+    def on_post(self, author_id: int, post_id: int):
+        """Push a new post to the author's followers (and the author's own timeline).
+
+        Best effort: the post is already stored, so a failed follower lookup
+        is logged and the followers get it on their next rebuild.
+        """
+        try:
+            followers = self._followers_of(author_id)
+        except Exception as e:
+            logger.warning("Fan-out of post %s skipped: %s", post_id, e)
+            followers = ()
+        with self._lock:
+            if followers is None:
+                cached = self._big_posts.get(author_id)
+                if cached is not None:
+                    cached[1].appendleft(post_id)
+                recipients = (author_id,)
+            else:
+                recipients = followers + (author_id,)
+            for user_id in recipients:
+                # Only readers with a live buffer; everyone else gets it on their next rebuild
+                cached = self._timelines.get(user_id)
+                if cached is not None:
+                    cached[1].ids.appendleft(post_id)
+                    self.fanout_pushes += 1
+
+    def on_follow_changed(self, user_id: int, followee_id: int):
+        """Rebuild the follower's timeline and reload the followee's follower list on next use"""
+        with self._lock:
+            self._timelines.pop(user_id, None)
+            self._followers.pop(followee_id, None)
+
+    def stats(self) -> dict:
+        return {
+            "timelines": len(self._timelines),
+            "big_authors": len(self._big_posts),
+            "fanout_pushes": self.fanout_pushes,
+            "rebuilds": self.rebuilds,
+            "evictions": self.evictions,
+        }
+
+    def _store(self, entries: OrderedDict, key, value, expires_at: float, now: float):
+        """Add `value` as the newest entry, then sweep (caller holds the lock)"""
+        entries.pop(key, None)
+        entries[key] = (expires_at, value)
+        while entries:
+            oldest, (oldest_expires_at, _) = next(iter(entries.items()))
+            if oldest_expires_at > now and len(entries) <= self.max_entries:
+                return
+            del entries[oldest]
+            self.evictions += 1
+
+    def _timeline(self, user_id: int) -> _Timeline:
+        now = time.monotonic()
+        cached = self._timelines.get(user_id)
+        if cached is not None and cached[0] > now:
+            return cached[1]
+        following = self.db.get_following(user_id)
+        big = tuple(a for a, count in following if count > self.fanout_limit)
+        small = [a for a, count in following if count <= self.fanout_limit] + [user_id]
+        ids = self.db.get_author_post_ids(small, self.length)
+        timeline = _Timeline(ids, big, self.length)
+        with self._lock:
+            self._store(self._timelines, user_id, timeline, now + self.ttl, now)
+            self.rebuilds += 1
+        return timeline
+
+    def _followers_of(self, author_id: int):
+        """Follower ids as a tuple, or None when the author is above the fan-out limit"""
+        now = time.monotonic()
+        cached = self._followers.get(author_id)
+        if cached is not None and cached[0] > now:
+            return cached[1]
+        # The same count _timeline() classifies followees by, so both sides agree on who is big
+        if self.db.get_follower_count(author_id) > self.fanout_limit:
+            followers = None
+        else:
+            followers = tuple(self.db.get_follower_ids(author_id))
+        with self._lock:
+            self._store(self._followers, author_id, followers, now + self.ttl, now)
+        return followers
+
+    def _big_author_posts(self, author_id: int):
+        now = time.monotonic()
+        cached = self._big_posts.get(author_id)
+        if cached is not None and cached[0] > now:
+            return cached[1]
+        ids = deque(self.db.get_author_post_ids([author_id], self.length), maxlen=self.length)
+        with self._lock:
+            self._store(self._big_posts, author_id, ids, now + self.ttl, now)
+        return ids
@@ -0,0 +1,183 @@
+import bisect
+import heapq
+import logging
+import threading
+import math
+import re
+import time
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+LIKE_WEIGHT = 1.0
+COMMENT_WEIGHT = 2.0
+# Scores are rescaled (and idle posts dropped) once the decay exponent reaches this many half-lives
+REBASE_HALF_LIVES = 16
+# A post whose decayed score falls below this is forgotten at the next rescale
+MIN_SCORE = 1e-3
+# Extra top-K slots kept beyond the largest K served, so unlikes rarely force a full rescan
+TOP_SLACK = 2
+
+
+# PostgREST trims trailing zeros from the fraction and Postgres may print "+00" or "Z";
+# datetime.fromisoformat only takes 3 or 6 digits and "+HH:MM" before Python 3.11
+_TIMESTAMP = re.compile(r"(\d{4}-\d\d-\d\d)[T ](\d\d:\d\d:\d\d)(?:\.(\d+))?(Z|[+-]\d\d(?::?\d\d)?)?")
+
+
+def timestamp(value) -> float:
+    """Seconds since the epoch for a Postgres timestamptz string (or a number); no offset means UTC"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = _TIMESTAMP.fullmatch(value)
+    if match is None:
+        raise ValueError(f"Not a timestamp: {value!r}")
+    date, clock, fraction, offset = match.groups()
+    fraction = (fraction or "")[:6].ljust(6, "0")
+    if offset in (None, "Z"):
+        offset = "+00:00"
+    else:
+        offset = offset[:3] + ":" + (offset[3:].lstrip(":") or "00")
+    return datetime.fromisoformat(f"{date}T{clock}.{fraction}{offset}").timestamp()
+
+
+class TrendingRanker:
+    """Time-decayed engagement scores with an incrementally maintained top-K.
+
+    A like adds LIKE_WEIGHT and a comment COMMENT_WEIGHT, halving every
+    `half_life` seconds. Scores use forward decay: an event at time t adds
+    w * 2 ** ((t - epoch) / half_life), so the stored score of a post only
+    changes when it gets an event, and the ranking at any moment is the
+    ranking of the stored scores. An unlike subtracts a like at the time of
+    the unlike (never below zero); a rebuild from the likes table is exact.
+
+    The best `k * TOP_SLACK` posts are kept in a sorted list. `_floor` bounds
+    the score of every post outside it, so top() can serve from the list
+    alone in O(k) and only rescans all scores when unlikes pushed too many
+    members under the floor. Scores are per-process, like FeedCache, and
+    are rebuilt from the likes and comments tables at startup.
+    """
+
+    def __init__(self, half_life: float = 6 * 3600, k: int = 100, now: float = None):
+        self.half_life = half_life
+        self.k = k
+        self.capacity = k * TOP_SLACK
+        self._epoch = time.time() if now is None else now
+        self._scores = {}       # post_id -> stored (forward-decayed) score
+        self._top = []          # sorted [(stored score, post_id)], ascending
+        self._floor = 0.0       # no post outside _top scores above this
+        self._lock = threading.Lock()
+        self.events = 0
+        self.rescans = 0
+        self.ready = False
+
+    def add(self, post_id: int, weight: float, at: float = None):
+        """Record an event worth `weight` (negative for an unlike) on `post_id` at time `at`"""
+        at = time.time() if at is None else at
+        with self._lock:
+            if at - self._epoch > REBASE_HALF_LIVES * self.half_life:
+                self._rebase(at)
+            old = self._scores.get(post_id, 0.0)
+            new = max(old + weight * 2.0 ** ((at - self._epoch) / self.half_life), 0.0)
+            if new > 0:
+                self._scores[post_id] = new
+            else:
+                self._scores.pop(post_id, None)
+            self._place(post_id, old, new)
+            self.events += 1
+
+    def like(self, post_id: int, at: float = None):
+        self.add(post_id, LIKE_WEIGHT, at)
+
+    def unlike(self, post_id: int, at: float = None):
+        self.add(post_id, -LIKE_WEIGHT, at)
+
+    def comment(self, post_id: int, at: float = None):
+        self.add(post_id, COMMENT_WEIGHT, at)
+
+    def top(self, limit: int = 20, now: float = None) -> list:
+        """Up to `limit` (post_id, score) pairs, highest first, with scores decayed to `now`"""
+        limit = min(limit, self.k)
+        now = time.time() if now is None else now
+        with self._lock:
+            if now - self._epoch > REBASE_HALF_LIVES * self.half_life:
+                self._rebase(now)
+            picked = self._pick(limit)
+            if len(picked) < limit and len(self._scores) > len(picked):
+                self._rescan()
+                picked = self._pick(limit)
+            scale = 2.0 ** (-(now - self._epoch) / self.half_life)
+        return [(post_id, round(score * scale, 4)) for score, post_id in picked]
+
+    def cutoff(self, now: float = None) -> str:
+        """ISO timestamp of the oldest event that still weighs at least MIN_SCORE"""
+        now = time.time() if now is None else now
+        age = self.half_life * math.log2(max(LIKE_WEIGHT, COMMENT_WEIGHT) / MIN_SCORE)
+        return datetime.fromtimestamp(now - age, timezone.utc).isoformat()
+
+    def rebuild(self, likes, comments, now: float = None):
+        """Replace all scores from (post_id, created_at) pairs read from the likes and comments tables"""
+        now = time.time() if now is None else now
+        fresh = TrendingRanker(self.half_life, self.k, now)
+        count = 0
+        for weight, rows in ((LIKE_WEIGHT, likes), (COMMENT_WEIGHT, comments)):
+            for post_id, created_at in rows:
+                fresh.add(post_id, weight, timestamp(created_at))
+                count += 1
+        fresh._rebase(now)
+        with self._lock:
+            # Live events recorded while the tables were being read are replaced too; at
+            # startup that is a few seconds of activity
+            self._epoch, self._scores, self._top, self._floor = fresh._epoch, fresh._scores, fresh._top, fresh._floor
+            self.ready = True
+        logger.info("Trending scores rebuilt from %d events, %d posts", count, len(self._scores))
+        return count
+
+    def stats(self) -> dict:
+        return {
+            "posts": len(self._scores),
+            "events": self.events,
+            "rescans": self.rescans,
+            "ready": self.ready,
+        }
+
+    def _pick(self, limit: int) -> list:
+        picked = []
+        for entry in reversed(self._top):
+            if entry[0] < self._floor or len(picked) == limit:
+                break
+            picked.append(entry)
+        return picked
+
+    def _place(self, post_id: int, old: float, new: float):
+        """Move post_id within the top list after its score went from `old` to `new`"""
+        top = self._top
+        if old > 0:
+            i = bisect.bisect_left(top, (old, post_id))
+            if i < len(top) and top[i][1] == post_id:
+                del top[i]
+                if new > 0:
+                    bisect.insort(top, (new, post_id))
+                return
+        if new <= 0:
+            return
+        if len(top) < self.capacity or new > top[0][0]:
+            bisect.insort(top, (new, post_id))
+            if len(top) > self.capacity:
+                self._floor = max(self._floor, top.pop(0)[0])
+        else:
+            self._floor = max(self._floor, new)
+
+    def _rescan(self):
+        """Rebuild the top list from every score: O(n), only after many unlikes"""
+        best = heapq.nlargest(self.capacity + 1, ((s, p) for p, s in self._scores.items()))
+        self._floor = best.pop()[0] if len(best) > self.capacity else 0.0
+        self._top = sorted(best)
+        self.rescans += 1
+
+    def _rebase(self, now: float):
+        """Move the epoch to `now`, shrinking stored scores and dropping posts that went quiet"""
+        factor = 2.0 ** (-(now - self._epoch) / self.half_life)
+        self._epoch = now
+        self._scores = {p: s * factor for p, s in self._scores.items() if s * factor >= MIN_SCORE}
+        self._floor *= factor
+        self._top = [(s * factor, p) for s, p in self._top if p in self._scores]